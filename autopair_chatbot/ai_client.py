@@ -0,0 +1,183 @@
+# File: autopair_chatbot/ai_client.py
+"""Deadline-bounded, streaming chat completions with a hedged second request.
+
+Every turn gets AI_TURN_DEADLINE seconds. The first request streams; if it
+hasn't produced a token after AI_HEDGE_DELAY seconds (or fails before then)
+a second identical request goes out and whichever streams first wins (the
+other is abandoned). Streaming stops once the reply fills an SMS
+(AI_SMS_CHAR_LIMIT), cut at the last full sentence. At the deadline the
+caller gets whatever has streamed so far, cut the same way, or None if
+nothing has.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from autopair_chatbot.config import (
+    OPENAI_MODEL, OPENAI_TEMPERATURE, OPENAI_MAX_TOKENS, AI_TURN_DEADLINE, AI_HEDGE_DELAY, AI_SMS_CHAR_LIMIT, logger
+)
+
+
+def trim_to_sms(text, limit=AI_SMS_CHAR_LIMIT):
+    """Cut at the last sentence end (or word) that fits the limit."""
+    text = text.strip()
+    if len(text) <= limit:
+        return text
+    head = text[:limit]
+    sentence_ends = [m.end() for m in re.finditer(r"[.!?](\s|$)", head)]
+    if sentence_ends and sentence_ends[-1] > limit // 2:
+        return head[:sentence_ends[-1]].strip()
+    return head.rsplit(" ", 1)[0].rstrip(",;:-") + "…"
+
+
+def trim_partial(text):
+    """A reply cut off mid-stream, up to its last full sentence (or word)."""
+    text = trim_to_sms(text)
+    if text.endswith("…"):
+        return text
+    sentence_ends = [m.end() for m in re.finditer(r"[.!?](\s|$)", text)]
+    if sentence_ends:
+        return text[:sentence_ends[-1]].strip()
+    head = text.rsplit(" ", 1)[0] if " " in text else text
+    return head.rstrip(",;:-") + "…"
+
+
+class _Attempt:
+    """One streaming request, run on its own thread. `progress` is set when it
+    gets its first token and when it finishes."""
+
+    def __init__(self, name, messages, deadline, started, first_token, progress):
+        self.name = name
+        self.text = ""
+        self.error = None
+        self.complete = False
+        self.first_token_at = None
+        self.cancelled = threading.Event()
+        self._messages = messages
+        self._deadline = deadline
+        self._started = started
+        self._first_token = first_token
+        self._progress = progress
+        threading.Thread(target=self._run, name=f"openai-{name}", daemon=True).start()
+
+    def _run(self):
+        from autopair_chatbot.config import get_openai_client
+
+        stream = None
+        try:
+            remaining = max(self._deadline - time.monotonic(), 0.1)
+            stream = get_openai_client().with_options(max_retries=0, timeout=remaining).chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=self._messages,
+                temperature=OPENAI_TEMPERATURE,
+                max_tokens=OPENAI_MAX_TOKENS,
+                stream=True
+            )
+            for chunk in stream:
+                if self.cancelled.is_set():
+                    return
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if self.first_token_at is None:
+                    self.first_token_at = time.monotonic() - self._started
+                    self._first_token.set()
+                    self._progress.set()
+                self.text += delta
+                if len(self.text) >= AI_SMS_CHAR_LIMIT:
+                    break
+            self.complete = True
+        except Exception as e:
+            self.error = e
+        finally:
+            if stream is not None:
+                try:
+                    stream.response.close()
+                except Exception:
+                    pass
+            self._progress.set()
+
+
+class ChatCompleter:
+    def __init__(self, deadline=AI_TURN_DEADLINE, hedge_delay=AI_HEDGE_DELAY):
+        self.deadline = deadline
+        self.hedge_delay = hedge_delay
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._latency_total = 0.0
+        self._first_token_total = 0.0
+
+    def complete(self, messages):
+        """Reply text trimmed to one SMS (partial if the deadline cut it off),
+        or None on error or if nothing streamed in time."""
+        started = time.monotonic()
+        deadline = started + self.deadline
+        first_token = threading.Event()
+        progress = threading.Event()
+        primary = _Attempt("primary", messages, deadline, started, first_token, progress)
+        attempts = [primary]
+
+        # Hedge when the first request is slow to start or fails before it does
+        if self.hedge_delay:
+            hedge_at = started + min(self.hedge_delay, self.deadline)
+            while not (first_token.is_set() or primary.complete or primary.error) and time.monotonic() < hedge_at:
+                progress.wait(max(hedge_at - time.monotonic(), 0))
+                progress.clear()
+            if not first_token.is_set() and not primary.complete:
+                reason = f"failed ({primary.error})" if primary.error else f"no first token after {self.hedge_delay}s"
+                logger.info(f"⏱️ Primary request {reason}; sending hedged request")
+                self._count("hedged")
+                attempts.append(_Attempt("hedge", messages, deadline, started, first_token, progress))
+
+        winner = None
+        while time.monotonic() < deadline:
+            live = [a for a in attempts if a.first_token_at is not None and not a.error]
+            winner = min(live, key=lambda a: a.first_token_at) if live else None
+            if winner and winner.complete:
+                break
+            if all(a.complete or a.error for a in attempts):
+                break
+            progress.clear()
+            progress.wait(min(0.05, max(deadline - time.monotonic(), 0)))
+
+        for attempt in attempts:
+            if attempt is not winner or not attempt.complete:
+                attempt.cancelled.set()
+        elapsed = time.monotonic() - started
+
+        if winner and not winner.complete and winner.text.strip():
+            # Out of time mid-stream: send what has arrived rather than the canned answer
+            self._count("partial")
+            logger.warning(f"⌛ AI reply cut off at the {self.deadline}s deadline after {len(winner.text)} chars")
+            return trim_partial(winner.text)
+
+        if winner is None or not winner.complete:
+            errors = [str(a.error) for a in attempts if a.error]
+            reason = "; ".join(errors) if errors else f"deadline of {self.deadline}s passed"
+            self._count("fallback")
+            logger.warning(f"⌛ AI reply unavailable after {elapsed:.2f}s ({reason}); using canned answer")
+            return None
+
+        with self._lock:
+            self._counts["completed"] += 1
+            self._counts[f"won_by_{winner.name}"] += 1
+            self._latency_total += elapsed
+            self._first_token_total += winner.first_token_at
+        logger.info(f"🤖 AI reply in {elapsed:.2f}s (first token {winner.first_token_at:.2f}s, {winner.name})")
+        return trim_to_sms(winner.text)
+
+    def stats(self):
+        with self._lock:
+            completed = self._counts["completed"]
+            return {
+                **dict(self._counts),
+                "latency_avg_s": round(self._latency_total / completed, 3) if completed else 0.0,
+                "first_token_avg_s": round(self._first_token_total / completed, 3) if completed else 0.0
+            }
+
+    def _count(self, counter):
+        with self._lock:
+            self._counts[counter] += 1
+
+
+chat_completer = ChatCompleter()
@@ -0,0 +1,173 @@
+# File: autopair_chatbot/answer_cache.py
+import argparse
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from autopair_chatbot.config import ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_PATH, logger
+
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "do", "does", "did", "i", "me", "my", "we", "you",
+    "your", "it", "its", "of", "to", "for", "on", "in", "at", "and", "or", "so", "just", "please",
+    "hi", "hey", "hello", "thanks", "thank", "there", "this", "that", "about", "tell", "know", "would", "like"
+}
+
+PERSONAL_FIELDS = ("first_name",)
+
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and stop words: "How much is it??" -> "how much"."""
+    words = re.sub(r"[^\w\s$]", " ", question.lower()).split()
+    return " ".join(word for word in words if word not in STOP_WORDS)
+
+
+def cache_key(section, question, plans, vehicle=""):
+    """Key on the knowledge text sent, the normalized question, the plan set
+    and the vehicle.
+
+    Hashing the section text means edited knowledge never serves old answers.
+    The vehicle is in the prompt and answers mention it in pieces ("your
+    Civic"), so it is part of the key rather than swapped for a placeholder.
+    """
+    plan_set = ",".join(sorted(p.strip().lower() for p in (plans or "").split(",") if p.strip()))
+    section_hash = hashlib.sha256(section.encode("utf-8")).hexdigest()
+    vehicle_key = " ".join((vehicle or "").lower().split())
+    raw = f"{section_hash}|{normalize_question(question)}|{plan_set}|{vehicle_key}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def depersonalize(answer, personal):
+    """Swap the customer's name for a placeholder before caching."""
+    for field in PERSONAL_FIELDS:
+        value = (personal or {}).get(field)
+        if value and len(value) > 1:
+            answer = re.sub(r"\b" + re.escape(value) + r"\b", "{" + field + "}", answer)
+    return answer
+
+
+def personalize(answer, personal):
+    for field in PERSONAL_FIELDS:
+        answer = answer.replace("{" + field + "}", (personal or {}).get(field) or "")
+    return answer
+
+
+class SQLiteAnswerStore:
+    """On-disk backing store so cached answers survive restarts."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, expires_at FROM answers WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row
+
+    def set(self, key, answer, expires_at, max_size):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, expires_at) VALUES (?, ?, ?)", (key, answer, expires_at)
+            )
+            self._conn.execute("DELETE FROM answers WHERE expires_at <= ?", (time.time(),))
+            self._conn.execute(
+                "DELETE FROM answers WHERE key NOT IN (SELECT key FROM answers ORDER BY expires_at DESC LIMIT ?)",
+                (max_size,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+
+
+class AnswerCache:
+    """LRU + TTL cache of AI answers, optionally backed by SQLite."""
+
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, path=ANSWER_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = SQLiteAnswerStore(path) if path and max_size > 0 else None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+        row = self._store.get(key) if self._store else None
+        with self._lock:
+            if row:
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+        return None
+
+    def set(self, key, answer):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, answer, expires_at)
+        if self._store:
+            self._store.set(key, answer, expires_at, self.max_size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._store:
+            self._store.clear()
+        logger.info("🧹 Answer cache cleared")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "persistent": self._store is not None
+            }
+
+    def _remember(self, key, answer, expires_at):
+        self._entries[key] = (answer, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+answer_cache = AnswerCache()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m autopair_chatbot.answer_cache", description="Manage the AI answer cache")
+    parser.add_argument("command", choices=["clear"], help="clear: drop every cached answer (run after editing knowledge)")
+    parser.add_argument("--path", default=ANSWER_CACHE_PATH, help="on-disk cache path")
+    args = parser.parse_args(argv)
+    if not args.path:
+        print("No on-disk answer cache configured (ANSWER_CACHE_PATH); in-memory caches clear on restart")
+        return
+    SQLiteAnswerStore(args.path).clear()
+    print(f"Cleared {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# File: autopair_chatbot/backfill.py
+"""Qualify and text historical leads that were never processed.
+
+    python -m autopair_chatbot.backfill --dry-run
+    python -m autopair_chatbot.backfill --concurrency 4 --rate 1 --limit 5000
+
+Pages through unprocessed leads by hs_object_id (so marking leads processed
+doesn't shift the pages), saves a checkpoint after each page and prints a
+throughput report at the end. Every lead texted is appended to a local sent
+log right away, so a run interrupted before its page's HubSpot writes
+doesn't text those leads again when it resumes.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from autopair_chatbot.config import LOCK_LEASE_SECONDS, logger
+from autopair_chatbot.hubspot import hubspot_client, batch_read_leads, batch_update_leads, LEAD_PROPERTIES
+from autopair_chatbot.locks import lead_locks
+from autopair_chatbot.phone import normalize_phones
+from autopair_chatbot.plans import qualify_batch
+from autopair_chatbot.utils import send_qualification_sms, now_in_toronto, write_json_atomic
+from autopair_chatbot.workers import TokenBucket
+
+REQUIRED_FIELDS = ['phone', 'vehicle_year', 'vehicle_mileage']
+
+
+def search_unprocessed_ids(after_id, page_size):
+    """IDs of leads after `after_id` whose autopair_processed isn't "true", ascending."""
+    base = [
+        {"propertyName": "lifecyclestage", "operator": "EQ", "value": "lead"},
+        {"propertyName": "hs_object_id", "operator": "GT", "value": str(after_id)}
+    ]
+    body = {
+        "filterGroups": [
+            {"filters": base + [{"propertyName": "autopair_processed", "operator": "NEQ", "value": "true"}]},
+            {"filters": base + [{"propertyName": "autopair_processed", "operator": "NOT_HAS_PROPERTY"}]}
+        ],
+        "sorts": [{"propertyName": "hs_object_id", "direction": "ASCENDING"}],
+        "properties": ["hs_object_id"],
+        "limit": page_size
+    }
+    response = hubspot_client.post("/crm/v3/objects/contacts/search", json=body)
+    response.raise_for_status()
+    return [int(result["id"]) for result in response.json().get("results", [])]
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {"last_id": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+class SentLog:
+    """Append-only file of lead ids already texted, one per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._ids = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, lead_id):
+        return str(lead_id) in self._ids
+
+    def add(self, lead_id):
+        with self._lock:
+            self._ids.add(str(lead_id))
+            if not self.path:
+                return
+            with open(self.path, "a") as f:
+                f.write(f"{lead_id}\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def eligible(lead):
+    props = lead.get("properties", {})
+    if props.get("autopair_processed") == "true":
+        return False
+    if props.get("lifecyclestage") not in (None, "", "lead"):
+        return False
+    return all(props.get(field) for field in REQUIRED_FIELDS)
+
+
+class Backfill:
+    def __init__(self, concurrency, rate, dry_run, sent_log=None):
+        self.dry_run = dry_run
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, 1)
+        self.sent_log = sent_log or SentLog(None)
+        self.stats = {
+            "scanned": 0, "eligible": 0, "sent": 0, "failed": 0, "already_sent": 0, "skipped_locked": 0,
+            "invalid_phone": 0, "updated": 0, "update_failed": 0, "pages": 0
+        }
+        self._lock = threading.Lock()
+
+    def run_page(self, lead_ids):
+        leads = [lead for lead in batch_read_leads(lead_ids, LEAD_PROPERTIES) if eligible(lead)]
+        # Normalize the page's numbers in one pass; sends then hit the memo cache
+        phones = normalize_phones([lead["properties"]["phone"] for lead in leads])
+        self.stats["invalid_phone"] += phones.count(None)
+        leads = [lead for lead, phone in zip(leads, phones) if phone]
+        qualifications = qualify_batch(
+            [lead["properties"]["vehicle_year"] for lead in leads],
+            [lead["properties"]["vehicle_mileage"] for lead in leads]
+        ).results() if leads else []
+        self.stats["scanned"] += len(lead_ids)
+        self.stats["eligible"] += len(leads)
+        self.stats["pages"] += 1
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            outcomes = list(pool.map(self._send, leads, qualifications))
+
+        updates = []
+        for lead, qualification, sent in zip(leads, qualifications, outcomes):
+            if sent is None:
+                continue
+            properties = {
+                "autopair_qualified": str(qualification["qualified"]).lower(),
+                "autopair_qualified_plans": ", ".join(p["name"] for p in qualification.get("plans", []))
+            }
+            if sent:
+                properties.update({
+                    "autopair_processed": "true",
+                    "autopair_last_processed": int(now_in_toronto().timestamp() * 1000)
+                })
+            updates.append({"id": lead["id"], "properties": properties})
+
+        if self.dry_run:
+            return
+        for start in range(0, len(updates), 100):
+            outcome = batch_update_leads(updates[start:start + 100])
+            written = sum(1 for ok in outcome.values() if ok)
+            self.stats["updated"] += written
+            self.stats["update_failed"] += len(outcome) - written
+
+    def _send(self, lead, qualification):
+        """True/False for sent/failed, None when another worker holds the lead."""
+        if lead["id"] in self.sent_log:
+            # Texted by an earlier, interrupted run; only its HubSpot write is missing
+            self._count("already_sent")
+            return True
+        lock_key = f"lead:{lead['id']}"
+        if not self.dry_run and not lead_locks.acquire(lock_key, LOCK_LEASE_SECONDS):
+            self._count("skipped_locked")
+            return None
+        if self.dry_run:
+            logger.info(f"[dry run] Would text lead {lead['id']}: qualified={qualification['qualified']}")
+            sent = True
+        else:
+            self.bucket.acquire()
+            sent = send_qualification_sms(lead, qualification)
+            if sent:
+                self.sent_log.add(lead["id"])
+            else:
+                lead_locks.release(lock_key)
+        self._count("sent" if sent else "failed")
+        return sent
+
+    def _count(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m autopair_chatbot.backfill", description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="qualify and report, but send nothing and write nothing")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel SMS sends")
+    parser.add_argument("--rate", type=float, default=1.0, help="max SMS per second")
+    parser.add_argument("--page-size", type=int, default=100, help="leads per page (max 100)")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many leads (0 = all)")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json", help="resume file")
+    parser.add_argument("--reset", action="store_true", help="ignore the checkpoint and start from the first lead")
+    parser.add_argument("--sent-log", default="backfill_sent.log", help="ids of leads already texted (never resent)")
+    args = parser.parse_args(argv)
+
+    checkpoint = {"last_id": 0} if args.reset else load_checkpoint(args.checkpoint)
+    backfill = Backfill(args.concurrency, args.rate, args.dry_run, SentLog(None if args.dry_run else args.sent_log))
+    calls_before = hubspot_client.request_count
+    started = time.monotonic()
+    logger.info(f"Backfill starting after lead {checkpoint['last_id']}{' (dry run)' if args.dry_run else ''}")
+
+    while not args.limit or backfill.stats["scanned"] < args.limit:
+        page_size = min(args.page_size, 100)
+        if args.limit:
+            page_size = min(page_size, args.limit - backfill.stats["scanned"])
+        lead_ids = search_unprocessed_ids(checkpoint["last_id"], page_size)
+        if not lead_ids:
+            break
+        backfill.run_page(lead_ids)
+        checkpoint["last_id"] = max(lead_ids)
+        if not args.dry_run:
+            write_json_atomic(args.checkpoint, checkpoint)
+        logger.info(f"Backfill page done through lead {checkpoint['last_id']}: {backfill.stats}")
+
+    elapsed = time.monotonic() - started
+    stats = backfill.stats
+    hubspot_calls = hubspot_client.request_count - calls_before
+    twilio_calls = 0 if args.dry_run else stats["sent"] + stats["failed"]
+    report = {
+        **stats,
+        "elapsed_s": round(elapsed, 2),
+        "leads_per_s": round(stats["scanned"] / elapsed, 2) if elapsed else 0.0,
+        "hubspot_calls": hubspot_calls,
+        "api_calls_per_lead": round((hubspot_calls + twilio_calls) / stats["scanned"], 3) if stats["scanned"] else 0.0,
+        "last_id": checkpoint["last_id"]
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,123 @@
 # File: autopair_chatbot/call_handlers.py
-import os
+from urllib.parse import quote
+from xml.sax.saxutils import escape
 from flask import request
 from twilio.twiml.voice_response import VoiceResponse, Gather
-from autopair_chatbot.config import logger
-from autopair_chatbot.hubspot import update_lead_in_hubspot
-from dotenv import load_dotenv
-load_dotenv() 
+from autopair_chatbot.config import NGROK_URL, SPECIALIST_NUMBERS, logger
+from autopair_chatbot.dialer import dialer
+from autopair_chatbot.jobs import queue_contact_update_async
 
-# Load full ngrok URL from env
-NGROK_URL = os.getenv("NGROK_URL")
 logger.info(f"✅ Loaded NGROK_URL: {NGROK_URL}")
 
 
-def call_handler(lead_id):
-    logger.info(f"✅ Twilio reached /call-handler/{lead_id}")
+def place_call(lead_id, phone, status_callback=False):
+    """Dial a lead and connect them to the IVR at /call-handler/<lead_id>.
+    With status_callback, Twilio reports call progress to /call-status
+    (tagged with the lead id). Returns the call SID."""
+    from autopair_chatbot.config import TWILIO_PHONE_NUMBER, get_twilio_client
+
+    options = {}
+    if status_callback:
+        options = {
+            "status_callback": f"{NGROK_URL}/call-status?lead_id={lead_id}",
+            "status_callback_event": ["initiated", "ringing", "answered", "completed"],
+            "status_callback_method": "POST"
+        }
+    call = get_twilio_client().calls.create(
+        url=f"{NGROK_URL}/call-handler/{lead_id}",
+        to=phone,
+        from_=TWILIO_PHONE_NUMBER,
+        **options
+    )
+    logger.info(f"📞 Call placed to lead {lead_id}")
+    return call.sid
+
+
+LEAD_ID_TOKEN = "__LEAD_ID__"
+TWIML_HEADERS = {'Content-Type': 'text/xml'}
+
 
-    response = VoiceResponse()
+def _build_ivr_templates():
+    """Render each fixed IVR response once, with a token where the lead id goes."""
+    welcome = VoiceResponse()
     gather = Gather(
         num_digits=1,
-        action=f"{NGROK_URL}/ivr-handler/{lead_id}",
+        action=f"{NGROK_URL}/ivr-handler/{LEAD_ID_TOKEN}",
         method="POST",
         timeout=10
     )
     gather.say("Hello! This is Auto Pair Warranty Services. Press 1 to talk to a specialist. Press 2 to hear about our warranty plans.")
-    response.append(gather)
-    response.say("We didn’t get your response. We'll call you back later.")
+    welcome.append(gather)
+    welcome.say("We didn’t get your response. We'll call you back later.")
+
+    dial_specialist = VoiceResponse()
+    dial_specialist.say("Connecting you to a specialist, please hold.")
+    # Dial with fallback option
+    with dial_specialist.dial(timeout=20, record="record-from-answer") as dial:
+        dial.number("+18334268672")  # ✅ Primary: Canada toll-free
+        dial.number("+12185683118")  # ✅ Fallback: US/Canada backup
+    # If no one answers, fallback message
+    dial_specialist.say("We’re sorry. We could not connect you to a specialist right now.")
+    dial_specialist.hangup()
+
+    # One template per specialist number, for calls the dialer routes to the least busy one
+    dial_destinations = {}
+    for number in SPECIALIST_NUMBERS:
+        response = VoiceResponse()
+        response.say("Connecting you to a specialist, please hold.")
+        response.dial(number, timeout=20, record="record-from-answer")
+        response.say("We’re sorry. We could not connect you to a specialist right now.")
+        response.hangup()
+        dial_destinations[f"dial:{number}"] = str(response)
+
+    plan_info = VoiceResponse()
+    plan_info.say("Our warranty plans cover engine, transmission, and drivetrain components. They include roadside assistance and have a $100 deductible per visit. Coverage begins after a 30-day waiting period.")
+
+    invalid = VoiceResponse()
+    invalid.say("Invalid option. Please try again.")
+    invalid.redirect(f"{NGROK_URL}/call-handler/{LEAD_ID_TOKEN}")
+
+    return {
+        "welcome": str(welcome),
+        "dial_specialist": str(dial_specialist),
+        "plan_info": str(plan_info),
+        "invalid": str(invalid),
+        **dial_destinations
+    }
+
+
+IVR_TEMPLATES = _build_ivr_templates()
+
+
+def render_ivr(name, lead_id):
+    """A pre-rendered IVR response with this lead's id filled into its URLs."""
+    return IVR_TEMPLATES[name].replace(LEAD_ID_TOKEN, escape(quote(str(lead_id), safe="")))
+
+
+def call_handler(lead_id):
+    logger.info(f"✅ Twilio reached /call-handler/{lead_id}")
+    return render_ivr("welcome", lead_id), 200, TWIML_HEADERS
 
-    return str(response), 200, {'Content-Type': 'text/xml'}
 
 def ivr_handler(lead_id):
     digit = request.values.get('Digits')
     logger.info(f"IVR input received from lead {lead_id}: {digit}")
 
-    update_lead_in_hubspot(lead_id, {
+    # Record the keypress in the background so the caller doesn't wait on HubSpot
+    queue_contact_update_async(lead_id, {
         "properties": {
             "autopair_last_digit_pressed": digit
         }
     })
 
-    response = VoiceResponse()
-
-    if digit == "1":
-        response.say("Connecting you to a specialist, please hold.")
-
-        # Dial with fallback option
-        with response.dial(timeout=20, record="record-from-answer") as dial:
-            dial.number("+18334268672")  # ✅ Primary: Canada toll-free
-            dial.number("+12185683118")  # ✅ Fallback: US/Canada backup
-
-        # If no one answers, fallback message
-        response.say("We’re sorry. We could not connect you to a specialist right now.")
-        response.hangup()
-
+    if digit == "1" and dialer:
+        destination = dialer.assign_destination(request.values.get("CallSid"))
+        twiml = render_ivr(f"dial:{destination}", lead_id)
+    elif digit == "1":
+        twiml = render_ivr("dial_specialist", lead_id)
     elif digit == "2":
-        response.say("Our warranty plans cover engine, transmission, and drivetrain components. They include roadside assistance and have a $100 deductible per visit. Coverage begins after a 30-day waiting period.")
+        twiml = render_ivr("plan_info", lead_id)
     else:
-        response.say("Invalid option. Please try again.")
-        response.redirect(f"{NGROK_URL}/call-handler/{lead_id}")
+        twiml = render_ivr("invalid", lead_id)
 
-    return str(response), 200, {'Content-Type': 'text/xml'}
+    return twiml, 200, TWIML_HEADERS
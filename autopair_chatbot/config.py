@@ -1,9 +1,10 @@
 # File: autopair_chatbot/config.py
+# Every setting comes from the environment (and .env, loaded only here) once,
+# at import. API clients are built on first use; see get_openai_client().
 import os
 import logging
+import threading
 from dotenv import load_dotenv
-from twilio.rest import Client
-from openai import OpenAI
 
 load_dotenv()
 
@@ -14,11 +15,188 @@ TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 HUBSPOT_WEBHOOK_SECRET = os.getenv("HUBSPOT_WEBHOOK_SECRET")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-NGROK_URL = os.getenv("NGROK_URL", "http://localhost:5000")
+# Public base URL Twilio calls back to; no default, see the check at the bottom
+NGROK_URL = os.getenv("NGROK_URL", "").rstrip("/")
 
-# Initialize clients
-client = OpenAI(api_key=OPENAI_API_KEY)
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+# HubSpot HTTP client (pooled keep-alive session)
+HUBSPOT_BASE_URL = os.getenv("HUBSPOT_BASE_URL", "https://api.hubapi.com")
+HUBSPOT_CONNECT_TIMEOUT = float(os.getenv("HUBSPOT_CONNECT_TIMEOUT", "3.05"))
+HUBSPOT_READ_TIMEOUT = float(os.getenv("HUBSPOT_READ_TIMEOUT", "10"))
+HUBSPOT_POOL_CONNECTIONS = int(os.getenv("HUBSPOT_POOL_CONNECTIONS", "4"))
+HUBSPOT_POOL_MAXSIZE = int(os.getenv("HUBSPOT_POOL_MAXSIZE", "16"))
+
+# Write-behind batching for contact updates (off = one PATCH per update)
+HUBSPOT_WRITE_BEHIND = os.getenv("HUBSPOT_WRITE_BEHIND", "false").lower() == "true"
+HUBSPOT_BATCH_SIZE = min(int(os.getenv("HUBSPOT_BATCH_SIZE", "100")), 100)
+HUBSPOT_FLUSH_INTERVAL = float(os.getenv("HUBSPOT_FLUSH_INTERVAL", "2"))
+
+# In-memory phone -> contact index in front of find_lead_by_phone
+PHONE_INDEX_MAX_SIZE = int(os.getenv("PHONE_INDEX_MAX_SIZE", "5000"))
+PHONE_INDEX_TTL = float(os.getenv("PHONE_INDEX_TTL", "900"))
+
+# Memoized raw phone -> E.164 normalizations
+PHONE_CACHE_SIZE = int(os.getenv("PHONE_CACHE_SIZE", "20000"))
+
+# Local SQLite mirror of lead state (empty path = disabled, HubSpot only)
+LEAD_STORE_PATH = os.getenv("LEAD_STORE_PATH", "")
+LEAD_STORE_SYNC_INTERVAL = float(os.getenv("LEAD_STORE_SYNC_INTERVAL", "30"))
+LEAD_STORE_SYNC_LOOKBACK_DAYS = int(os.getenv("LEAD_STORE_SYNC_LOOKBACK_DAYS", "30"))
+LEAD_STORE_OVERLAY_TTL = float(os.getenv("LEAD_STORE_OVERLAY_TTL", "300"))
+
+# Plan eligibility/pricing rule table (empty = autopair_chatbot/plan_rules.json)
+PLAN_RULES_PATH = os.getenv("PLAN_RULES_PATH", "")
+
+# Lead ingestion: signed HubSpot webhooks push new leads; polling reconciles.
+# With a webhook secret configured the poll becomes a slower sweep.
+HUBSPOT_WEBHOOK_MAX_AGE_MS = int(os.getenv("HUBSPOT_WEBHOOK_MAX_AGE_MS", "300000"))
+LEAD_POLL_INTERVAL = float(os.getenv("LEAD_POLL_INTERVAL", "300" if HUBSPOT_WEBHOOK_SECRET else "60"))
+LEAD_WATERMARK_PATH = os.getenv("LEAD_WATERMARK_PATH", "lead_watermark.json")
+
+# Bounded worker pool shared by polling and webhook lead processing
+LEAD_WORKERS = int(os.getenv("LEAD_WORKERS", "4"))
+LEAD_QUEUE_SIZE = int(os.getenv("LEAD_QUEUE_SIZE", "200"))
+LEAD_QUEUE_POLICY = os.getenv("LEAD_QUEUE_POLICY", "block").lower()  # block | drop | spill
+LEAD_QUEUE_BLOCK_TIMEOUT = float(os.getenv("LEAD_QUEUE_BLOCK_TIMEOUT", "5"))
+LEAD_SPILL_PATH = os.getenv("LEAD_SPILL_PATH", "lead_spill.jsonl")
+
+# Background CRM writes off the IVR path (used when JOBS_ENABLED is off)
+BACKGROUND_WRITE_WORKERS = int(os.getenv("BACKGROUND_WRITE_WORKERS", "2"))
+BACKGROUND_WRITE_QUEUE_SIZE = int(os.getenv("BACKGROUND_WRITE_QUEUE_SIZE", "1000"))
+
+# Lead processing locks: "memory" (single process) or "sqlite" (shared lease file)
+LOCK_BACKEND = os.getenv("LOCK_BACKEND", "memory").lower()
+LOCK_DB_PATH = os.getenv("LOCK_DB_PATH", "autopair_locks.db")
+LOCK_LEASE_SECONDS = float(os.getenv("LOCK_LEASE_SECONDS", "300"))
+
+# Durable job queue for outbound side effects (SMS, contact updates, calls)
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "false").lower() == "true"
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "autopair_jobs.db")
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "6"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "5"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "900"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+
+# Scheduled callbacks: SQLite-backed, dialed when due within CALLBACK_CAPACITY
+# concurrent calls (each holds a specialist until /call-status reports it ended,
+# or for CALLBACK_CALL_SECONDS if that report never arrives)
+CALLBACK_SCHEDULER = os.getenv("CALLBACK_SCHEDULER", "false").lower() == "true"
+CALLBACK_DB_PATH = os.getenv("CALLBACK_DB_PATH", "autopair_callbacks.db")
+CALLBACK_CAPACITY = int(os.getenv("CALLBACK_CAPACITY", "2"))
+CALLBACK_CALL_SECONDS = float(os.getenv("CALLBACK_CALL_SECONDS", "600"))
+CALLBACK_MAX_LATENESS = float(os.getenv("CALLBACK_MAX_LATENESS", "3600"))
+CALLBACK_REFRESH_INTERVAL = float(os.getenv("CALLBACK_REFRESH_INTERVAL", "30"))
+
+# Paced outbound dialer: at most DIALER_SLOTS calls in progress (default one per
+# specialist number); leads waiting DIALER_ETA_THRESHOLD s or more get an ETA SMS
+DIALER_ENABLED = os.getenv("DIALER_ENABLED", "false").lower() == "true"
+DIALER_DB_PATH = os.getenv("DIALER_DB_PATH", "autopair_dialer.db")
+SPECIALIST_NUMBERS = [
+    number.strip() for number in os.getenv("SPECIALIST_NUMBERS", "+18334268672,+12185683118").split(",") if number.strip()
+]
+DIALER_SLOTS = int(os.getenv("DIALER_SLOTS", str(len(SPECIALIST_NUMBERS))))
+DIALER_AVG_CALL_SECONDS = float(os.getenv("DIALER_AVG_CALL_SECONDS", "300"))
+DIALER_CALL_TIMEOUT = float(os.getenv("DIALER_CALL_TIMEOUT", "1800"))
+DIALER_ETA_THRESHOLD = float(os.getenv("DIALER_ETA_THRESHOLD", "120"))
+DIALER_POLL_INTERVAL = float(os.getenv("DIALER_POLL_INTERVAL", "1"))
+
+# Production server (gunicorn.conf.py): one worker, elected through an flock on
+# LEADER_LOCK_PATH, runs the background loops; false = web requests only
+BACKGROUND_TASKS = os.getenv("BACKGROUND_TASKS", "true").lower() == "true"
+LEADER_LOCK_PATH = os.getenv("LEADER_LOCK_PATH", "autopair_leader.lock")
+LEADER_RETRY_INTERVAL = float(os.getenv("LEADER_RETRY_INTERVAL", "5"))
+
+# Inbound SMS: acknowledge Twilio immediately and run the turn in the background
+SMS_ASYNC = os.getenv("SMS_ASYNC", "false").lower() == "true"
+SMS_ASYNC_WORKERS = int(os.getenv("SMS_ASYNC_WORKERS", "8"))
+SMS_ASYNC_QUEUE_SIZE = int(os.getenv("SMS_ASYNC_QUEUE_SIZE", "500"))
+TWILIO_VALIDATE_SIGNATURE = os.getenv("TWILIO_VALIDATE_SIGNATURE", "false").lower() == "true"
+# "twiml" answers inbound SMS inline with <Message>; "rest" sends via the API
+SMS_REPLY_MODE = os.getenv("SMS_REPLY_MODE", "rest").lower()
+
+# Outbound SMS dispatcher: token bucket per sender number (long codes ~1 msg/s)
+SMS_DISPATCHER = os.getenv("SMS_DISPATCHER", "false").lower() == "true"
+TWILIO_SENDER_NUMBERS = [n.strip() for n in os.getenv("TWILIO_SENDER_NUMBERS", TWILIO_PHONE_NUMBER or "").split(",") if n.strip()]
+SMS_RATE_PER_SENDER = float(os.getenv("SMS_RATE_PER_SENDER", "1"))
+SMS_BURST_PER_SENDER = int(os.getenv("SMS_BURST_PER_SENDER", "1"))
+SMS_DISPATCH_WORKERS = int(os.getenv("SMS_DISPATCH_WORKERS", "4"))
+SMS_DISPATCH_QUEUE_SIZE = int(os.getenv("SMS_DISPATCH_QUEUE_SIZE", "1000"))
+SMS_SEND_TIMEOUT = float(os.getenv("SMS_SEND_TIMEOUT", "120"))
+SMS_STATUS_CALLBACK = os.getenv("SMS_STATUS_CALLBACK", "false").lower() == "true"
+# A recipient moves off their sticky sender number only past this wait (seconds)
+SMS_SENDER_MAX_WAIT = float(os.getenv("SMS_SENDER_MAX_WAIT", "60"))
+
+# AI answer cache (0 size disables; empty path = memory only)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Knowledge retrieval ("bm25" = top-k passages, "keyword" = legacy whole-section router)
+KNOWLEDGE_ROUTER = os.getenv("KNOWLEDGE_ROUTER", "bm25").lower()
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "4"))
+KNOWLEDGE_TOKEN_BUDGET = int(os.getenv("KNOWLEDGE_TOKEN_BUDGET", "300"))
+
+# OpenAI answers: model settings, per-turn deadline (s), hedged second request
+# after AI_HEDGE_DELAY s without a first token (0 = off), reply cut at one SMS
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
+OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "150"))
+AI_TURN_DEADLINE = float(os.getenv("AI_TURN_DEADLINE", "8"))
+AI_HEDGE_DELAY = float(os.getenv("AI_HEDGE_DELAY", "1.5"))
+AI_SMS_CHAR_LIMIT = int(os.getenv("AI_SMS_CHAR_LIMIT", "320"))
+
+# Per-lead conversation memory fed to the model (in-process, LRU over leads;
+# 0 leads disables). Older questions roll into a short summary line.
+CONVERSATION_MAX_LEADS = int(os.getenv("CONVERSATION_MAX_LEADS", "10000"))
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "6"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "400"))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "60"))
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", "86400"))
+
+# Templated answers for common questions, skipping OpenAI (0-1 confidence)
+FAST_ANSWERS = os.getenv("FAST_ANSWERS", "true").lower() == "true"
+FAST_ANSWER_THRESHOLD = float(os.getenv("FAST_ANSWER_THRESHOLD", "0.8"))
+
+# API clients: created on first use (importing openai/twilio.rest is most of
+# our startup time) and cached per process; a forked child builds its own
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(name, build):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = build()
+    return client
+
+
+def get_openai_client():
+    def build():
+        from openai import OpenAI
+        return OpenAI(api_key=OPENAI_API_KEY)
+    return _get_client("openai", build)
+
+
+def get_twilio_client():
+    def build():
+        from twilio.rest import Client
+        return Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    return _get_client("twilio", build)
+
+
+def _reset_clients_after_fork():
+    # Parent's connection pools (and a lock another thread may have held) don't survive fork
+    global _clients_lock
+    _clients.clear()
+    _clients_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_clients_after_fork)
 
 # Setup logging
 logging.basicConfig(
@@ -26,3 +204,9 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+
+if not NGROK_URL:
+    logger.error(
+        "NGROK_URL is not set: Twilio can't reach the call/SMS callbacks and signed Twilio "
+        "requests will be rejected. Set it to this app's public URL."
+    )
@@ -0,0 +1,132 @@
+# File: autopair_chatbot/conversation.py
+import threading
+import time
+from collections import OrderedDict, deque
+from autopair_chatbot.config import (
+    CONVERSATION_MAX_LEADS, CONVERSATION_MAX_TURNS, CONVERSATION_TOKEN_BUDGET, CONVERSATION_SUMMARY_TOKENS,
+    CONVERSATION_IDLE_TTL
+)
+from autopair_chatbot.knowledge import estimate_tokens
+
+# Longest single message kept, so one rambling SMS can't eat the budget
+MAX_MESSAGE_CHARS = 600
+
+
+def _clip(text, max_chars):
+    text = " ".join((text or "").split())
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+class Conversation:
+    """Recent turns for one lead plus a rolling summary of older questions."""
+
+    __slots__ = ("turns", "summary", "updated_at")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.summary = ""
+        self.updated_at = time.monotonic()
+
+
+class ConversationStore:
+    """Bounded, LRU-evicted per-lead chat history.
+
+    Each lead keeps its last `max_turns` question/answer pairs. When a turn
+    falls off the ring its question is folded into a short summary line
+    (capped at `summary_tokens`), so the model still knows what was covered.
+    messages() returns the newest turns that fit `token_budget`.
+    """
+
+    def __init__(self, max_leads=CONVERSATION_MAX_LEADS, max_turns=CONVERSATION_MAX_TURNS,
+                 token_budget=CONVERSATION_TOKEN_BUDGET, summary_tokens=CONVERSATION_SUMMARY_TOKENS,
+                 idle_ttl=CONVERSATION_IDLE_TTL):
+        self.max_leads = max_leads
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.idle_ttl = idle_ttl
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_leads > 0 and self.max_turns > 0
+
+    def record(self, lead_id, question, answer):
+        if not self.enabled or not lead_id:
+            return
+        key = str(lead_id)
+        with self._lock:
+            conversation = self._get(key)
+            if conversation is None:
+                conversation = self._conversations[key] = Conversation(self.max_turns)
+            if len(conversation.turns) == self.max_turns:
+                self._summarize(conversation, conversation.turns[0][0])
+            conversation.turns.append((_clip(question, MAX_MESSAGE_CHARS), _clip(answer, MAX_MESSAGE_CHARS)))
+            conversation.updated_at = time.monotonic()
+            self._conversations.move_to_end(key)
+            while len(self._conversations) > self.max_leads:
+                self._conversations.popitem(last=False)
+                self.evictions += 1
+
+    def messages(self, lead_id):
+        """Chat messages (oldest first) for the newest turns within the token budget."""
+        if not self.enabled or not lead_id:
+            return []
+        with self._lock:
+            conversation = self._get(str(lead_id))
+            if conversation is None:
+                return []
+            turns = list(conversation.turns)
+            summary = conversation.summary
+
+        budget = self.token_budget
+        messages = []
+        for question, answer in reversed(turns):
+            cost = estimate_tokens(question) + estimate_tokens(answer)
+            if cost > budget:
+                break
+            messages[:0] = [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+            budget -= cost
+        if summary and estimate_tokens(summary) <= budget:
+            messages.insert(0, {"role": "system", "content": f"Earlier in this conversation the customer asked: {summary}"})
+        return messages
+
+    def last_question(self, lead_id):
+        with self._lock:
+            conversation = self._get(str(lead_id)) if lead_id else None
+            return conversation.turns[-1][0] if conversation and conversation.turns else ""
+
+    def clear(self, lead_id=None):
+        with self._lock:
+            if lead_id is None:
+                self._conversations.clear()
+            else:
+                self._conversations.pop(str(lead_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "conversations": len(self._conversations),
+                "turns": sum(len(c.turns) for c in self._conversations.values()),
+                "evictions": self.evictions
+            }
+
+    def _get(self, key):
+        conversation = self._conversations.get(key)
+        if conversation and time.monotonic() - conversation.updated_at > self.idle_ttl:
+            del self._conversations[key]
+            return None
+        return conversation
+
+    def _summarize(self, conversation, question):
+        summary = f"{conversation.summary}; {question}" if conversation.summary else question
+        # Keep the most recent questions when the summary outgrows its cap
+        max_chars = self.summary_tokens * 4
+        if len(summary) > max_chars:
+            summary = "…" + summary[-max_chars:].split("; ", 1)[-1]
+        conversation.summary = summary
+
+
+conversations = ConversationStore()
@@ -0,0 +1,289 @@
+# File: autopair_chatbot/dialer.py
+"""Paced outbound calling with a fixed number of specialist slots.
+
+"Call me now" requests and due callbacks are queued in SQLite. The dialer
+thread places a call only while fewer than DIALER_SLOTS calls are in
+progress; each call holds its slot until Twilio's status callback reports
+it finished (or DIALER_CALL_TIMEOUT passes). When a lead presses 1 in the
+IVR they are connected to the least busy number in SPECIALIST_NUMBERS.
+Inbound calls are routed the same way and hold a slot until their dial
+ends, so they count toward specialist load too.
+Leads who will wait more than DIALER_ETA_THRESHOLD get an estimate by SMS.
+
+All state lives in the database, so any web process can enqueue calls or
+record status callbacks.
+
+    python -m autopair_chatbot.dialer stats
+"""
+import argparse
+import json
+import math
+import sqlite3
+import threading
+import time
+from autopair_chatbot.config import (
+    DIALER_ENABLED, DIALER_DB_PATH, DIALER_SLOTS, SPECIALIST_NUMBERS, DIALER_AVG_CALL_SECONDS, DIALER_CALL_TIMEOUT,
+    DIALER_ETA_THRESHOLD, DIALER_POLL_INTERVAL, logger
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dial_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lead_id TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    source TEXT NOT NULL,
+    enqueued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS active_calls (
+    call_sid TEXT PRIMARY KEY,
+    lead_id TEXT NOT NULL,
+    destination TEXT,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS call_log (
+    call_sid TEXT PRIMARY KEY,
+    lead_id TEXT NOT NULL,
+    destination TEXT,
+    status TEXT NOT NULL,
+    duration INTEGER,
+    ended_at REAL NOT NULL
+);
+"""
+
+TERMINAL_STATUSES = {"completed", "busy", "no-answer", "failed", "canceled"}
+
+
+class Dialer:
+    def __init__(self, path, slots=DIALER_SLOTS, destinations=SPECIALIST_NUMBERS):
+        self.path = path
+        self.slots = slots
+        self.destinations = list(destinations)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def enqueue(self, lead_id, phone, source="request"):
+        """Queue a call. Returns the estimated wait in seconds."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = conn.execute("SELECT id FROM dial_queue WHERE lead_id = ?", (str(lead_id),)).fetchone()
+            if existing:
+                queue_id = existing[0]
+            else:
+                queue_id = conn.execute(
+                    "INSERT INTO dial_queue (lead_id, phone, source, enqueued_at) VALUES (?, ?, ?, ?)",
+                    (str(lead_id), phone, source, time.time())
+                ).lastrowid
+            ahead = conn.execute("SELECT COUNT(*) FROM dial_queue WHERE id < ?", (queue_id,)).fetchone()[0]
+            active = self._active_count(conn)
+            avg_call = self._avg_call_seconds(conn)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.estimate_wait(ahead, active, avg_call)
+
+    def estimate_wait(self, ahead, active, avg_call):
+        """Seconds until a call behind `ahead` queued calls gets a slot."""
+        free = max(self.slots - active, 0)
+        if ahead < free:
+            return 0
+        return math.ceil((ahead - free + 1) / self.slots) * avg_call
+
+    def dial_next(self):
+        """Place the oldest queued call if a slot is free. Returns True if a call was placed."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM active_calls WHERE expires_at <= ?", (time.time(),))
+            row = None
+            if self._active_count(conn) < self.slots:
+                row = conn.execute(
+                    "SELECT id, lead_id, phone, enqueued_at FROM dial_queue ORDER BY id LIMIT 1"
+                ).fetchone()
+            if row:
+                conn.execute("DELETE FROM dial_queue WHERE id = ?", (row[0],))
+                # Hold the slot under a placeholder until Twilio returns the call SID
+                placeholder = f"pending:{row[0]}"
+                now = time.time()
+                conn.execute(
+                    "INSERT INTO active_calls (call_sid, lead_id, status, started_at, expires_at) VALUES (?, ?, 'dialing', ?, ?)",
+                    (placeholder, row[1], now, now + DIALER_CALL_TIMEOUT)
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        if not row:
+            return False
+
+        from autopair_chatbot.call_handlers import place_call
+        queue_id, lead_id, phone, enqueued_at = row
+        try:
+            call_sid = place_call(lead_id, phone, status_callback=True)
+        except Exception as e:
+            logger.error(f"❌ Dialer failed to call lead {lead_id}: {e}")
+            self._finish(placeholder, "failed", None)
+            return True
+        self._execute(
+            "UPDATE active_calls SET call_sid = ?, status = 'queued' WHERE call_sid = ?",
+            (str(call_sid), placeholder)
+        )
+        logger.info(f"☎️ Dialer placed call to lead {lead_id} after {time.time() - enqueued_at:.0f}s in queue")
+        return True
+
+    def record_status(self, call_sid, status, duration=None, lead_id=None):
+        """Twilio call status callback. `lead_id` (from the callback URL) finds
+        a call whose SID hasn't been stored yet."""
+        if status in TERMINAL_STATUSES:
+            self._finish(call_sid, status, duration, lead_id)
+        else:
+            self._execute("UPDATE active_calls SET status = ? WHERE call_sid = ?", (status, call_sid))
+
+    def assign_destination(self, call_sid=None, lead_id=None):
+        """The specialist number with the fewest connected calls; recorded
+        against the call so its slot counts toward that number. A call the
+        dialer didn't place (inbound) is added under `lead_id`."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            busy = dict(conn.execute(
+                "SELECT destination, COUNT(*) FROM active_calls WHERE destination IS NOT NULL AND expires_at > ? "
+                "GROUP BY destination", (time.time(),)
+            ).fetchall())
+            destination = min(self.destinations, key=lambda number: (busy.get(number, 0), self.destinations.index(number)))
+            if call_sid:
+                updated = conn.execute(
+                    "UPDATE active_calls SET destination = ? WHERE call_sid = ?", (destination, call_sid)
+                ).rowcount
+                if not updated and lead_id:
+                    now = time.time()
+                    conn.execute(
+                        "INSERT INTO active_calls (call_sid, lead_id, destination, status, started_at, expires_at) "
+                        "VALUES (?, ?, ?, 'in-progress', ?, ?)",
+                        (call_sid, str(lead_id), destination, now, now + DIALER_CALL_TIMEOUT)
+                    )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return destination
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            now = time.time()
+            queued = conn.execute("SELECT COUNT(*), MIN(enqueued_at) FROM dial_queue").fetchone()
+            active = self._active_count(conn)
+            per_destination = dict(conn.execute(
+                "SELECT destination, COUNT(*) FROM active_calls WHERE destination IS NOT NULL AND expires_at > ? "
+                "GROUP BY destination", (now,)
+            ).fetchall())
+            outcomes = dict(conn.execute("SELECT status, COUNT(*) FROM call_log GROUP BY status").fetchall())
+            avg_call = self._avg_call_seconds(conn)
+        finally:
+            conn.close()
+        return {
+            "slots": self.slots,
+            "active_calls": active,
+            "queued": queued[0],
+            "oldest_queued_s": round(now - queued[1], 1) if queued[1] else None,
+            "per_destination": {number: per_destination.get(number, 0) for number in self.destinations},
+            "avg_call_s": round(avg_call, 1),
+            "outcomes": outcomes
+        }
+
+    def _finish(self, call_sid, status, duration, lead_id=None):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT call_sid, lead_id, destination FROM active_calls WHERE call_sid = ?", (call_sid,)
+            ).fetchone()
+            if not row and lead_id:
+                # Finished before dial_next stored the SID: release the placeholder instead
+                row = conn.execute(
+                    "SELECT call_sid, lead_id, destination FROM active_calls "
+                    "WHERE lead_id = ? AND call_sid LIKE 'pending:%' ORDER BY started_at LIMIT 1",
+                    (str(lead_id),)
+                ).fetchone()
+            if row:
+                conn.execute("DELETE FROM active_calls WHERE call_sid = ?", (row[0],))
+                conn.execute(
+                    "INSERT OR REPLACE INTO call_log (call_sid, lead_id, destination, status, duration, ended_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (call_sid, row[1], row[2], status, int(duration) if duration else None, time.time())
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _active_count(self, conn):
+        return conn.execute("SELECT COUNT(*) FROM active_calls WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def _avg_call_seconds(self, conn):
+        # Rolling average of the last 50 answered calls, seeded by the configured estimate
+        row = conn.execute(
+            "SELECT AVG(duration) FROM (SELECT duration FROM call_log WHERE duration > 0 ORDER BY ended_at DESC LIMIT 50)"
+        ).fetchone()
+        return row[0] or DIALER_AVG_CALL_SECONDS
+
+    def _execute(self, query, params):
+        conn = self._connect()
+        try:
+            conn.execute(query, params)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+
+dialer = Dialer(DIALER_DB_PATH) if DIALER_ENABLED else None
+
+
+def start_dialer():
+    if not dialer:
+        return
+    threading.Thread(target=dialer_loop, name="dialer", daemon=True).start()
+    logger.info(f"Dialer thread started ({dialer.slots} slots, {len(dialer.destinations)} specialist numbers)")
+
+
+def dialer_loop():
+    while True:
+        try:
+            if not dialer.dial_next():
+                time.sleep(DIALER_POLL_INTERVAL)
+        except Exception as e:
+            logger.error(f"Error in dialer: {e}")
+            time.sleep(DIALER_POLL_INTERVAL)
+
+
+def request_call(lead_id, phone, source="request"):
+    """Queue a call through the dialer; returns the estimated wait in seconds."""
+    wait = dialer.enqueue(lead_id, phone, source)
+    logger.info(f"☎️ Lead {lead_id} queued for a call ({source}), estimated wait {wait:.0f}s")
+    return wait
+
+
+def wait_message(wait_seconds):
+    """SMS for a lead waiting on the dialer; None when the call is about to go out."""
+    if wait_seconds < DIALER_ETA_THRESHOLD:
+        return None
+    minutes = max(1, round(wait_seconds / 60))
+    return f"Our specialists are busy right now. We'll call you in about {minutes} minute{'s' if minutes != 1 else ''}."
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m autopair_chatbot.dialer", description="Inspect the call dialer")
+    parser.add_argument("--db", default=DIALER_DB_PATH, help="dialer database path")
+    parser.add_argument("command", choices=["stats"])
+    args = parser.parse_args(argv)
+    print(json.dumps(Dialer(args.db).stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# File: autopair_chatbot/fast_answers.py
+"""Answer common warranty questions from templates, without calling OpenAI.
+
+Each intent lists strong cue phrases (worth a full point) and weak hints. A
+question is answered locally only when exactly one intent clears
+FAST_ANSWER_THRESHOLD; anything ambiguous or compound goes to the model.
+
+A cue only counts when it is the topic of the question: a negated cue ("I
+don't want to cancel") is ignored, and an intent's `conflicts` words (other
+topics such as towing or a covered part) scale its score down, so "how much
+is towing covered?" goes to the model instead of getting the price list.
+Generic `topic_phrases` ("cost") only count when the question also names
+the warranty or a plan, so "cost" on its own isn't taken as a price question.
+"""
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from autopair_chatbot.config import FAST_ANSWERS, FAST_ANSWER_THRESHOLD, logger
+from autopair_chatbot.plans import get_plan_rules
+
+
+def _plan_lines(plans, fact, fmt):
+    plan_facts = get_plan_rules().plans
+    names = [name for name in plans if name in plan_facts] or list(plan_facts)
+    return "; ".join(fmt.format(name=name, value=plan_facts[name][fact]) for name in names)
+
+
+INTENTS = {
+    "cancel": {
+        "phrases": ["cancel", "cancellation", "refund", "money back"],
+        "hints": ["change my mind", "return"],
+        "conflicts": ["buy", "purchase", "tow", "truck", "rental", "repair", "mechanic", "shop", "covered",
+                      "call", "specialist", "appointment"],
+        "answer": lambda plans: (
+            "You can cancel within 10 days of purchase if no claims have been made ($99 fee). "
+            "After 10 days, plans are non-cancellable and non-refundable."
+        )
+    },
+    "deductible": {
+        "phrases": ["deductible", "out of pocket"],
+        "hints": ["pay per repair", "copay"],
+        "conflicts": ["tow", "towing", "rental", "trip"],
+        "answer": lambda plans: "There's a $0 deductible on every Autopair plan, so you pay nothing extra per covered repair."
+    },
+    "waiting_period": {
+        "phrases": ["waiting period", "wait period", "coverage start", "coverage begin", "when start", "when begin"],
+        "hints": ["how soon", "right away", "immediately", "wait"],
+        "conflicts": ["covered", "what cover", "call", "specialist", "hold"],
+        "answer": lambda plans: (
+            "Coverage begins 30 days and 1,500 km after your purchase date. Claims can't be made before then."
+        )
+    },
+    "transfer": {
+        "phrases": ["transfer", "transferable", "new owner"],
+        "hints": ["sell car", "sell vehicle", "sell it"],
+        "conflicts": ["call", "specialist", "agent", "person", "someone", "money", "payment"],
+        "answer": lambda plans: "Yes! Plans are fully transferable to the next owner if you sell the car. Just contact support."
+    },
+    "claim_limit": {
+        "phrases": ["claim limit", "repair limit", "max per claim", "maximum per claim", "limit per claim",
+                    "how many claims"],
+        "hints": ["limit", "maximum", "max"],
+        "conflicts": ["engine", "transmission", "tow", "towing", "rental"],
+        "answer": lambda plans: (
+            "There's no limit on the number of claims. The max per claim is "
+            + _plan_lines(plans, "repair_limit", "{value} ({name})")
+            + ", and total claims can't exceed what you paid for the vehicle."
+        )
+    },
+    "price": {
+        "phrases": ["how much", "price", "monthly payment", "bi weekly"],
+        "topic_phrases": ["cost"],
+        "hints": ["payment", "pay", "expensive", "afford"],
+        "conflicts": ["cover", "tow", "towing", "fix", "transmission", "engine", "rental", "part", "mechanic", "shop"],
+        "answer": lambda plans: "Your options: " + _plan_lines(plans, "price", "{name}: {value}") + ". $0 deductible on all plans."
+    },
+    "term": {
+        "phrases": ["how long plan", "how long warranty", "how long last", "duration", "how many months"],
+        "hints": ["long", "km", "years"],
+        "answer": lambda plans: "Plan terms: " + _plan_lines(plans, "term", "{name}: {value}") + "."
+    },
+    "inspection": {
+        "phrases": ["inspection", "inspect"],
+        "hints": [],
+        "conflicts": ["cover", "fee", "shop", "mechanic", "used", "offer", "service"],
+        "answer": lambda plans: "No inspection is needed to buy a plan. One is only required when you make a claim."
+    },
+    "maintenance": {
+        "phrases": ["oil change", "maintenance", "maintain"],
+        "hints": ["oil", "service"],
+        "conflicts": ["cover", "pay for", "free", "included"],
+        "answer": lambda plans: "Yes, to keep coverage valid you'll need an oil + filter change every 6 months or 12,000 km."
+    },
+    "repair_shop": {
+        "phrases": ["any shop", "own mechanic", "my mechanic", "any mechanic", "repair shop", "which shop"],
+        "hints": ["mechanic", "shop", "garage", "dealer"],
+        "answer": lambda plans: (
+            "You can take your vehicle to ANY licensed repair facility in Canada or the USA. "
+            "You're not limited to dealers or pre-approved shops."
+        )
+    }
+}
+
+HINT_WEIGHT = 0.4
+TOPIC_WORDS = ["plan", "warranty", "coverage", "works", "standard"]
+CONFLICT_WEIGHT = 0.5
+NEGATIONS = ["not", "no", "never", "don", "dont", "doesn", "doesnt", "won", "wont", "didn", "didnt"]
+FILLER_WORDS = {"is", "it", "the", "a", "an", "my", "i", "do", "does", "will", "can", "of", "for", "to", "if", "there"}
+
+
+def _normalize(question):
+    text = re.sub(r"[^\w\s$]", " ", question.lower().replace("-", " "))
+    words = [word for word in text.split() if word not in FILLER_WORDS]
+    return words, " ".join(words)
+
+
+@lru_cache(maxsize=None)
+def _phrase_pattern(phrase):
+    words = [re.escape(word) for word in phrase.split() if word not in FILLER_WORDS]
+    return re.compile(r"\b" + r"\w*\b.*?\b".join(words) + r"\w*\b")
+
+
+@lru_cache(maxsize=None)
+def _negated_pattern(phrase):
+    # A negation up to three words before the phrase
+    negation = r"\b(?:" + "|".join(NEGATIONS) + r")\b(?:\s+\w+){0,3}?\s+"
+    return re.compile(negation + _phrase_pattern(phrase).pattern)
+
+
+def _contains(text, phrase):
+    """Phrase words appear in order (other words may sit between them)."""
+    return _phrase_pattern(phrase).search(text) is not None
+
+
+def _cue(text, phrase):
+    """The phrase appears and isn't negated."""
+    return _contains(text, phrase) and _negated_pattern(phrase).search(text) is None
+
+
+def score_intents(question):
+    """(intent, confidence) pairs, best first.
+
+    Confidence is 1.0 for a strong (non-negated) cue, HINT_WEIGHT per weak
+    hint, times CONFLICT_WEIGHT if the question mentions another topic, and
+    is scaled down for long messages, which tend to ask more than one thing.
+    """
+    words, text = _normalize(question)
+    damping = min(1.0, 10 / max(len(words), 1))
+    scored = []
+    for name, intent in INTENTS.items():
+        on_topic = any(_contains(text, word) for word in TOPIC_WORDS)
+        phrases = intent["phrases"] + (intent.get("topic_phrases", []) if on_topic else [])
+        score = 1.0 if any(_cue(text, phrase) for phrase in phrases) else 0.0
+        score += HINT_WEIGHT * sum(1 for hint in intent["hints"] if _cue(text, hint))
+        score = min(score, 1.0)
+        if any(_contains(text, word) for word in intent.get("conflicts", [])):
+            score *= CONFLICT_WEIGHT
+        if score:
+            scored.append((name, round(score * damping, 3)))
+    scored.sort(key=lambda pair: -pair[1])
+    return scored
+
+
+class AnswerEngine:
+    """Local templated answers for high-confidence FAQ intents."""
+
+    def __init__(self, threshold=FAST_ANSWER_THRESHOLD, enabled=FAST_ANSWERS):
+        self.threshold = threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._intents = Counter()
+
+    def match(self, question):
+        """The single confident intent for a question, or None."""
+        confident = [(name, score) for name, score in score_intents(question) if score >= self.threshold]
+        if len(confident) != 1:
+            return None
+        return confident[0]
+
+    def answer(self, question, plans=""):
+        """Templated answer, or None to let the model answer."""
+        if not self.enabled:
+            return None
+        match = self.match(question)
+        if not match:
+            return None
+        intent, confidence = match
+        plan_names = [name.strip() for name in (plans or "").split(",") if name.strip()]
+        logger.info(f"⚡ Fast answer: {intent} (confidence {confidence})")
+        with self._lock:
+            self._counts["fast"] += 1
+            self._intents[intent] += 1
+        return INTENTS[intent]["answer"](plan_names)
+
+    def record_llm(self):
+        logger.info("🤖 Question routed to the AI model")
+        with self._lock:
+            self._counts["llm"] += 1
+
+    def stats(self):
+        with self._lock:
+            total = self._counts["fast"] + self._counts["llm"]
+            return {
+                "fast": self._counts["fast"],
+                "llm": self._counts["llm"],
+                "fast_rate": round(self._counts["fast"] / total, 3) if total else 0.0,
+                "intents": dict(self._intents)
+            }
+
+
+answer_engine = AnswerEngine()
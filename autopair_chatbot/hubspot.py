@@ -1,31 +1,124 @@
 # File: autopair_chatbot/hubspot.py
 from flask import request, jsonify
+import base64
+import hashlib
+import hmac
+import threading
 import time
 import json
+import os
 import re
 import requests
-from autopair_chatbot.config import HUBSPOT_API_KEY, logger
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from autopair_chatbot.config import (
+    HUBSPOT_API_KEY, HUBSPOT_BASE_URL, HUBSPOT_CONNECT_TIMEOUT, HUBSPOT_READ_TIMEOUT,
+    HUBSPOT_POOL_CONNECTIONS, HUBSPOT_POOL_MAXSIZE, HUBSPOT_WRITE_BEHIND,
+    HUBSPOT_WEBHOOK_SECRET, HUBSPOT_WEBHOOK_MAX_AGE_MS, NGROK_URL, logger
+)
+from autopair_chatbot.phone_index import phone_index
+from autopair_chatbot.lead_store import lead_store
 
+# Contact properties the bot reads on every path
+LEAD_PROPERTIES = [
+    "firstname", "lastname", "phone", "email",
+    "vehicle_make", "vehicle_model", "vehicle_year", "vehicle_mileage",
+    "autopair_processed", "autopair_status", "autopair_qualified_plans",
+    "hs_object_id", "lifecyclestage"
+]
+
+# Property changes that can make a contact ready for qualification
+WEBHOOK_TRIGGER_PROPERTIES = {"phone", "vehicle_year", "vehicle_mileage", "lifecyclestage"}
+
+_seen_webhook_events = OrderedDict()
+_seen_webhook_lock = threading.Lock()
+
+
+class HubSpotClient:
+    """Shared HubSpot API client backed by a pooled keep-alive session.
+
+    Auth headers are set once on the session and every request gets a
+    (connect, read) timeout so a stuck HubSpot can't hang a worker. The
+    session is opened on first use, and again in a forked child so processes
+    never share pooled sockets.
+    """
+
+    def __init__(self, api_key, base_url=HUBSPOT_BASE_URL,
+                 connect_timeout=HUBSPOT_CONNECT_TIMEOUT, read_timeout=HUBSPOT_READ_TIMEOUT,
+                 pool_connections=HUBSPOT_POOL_CONNECTIONS, pool_maxsize=HUBSPOT_POOL_MAXSIZE):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.request_count = 0
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._open_session()
+        return self._session
+
+    def _open_session(self):
+        session = requests.Session()
+        session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        # Retries stay in the call sites so their logging/backoff is unchanged
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def reset_after_fork(self):
+        self._session = None
+        self._lock = threading.Lock()
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self.request_count += 1
+        return self.session.request(method, f"{self.base_url}{path}", **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+
+hubspot_client = HubSpotClient(HUBSPOT_API_KEY)
+os.register_at_fork(after_in_child=hubspot_client.reset_after_fork)
+
+
+def fetch_lead_details(lead_id, max_retries=3, refresh=False):
+    """The lead's properties; `refresh` skips the local store and reads HubSpot."""
+    if lead_store and not refresh:
+        local = lead_store.get(lead_id)
+        if local:
+            return local
 
-def fetch_lead_details(lead_id, max_retries=3):
-    url = f"https://api.hubapi.com/crm/v3/objects/contacts/{lead_id}"
-    headers = {
-        "Authorization": f"Bearer {HUBSPOT_API_KEY}",
-        "Content-Type": "application/json"
-    }
     params = {
-        "properties": ",".join([
-            "firstname", "lastname", "phone", "email",
-            "vehicle_make", "vehicle_model", "vehicle_year", "vehicle_mileage",
-            "autopair_processed", "autopair_status", "autopair_qualified_plans",
-            "hs_object_id"
-        ])
+        "properties": ",".join(LEAD_PROPERTIES)
     }
     for attempt in range(1, max_retries + 1):
         try:
-            response = requests.get(url, headers=headers, params=params)
+            requested_at = int(time.time() * 1000)
+            response = hubspot_client.get(f"/crm/v3/objects/contacts/{lead_id}", params=params)
             response.raise_for_status()
-            return response.json()
+            lead = response.json()
+            if lead_store:
+                lead_store.upsert(lead, requested_at)
+                return lead_store.get(lead_id) or lead
+            return lead
         except requests.exceptions.RequestException as e:
             logger.warning(f"HubSpot fetch attempt {attempt} failed: {e}")
             time.sleep(2)
@@ -33,15 +126,35 @@ def fetch_lead_details(lead_id, max_retries=3):
 
 
 def update_lead_in_hubspot(lead_id, update_data, max_retries=3):
+    """True once HubSpot has the update, False if it failed, None if the
+    contact doesn't exist (404). With HUBSPOT_WRITE_BEHIND, a Future of that."""
+    if HUBSPOT_WRITE_BEHIND:
+        # Returns a Future resolving to True/False once the batch is flushed
+        from autopair_chatbot.write_queue import queue_lead_update
+        def on_flushed(future):
+            if future.exception() is None and future.result():
+                apply_local_update(lead_id, update_data)
+        return queue_lead_update(lead_id, update_data, callback=on_flushed)
+    updated = _patch_lead(lead_id, update_data, max_retries)
+    if updated:
+        apply_local_update(lead_id, update_data)
+    return updated
+
+
+def apply_local_update(lead_id, update_data):
+    """Reflect a write HubSpot accepted in the local read paths (ahead of
+    search-index lag)."""
+    properties = update_data.get("properties", {})
+    if lead_store:
+        lead_store.apply_update(lead_id, properties)
+    phone_index.update_properties(lead_id, properties)
+
+
+def _patch_lead(lead_id, update_data, max_retries=3):
     logger.info(f"🔄 Updating HubSpot (lead_id: {lead_id}):\n{json.dumps(update_data, indent=2)}")
-    url = f"https://api.hubapi.com/crm/v3/objects/contacts/{lead_id}"
-    headers = {
-        "Authorization": f"Bearer {HUBSPOT_API_KEY}",
-        "Content-Type": "application/json"
-    }
     for attempt in range(1, max_retries + 1):
         try:
-            response = requests.patch(url, headers=headers, json=update_data)
+            response = hubspot_client.patch(f"/crm/v3/objects/contacts/{lead_id}", json=update_data)
             response.raise_for_status()
             logger.info(f"✅ HubSpot update successful for lead {lead_id}")
             return True
@@ -50,7 +163,7 @@ def update_lead_in_hubspot(lead_id, update_data, max_retries=3):
             message = http_err.response.text
             if status_code == 404:
                 logger.warning(f"⚠️ Lead {lead_id} not found (404). Skipping update.")
-                return False
+                return None
             elif status_code == 429:
                 logger.warning(f"🔁 Rate limited (429). Retrying after 2s... [Attempt {attempt}]")
                 time.sleep(2)
@@ -67,48 +180,211 @@ def update_lead_in_hubspot(lead_id, update_data, max_retries=3):
     return False
 
 
+def batch_update_leads(inputs, max_retries=3):
+    """Update up to 100 contacts in one call.
+
+    `inputs` is a list of {"id": ..., "properties": {...}}. Returns a dict
+    mapping each lead id to True/False, or None when the contact doesn't
+    exist (as `update_lead_in_hubspot` does for a 404).
+    """
+    ids = [str(item["id"]) for item in inputs]
+    if not ids:
+        return {}
+    logger.info(f"🔄 Batch updating {len(ids)} HubSpot contacts")
+    for attempt in range(1, max_retries + 1):
+        try:
+            response = hubspot_client.post("/crm/v3/objects/contacts/batch/update", json={"inputs": inputs})
+            response.raise_for_status()
+            body = response.json()
+            outcome = {lead_id: False for lead_id in ids}
+            for result in body.get("results", []):
+                outcome[str(result.get("id"))] = True
+            for error in body.get("errors", []):
+                logger.warning(f"⚠️ Batch update error: {error.get('message')}")
+                if error.get("category") == "OBJECT_NOT_FOUND":
+                    for lead_id in error.get("context", {}).get("ids", []):
+                        outcome[str(lead_id)] = None
+            logger.info(f"✅ Batch update: {sum(1 for ok in outcome.values() if ok)}/{len(ids)} contacts updated")
+            return outcome
+        except requests.exceptions.HTTPError as http_err:
+            status_code = http_err.response.status_code
+            if status_code == 429 or status_code in [502, 503, 504]:
+                logger.warning(f"🔁 Batch update got {status_code}. Retrying... [Attempt {attempt}]")
+                time.sleep(2 * attempt)
+            elif status_code == 404 and len(inputs) == 1:
+                logger.warning(f"⚠️ Lead {ids[0]} not found (404). Skipping update.")
+                return {ids[0]: None}
+            elif status_code in (400, 404) and len(inputs) > 1:
+                # One bad id or property rejects the whole batch, so isolate it
+                logger.warning(f"⚠️ Batch update rejected ({http_err.response.text}). Falling back to single updates.")
+                return {str(item["id"]): _patch_lead(item["id"], {"properties": item["properties"]}, max_retries)
+                        for item in inputs}
+            else:
+                logger.error(f"❌ Batch update failed (Status: {status_code}): {http_err.response.text}")
+                break
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Connection error in batch update: {e}")
+            time.sleep(1)
+    logger.error(f"❌ Batch update of {len(ids)} contacts failed.")
+    return {lead_id: False for lead_id in ids}
+
+
+def batch_read_leads(lead_ids, properties=LEAD_PROPERTIES):
+    """Read up to 100 contacts in one call."""
+    if not lead_ids:
+        return []
+    response = hubspot_client.post("/crm/v3/objects/contacts/batch/read", json={
+        "properties": properties,
+        "inputs": [{"id": str(lead_id)} for lead_id in lead_ids]
+    })
+    response.raise_for_status()
+    return response.json().get("results", [])
+
+
 def find_lead_by_phone(phone):
-    phone_clean = re.sub(r'\D', '', phone)
-    url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    headers = {
-        "Authorization": f"Bearer {HUBSPOT_API_KEY}",
-        "Content-Type": "application/json"
-    }
+    cached = phone_index.get(phone)
+    if cached:
+        return cached
+    if lead_store:
+        local = lead_store.find_by_phone(phone)
+        if local:
+            phone_index.put(local, phone)
+            return local
+
     search_patterns = [phone]
     if phone.startswith("+"):
         search_patterns.append(phone[1:])
     if phone.startswith("+1") and len(phone) == 12:
         search_patterns.append(phone[2:])
 
-    for pattern in search_patterns:
-        data = {
-            "filterGroups": [{
-                "filters": [{
-                    "propertyName": "phone",
-                    "operator": "CONTAINS_TOKEN",
-                    "value": pattern
-                }]
-            }],
-            "properties": [
-                "firstname", "lastname", "phone", "email",
-                "vehicle_make", "vehicle_model", "vehicle_year", "vehicle_mileage",
-                "autopair_processed", "autopair_status", "autopair_qualified_plans",
-                "hs_object_id"
-            ],
-            "limit": 1
-        }
-        try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            results = response.json().get("results", [])
-            if results:
-                return results[0]
-        except requests.exceptions.RequestException as e:
-            logger.error(f"HubSpot search failed: {e}")
-    return None
+    # Filter groups are OR'ed, so every pattern goes out in a single search
+    data = {
+        "filterGroups": [{
+            "filters": [{
+                "propertyName": "phone",
+                "operator": "CONTAINS_TOKEN",
+                "value": pattern
+            }]
+        } for pattern in search_patterns],
+        "properties": LEAD_PROPERTIES,
+        "limit": len(search_patterns)
+    }
+    try:
+        response = hubspot_client.post("/crm/v3/objects/contacts/search", json=data)
+        response.raise_for_status()
+        results = response.json().get("results", [])
+    except requests.exceptions.RequestException as e:
+        logger.error(f"HubSpot search failed: {e}")
+        return None
+    if not results:
+        return None
+
+    # Keep the old pattern priority: exact match first, then looser forms
+    def rank(result):
+        stored = re.sub(r'\D', '', result.get("properties", {}).get("phone") or "")
+        for position, pattern in enumerate(search_patterns):
+            if stored == re.sub(r'\D', '', pattern):
+                return position
+        return len(search_patterns)
+
+    lead = min(results, key=rank)
+    if lead_store:
+        lead_store.upsert(lead)
+        lead = lead_store.get(lead["id"]) or lead
+    phone_index.put(lead, phone)
+    return lead
+
+
+def verify_hubspot_signature(secret, method, uri, body, timestamp, signature):
+    """Check a HubSpot v3 webhook signature (HMAC-SHA256 over method + uri + body + timestamp)."""
+    if not (secret and timestamp and signature):
+        return False
+    try:
+        age_ms = time.time() * 1000 - int(timestamp)
+    except ValueError:
+        return False
+    # Future-dated timestamps are replays too
+    if abs(age_ms) > HUBSPOT_WEBHOOK_MAX_AGE_MS:
+        return False
+    source = f"{method}{uri}{body}{timestamp}".encode("utf-8")
+    expected = base64.b64encode(hmac.new(secret.encode("utf-8"), source, hashlib.sha256).digest()).decode()
+    return hmac.compare_digest(expected, signature)
+
+
+def _is_new_webhook_event(event_id, max_events=10000):
+    if event_id is None:
+        return True
+    with _seen_webhook_lock:
+        if event_id in _seen_webhook_events:
+            return False
+        _seen_webhook_events[event_id] = True
+        while len(_seen_webhook_events) > max_events:
+            _seen_webhook_events.popitem(last=False)
+    return True
+
+
+def forget_webhook_events(events):
+    """Un-see a batch so HubSpot's retry of it is processed."""
+    with _seen_webhook_lock:
+        for event in events:
+            _seen_webhook_events.pop(event.get("eventId"), None)
+
+
+def extract_webhook_lead_ids(events):
+    """Lead IDs worth processing from a batch of webhook events, deduped and in arrival order."""
+    lead_ids = []
+    for event in events:
+        if not _is_new_webhook_event(event.get("eventId")):
+            continue
+        lead_id = str(event.get("objectId", ""))
+        if not lead_id:
+            continue
+        subscription = event.get("subscriptionType")
+        if subscription == "contact.propertyChange":
+            prop = event.get("propertyName", "")
+            if not prop.startswith("autopair_"):
+                phone_index.invalidate_lead(lead_id)
+                if lead_store:
+                    lead_store.invalidate(lead_id)
+            if prop not in WEBHOOK_TRIGGER_PROPERTIES:
+                continue
+        elif subscription != "contact.creation":
+            continue
+        if lead_id not in lead_ids:
+            lead_ids.append(lead_id)
+    return lead_ids
 
 
 def hubspot_webhook():
-    data = request.json
-    logger.info(f"📥 Received HubSpot webhook: {data}")
-    return jsonify({"status": "received"}), 200
+    if not HUBSPOT_WEBHOOK_SECRET:
+        data = request.json
+        logger.info(f"📥 Received HubSpot webhook: {data}")
+        return jsonify({"status": "received"}), 200
+
+    body = request.get_data(as_text=True)
+    uri = f"{NGROK_URL}{request.full_path.rstrip('?')}"
+    if not verify_hubspot_signature(
+        HUBSPOT_WEBHOOK_SECRET, request.method, uri, body,
+        request.headers.get("X-HubSpot-Request-Timestamp"),
+        request.headers.get("X-HubSpot-Signature-v3")
+    ):
+        logger.warning("⚠️ Rejected HubSpot webhook with invalid signature")
+        return jsonify({"status": "error", "message": "Invalid signature"}), 401
+
+    try:
+        events = json.loads(body)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid JSON"}), 400
+    if isinstance(events, dict):
+        events = [events]
+
+    from autopair_chatbot.lead_monitor import dispatch_lead
+    lead_ids = extract_webhook_lead_ids(events)
+    for lead_id in lead_ids:
+        # Don't hold the request thread waiting for room; HubSpot retries on 5xx
+        if not dispatch_lead(lead_id, source="webhook", block_timeout=0):
+            forget_webhook_events(events)
+            logger.warning(f"⚠️ Lead queue full; asking HubSpot to retry webhook batch ({len(events)} events)")
+            return jsonify({"status": "error", "message": "Busy, retry later"}), 503
+    logger.info(f"📥 HubSpot webhook: {len(events)} events, {len(lead_ids)} leads dispatched")
+    return jsonify({"status": "received", "dispatched": len(lead_ids)}), 200
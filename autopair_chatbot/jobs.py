@@ -0,0 +1,447 @@
+# File: autopair_chatbot/jobs.py
+import argparse
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from autopair_chatbot.config import (
+    JOBS_ENABLED, JOB_DB_PATH, JOB_MAX_ATTEMPTS, JOB_BACKOFF_BASE, JOB_BACKOFF_MAX,
+    JOB_POLL_INTERVAL, JOB_VISIBILITY_TIMEOUT, JOB_WORKERS, logger
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    next_run_at REAL NOT NULL,
+    locked_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    order_key TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_next_run ON jobs (status, next_run_at);
+CREATE TABLE IF NOT EXISTS dead_jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+_handlers = {}
+_order_fields = {}
+_mergers = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying can't help; the job is dead-lettered
+    right away."""
+
+
+def job_handler(kind, order_by=None):
+    """Register a handler. It gets the payload dict and returns truthy on success;
+    returning falsy or raising schedules a retry (PermanentJobError doesn't).
+
+    Jobs sharing the `order_by` payload field run one at a time, oldest first,
+    even across several drainers.
+    """
+    def register(func):
+        _handlers[kind] = func
+        if order_by:
+            _order_fields[kind] = order_by
+        return func
+    return register
+
+
+def job_merger(kind):
+    """Register how to fold a newer payload into an older one with the same
+    order key. A new job is merged into the pending one, and a failed job into
+    a newer pending one, so a retried older write can never land after a newer
+    one."""
+    def register(func):
+        _mergers[kind] = func
+        return func
+    return register
+
+
+def _order_key(kind, payload):
+    field = _order_fields.get(kind)
+    return f"{kind}:{payload[field]}" if field else None
+
+
+def backoff_delay(attempts, base=JOB_BACKOFF_BASE, cap=JOB_BACKOFF_MAX):
+    """Exponential backoff with equal jitter: half fixed, half random."""
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class JobQueue:
+    """SQLite-backed job queue. Claims are atomic, so several drainers
+    (threads or processes) can share one database file."""
+
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "order_key" not in columns:
+                # Databases created before per-lead ordering
+                conn.execute("ALTER TABLE jobs ADD COLUMN order_key TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_order_key ON jobs (order_key, status)")
+        finally:
+            conn.close()
+
+    def enqueue(self, kind, payload, max_attempts=JOB_MAX_ATTEMPTS, delay=0):
+        now = time.time()
+        order_key = _order_key(kind, payload)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            pending = conn.execute(
+                "SELECT id, payload FROM jobs WHERE order_key = ? AND status = 'pending'", (order_key,)
+            ).fetchone() if kind in _mergers else None
+            if pending:
+                merged = _mergers[kind](json.loads(pending[1]), payload)
+                conn.execute("UPDATE jobs SET payload = ? WHERE id = ?", (json.dumps(merged), pending[0]))
+                job_id = pending[0]
+            else:
+                job_id = conn.execute(
+                    "INSERT INTO jobs (kind, payload, max_attempts, next_run_at, created_at, order_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, json.dumps(payload), max_attempts, now + delay, now, order_key)
+                ).lastrowid
+            conn.execute("COMMIT")
+            return job_id
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self):
+        """Lease the next due job, or return None."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # A job waits while an older one with its order key is queued or running
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts, max_attempts FROM jobs AS job "
+                "WHERE ((status = 'pending' AND next_run_at <= ?) OR (status = 'running' AND locked_until <= ?)) "
+                "AND (order_key IS NULL OR NOT EXISTS "
+                "(SELECT 1 FROM jobs AS older WHERE older.order_key = job.order_key AND older.id < job.id)) "
+                "ORDER BY next_run_at LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ? WHERE id = ?",
+                    (now + JOB_VISIBILITY_TIMEOUT, row[0])
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        if not row:
+            return None
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2]),
+                "attempts": row[3] + 1, "max_attempts": row[4]}
+
+    def extend(self, job_id):
+        """Push a running job's lease out another JOB_VISIBILITY_TIMEOUT."""
+        self._execute(
+            "UPDATE jobs SET locked_until = ? WHERE id = ? AND status = 'running'",
+            (time.time() + JOB_VISIBILITY_TIMEOUT, job_id)
+        )
+
+    def complete(self, job_id):
+        self._execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail(self, job, error, permanent=False):
+        if permanent or job["attempts"] >= job["max_attempts"]:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT OR REPLACE INTO dead_jobs (id, kind, payload, attempts, last_error, created_at, failed_at) "
+                    "SELECT id, kind, payload, attempts, ?, created_at, ? FROM jobs WHERE id = ?",
+                    (error, time.time(), job["id"])
+                )
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+            logger.error(f"☠️ Job {job['id']} ({job['kind']}) dead-lettered after {job['attempts']} attempts: {error}")
+            return
+        order_key = _order_key(job["kind"], job["payload"])
+        if job["kind"] in _mergers and self._fold_into_newer(job, order_key):
+            logger.warning(f"🔁 Job {job['id']} ({job['kind']}) failed; merged into the lead's newer pending job")
+            return
+        delay = backoff_delay(job["attempts"])
+        self._execute(
+            "UPDATE jobs SET status = 'pending', next_run_at = ?, locked_until = NULL, last_error = ? WHERE id = ?",
+            (time.time() + delay, error, job["id"])
+        )
+        logger.warning(f"🔁 Job {job['id']} ({job['kind']}) failed [Attempt {job['attempts']}]; retrying in {delay:.1f}s")
+
+    def _fold_into_newer(self, job, order_key):
+        """Merge a failed job under the lead's newer pending job (the newer
+        values win) and drop it. Returns False when there is none."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            newer = conn.execute(
+                "SELECT id, payload FROM jobs WHERE order_key = ? AND status = 'pending' AND id != ?",
+                (order_key, job["id"])
+            ).fetchone()
+            if newer:
+                merged = _mergers[job["kind"]](job["payload"], json.loads(newer[1]))
+                conn.execute("UPDATE jobs SET payload = ? WHERE id = ?", (json.dumps(merged), newer[0]))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))
+            conn.execute("COMMIT")
+            return newer is not None
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def replay(self, dead_job_id):
+        """Move a dead-lettered job back onto the queue with fresh attempts."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT kind, payload FROM dead_jobs WHERE id = ?", (dead_job_id,)).fetchone()
+            if row:
+                now = time.time()
+                conn.execute(
+                    "INSERT INTO jobs (kind, payload, max_attempts, next_run_at, created_at, order_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (row[0], row[1], JOB_MAX_ATTEMPTS, now, now, _order_key(row[0], json.loads(row[1])))
+                )
+                conn.execute("DELETE FROM dead_jobs WHERE id = ?", (dead_job_id,))
+            conn.execute("COMMIT")
+            return row is not None
+        finally:
+            conn.close()
+
+    def list_jobs(self, dead=False, limit=50):
+        if dead:
+            query = "SELECT id, kind, payload, attempts, last_error, failed_at FROM dead_jobs ORDER BY failed_at DESC LIMIT ?"
+            columns = ["id", "kind", "payload", "attempts", "last_error", "failed_at"]
+        else:
+            query = "SELECT id, kind, payload, attempts, last_error, next_run_at FROM jobs ORDER BY next_run_at LIMIT ?"
+            columns = ["id", "kind", "payload", "attempts", "last_error", "next_run_at"]
+        conn = self._connect()
+        try:
+            return [dict(zip(columns, row)) for row in conn.execute(query, (limit,))]
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            dead = conn.execute("SELECT COUNT(*) FROM dead_jobs").fetchone()[0]
+        finally:
+            conn.close()
+        return {"pending": counts.get("pending", 0), "running": counts.get("running", 0), "dead": dead}
+
+    def run_one(self):
+        """Claim and run a single job. Returns False when nothing was due."""
+        job = self.claim()
+        if not job:
+            return False
+        handler = _handlers.get(job["kind"])
+        # Keep the lease while the handler runs so a slow job isn't claimed twice
+        finished = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job["id"], finished), daemon=True).start()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job['kind']!r}")
+            result = handler(job["payload"])
+            if isinstance(result, Future):
+                result = result.result(timeout=JOB_VISIBILITY_TIMEOUT)
+            if not result:
+                raise RuntimeError("handler reported failure")
+        except PermanentJobError as e:
+            self.fail(job, str(e), permanent=True)
+        except Exception as e:
+            self.fail(job, str(e))
+        else:
+            self.complete(job["id"])
+            logger.info(f"✅ Job {job['id']} ({job['kind']}) done")
+        finally:
+            finished.set()
+        return True
+
+    def _heartbeat(self, job_id, finished):
+        while not finished.wait(JOB_VISIBILITY_TIMEOUT / 3):
+            try:
+                self.extend(job_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not extend the lease on job {job_id}: {e}")
+
+    def _execute(self, query, params):
+        conn = self._connect()
+        try:
+            conn.execute(query, params)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(JOB_DB_PATH)
+        return _job_queue
+
+
+def start_job_drainer(workers=JOB_WORKERS):
+    """Start `workers` drainer threads. Claims are atomic and per-lead/per-
+    recipient jobs stay in order, so they can share the queue freely."""
+    if not JOBS_ENABLED:
+        return
+    for n in range(workers):
+        threading.Thread(target=job_drainer_loop, name=f"job-drainer-{n}", daemon=True).start()
+    logger.info(f"{workers} job drainer threads started ({JOB_DB_PATH})")
+
+
+def job_drainer_loop():
+    queue = get_job_queue()
+    while True:
+        try:
+            if not queue.run_one():
+                time.sleep(JOB_POLL_INTERVAL)
+        except Exception as e:
+            logger.error(f"Error in job drainer: {e}")
+            time.sleep(JOB_POLL_INTERVAL)
+
+
+# === Outbound side effects ===
+
+@job_handler("send_sms", order_by="to")
+def _send_sms_job(payload):
+    from autopair_chatbot.utils import send_sms
+    return send_sms(payload["to"], payload["body"], max_retries=1)
+
+
+@job_handler("update_contact", order_by="lead_id")
+def _update_contact_job(payload):
+    from autopair_chatbot.hubspot import update_lead_in_hubspot
+    updated = update_lead_in_hubspot(payload["lead_id"], payload["update_data"], max_retries=1)
+    if isinstance(updated, Future):
+        updated = updated.result(timeout=JOB_VISIBILITY_TIMEOUT)
+    if updated is None:
+        raise PermanentJobError(f"Lead {payload['lead_id']} not found in HubSpot (404)")
+    return updated
+
+
+@job_merger("update_contact")
+def _merge_contact_updates(older, newer):
+    properties = {**older["update_data"].get("properties", {}), **newer["update_data"].get("properties", {})}
+    return {**newer, "update_data": {**older["update_data"], **newer["update_data"], "properties": properties}}
+
+
+@job_handler("place_call")
+def _place_call_job(payload):
+    from autopair_chatbot.call_handlers import place_call
+    return place_call(payload["lead_id"], payload["phone"], payload.get("status_callback", False))
+
+
+def queue_sms(to_number, message):
+    """Send an SMS through the job queue when enabled, otherwise right away."""
+    if not JOBS_ENABLED:
+        from autopair_chatbot.utils import send_sms
+        return send_sms(to_number, message)
+    get_job_queue().enqueue("send_sms", {"to": to_number, "body": message})
+    return True
+
+
+def queue_contact_update(lead_id, update_data):
+    if not JOBS_ENABLED:
+        from autopair_chatbot.hubspot import update_lead_in_hubspot
+        return update_lead_in_hubspot(lead_id, update_data)
+    # Local reads (phone index / lead store) pick the change up once the job's PATCH succeeds
+    get_job_queue().enqueue("update_contact", {"lead_id": lead_id, "update_data": update_data})
+    return True
+
+
+def queue_contact_update_async(lead_id, update_data):
+    """Like queue_contact_update, but never blocks the caller on HubSpot:
+    without the job queue the write runs on a background worker (in order
+    per lead), falling back to an inline write only if that queue is full."""
+    if JOBS_ENABLED:
+        return queue_contact_update(lead_id, update_data)
+    from autopair_chatbot.hubspot import update_lead_in_hubspot
+    from autopair_chatbot.workers import write_executor
+    if write_executor.submit(f"lead:{lead_id}", update_lead_in_hubspot, lead_id, update_data):
+        return True
+    logger.warning(f"Background write queue full; updating lead {lead_id} inline")
+    return update_lead_in_hubspot(lead_id, update_data)
+
+
+def queue_call(lead_id, phone, status_callback=False):
+    if not JOBS_ENABLED:
+        from autopair_chatbot.call_handlers import place_call
+        return place_call(lead_id, phone, status_callback)
+    get_job_queue().enqueue("place_call", {"lead_id": lead_id, "phone": phone, "status_callback": status_callback})
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m autopair_chatbot.jobs", description="Inspect or replay queued jobs")
+    parser.add_argument("--db", default=JOB_DB_PATH, help="job database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="count pending, running and dead jobs")
+    list_parser = sub.add_parser("list", help="list queued jobs")
+    list_parser.add_argument("--dead", action="store_true", help="list dead-lettered jobs instead")
+    list_parser.add_argument("--limit", type=int, default=50)
+    replay_parser = sub.add_parser("replay", help="requeue dead-lettered jobs")
+    replay_parser.add_argument("ids", nargs="*", type=int, help="dead job ids (default: all)")
+    sub.add_parser("drain", help="run due jobs in the foreground until the queue is empty")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db)
+    if args.command == "stats":
+        print(json.dumps(queue.stats(), indent=2))
+    elif args.command == "list":
+        for job in queue.list_jobs(dead=args.dead, limit=args.limit):
+            print(json.dumps(job))
+    elif args.command == "replay":
+        ids = args.ids or [job["id"] for job in queue.list_jobs(dead=True, limit=1000000)]
+        replayed = sum(1 for job_id in ids if queue.replay(job_id))
+        print(f"Replayed {replayed} of {len(ids)} dead jobs")
+    elif args.command == "drain":
+        ran = 0
+        while queue.run_one():
+            ran += 1
+        print(f"Ran {ran} jobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# File: autopair_chatbot/knowledge.py
+import math
+import re
+import threading
+from collections import Counter
+from autopair_chatbot.answer_cache import STOP_WORDS as QUESTION_STOP_WORDS
+from autopair_chatbot.config import KNOWLEDGE_TOP_K, KNOWLEDGE_TOKEN_BUDGET
+from autopair_chatbot.plans import get_plan_rules
+
+
+# === Modular Warranty Knowledge ===
+KNOWLEDGE_OVERVIEW = """
+🏆 Welcome to Autopair Warranty — Canada's Most Trusted Direct-to-Consumer Auto Warranty.
+
+We are transforming how Canadians protect their vehicles by:
+- Offering **coverage for all makes and models**
+- Providing access to **ANY licensed repair facility** in Canada or the US
+- Saving you up to **250% vs dealership markups**
+- Including **$0 deductible** in every plan — no extra cost for repairs
+- Eliminating dealership upsells, quotes, inspections, or hidden fees
+
+Trusted, insured, and backed by industry professionals:
+- 30+ years combined experience in automotive sales
+- Highly rated on Google and BBB
+- Thousands of satisfied customers across North America
+
+Compare us with others:
+- 💡 No quotes required, instant pricing
+- 🛠️ No forced repair centers — choose any licensed shop
+- 💳 Flexible payment options (bi-weekly or monthly), interest-FREE on approved credit
+"""
+
+def _plan_passage(number, plan):
+    fields = {**plan, "premium": plan["surcharges"].get("premium", 0), "exotic": plan["surcharges"].get("exotic", 0)}
+    return "\n".join([f"{number}. 🔹 {plan['title']}", *(f"   - {line.format(**fields)}" for line in plan["details"])])
+
+
+def _plan_details():
+    """The plans section, written from the rule table (plan_rules.json) so
+    prices, limits, surcharges and eligibility never drift from qualification."""
+    rules = get_plan_rules()
+    passages = [_plan_passage(number, plan) for number, plan in enumerate(rules.plans.values(), 1)]
+    # Loosest tier first, as the section has always read
+    eligibility = [
+        f"- {tier['label']}: Vehicle must be ≤{tier['max_age_years']} years & <{tier['mileage_below_km']:,} KM"
+        for tier in reversed(rules.tiers)
+    ]
+    return "\n" + "\n\n".join(["🚘 Autopair Warranty Plans", *passages, "🟩 Plan Eligibility:\n" + "\n".join(eligibility)]) + "\n"
+
+
+def _claim_limits():
+    """Per-claim repair limits for the FAQ, one per tier (its entry plan's)."""
+    rules = get_plan_rules()
+    by_limit = {}
+    for tier in reversed(rules.tiers):
+        by_limit.setdefault(rules.plans[tier["plans"][0]]["repair_limit"], []).append(tier["name"].title())
+    return " or ".join(f"{limit} ({', '.join(names)})" for limit, names in by_limit.items())
+
+
+PLAN_DETAILS = _plan_details()
+
+COVERAGE_COMPARISON = """
+📊 Coverage Comparison by Plan
+
+| Component                        | STANDARD | WORKS | WORKS PLUS |
+|----------------------------------|----------|--------|-------------|
+| Engine (gas/diesel)             | ✅       | ✅     | ✅          |
+| Transmission (auto/manual)      | ✅       | ✅     | ✅          |
+| Differentials (front/rear)      | ✅       | ✅     | ✅          |
+| Transfer Case (4x4)             | ✅       | ✅     | ✅          |
+| Turbo / Supercharger            | ✅       | ✅     | ✅          |
+| Seals & Gaskets (major)         | ✅       | ✅     | ✅          |
+| Front Suspension                | ❌       | ✅     | ✅          |
+| Rear Suspension                 | ❌       | ✅     | ✅          |
+| Steering System                 | ✅       | ✅     | ✅          |
+| Cooling System                  | ✅       | ✅     | ✅          |
+| Brakes                          | ✅       | ✅     | ✅          |
+| Electrical System               | ✅       | ✅     | ✅          |
+| Air Conditioning                | ✅       | ✅     | ✅          |
+| High-Tech & Electronics         | ❌       | ✅     | ✅          |
+| Sensors (ABS, O2, etc.)         | ❌       | ✅     | ✅          |
+| Hybrid Vehicle Components       | ❌       | ✅     | ✅          |
+| Courtesy Rental ($350 max)      | ✅       | ✅     | ✅          |
+| Towing ($100 max)               | ✅       | ✅     | ✅          |
+| Trip Interruption ($750 max)    | ✅       | ✅     | ✅          |
+| $0 Deductible                   | ✅       | ✅     | ✅          |
+"""
+
+CLAIMS_INFO = """
+🛠️ Autopair Warranty — Claims Process (Simple 4-Step Guide)
+
+1. 🏁 Choose Your Repair Shop  
+   - Take your vehicle to ANY licensed repair facility across Canada or the USA.  
+   - You’re not limited to dealers or pre-approved shops.
+
+2. 🔍 Get a Diagnostic Report  
+   - Ask the mechanic for a full diagnostic report.  
+   - Submit the report through Autopair’s online claims portal.
+
+3. ✅ Wait for Approval (12–24 hours)  
+   - If the issue is covered in your plan, it’s approved.  
+   - Wait for Autopair to confirm before approving any repairs.
+
+4. 💰 Receive Payment  
+   - Choose either:  
+     1. Payment via your Autopair prepaid card  
+     2. Direct Interac e-Transfer  
+   - All payments are processed through email after approval.
+
+⏳ Wait Period:  
+- Coverage begins after 30 days + 1,500 km from warranty purchase date.  
+- Claims cannot be made before this period is completed.
+
+🛑 Reminders:  
+- Do not authorize repairs until approval is received.  
+- Coverage applies to **listed components only**.  
+- **Inspection is not required at purchase**, but is required at time of claim.
+- **Maintenance required**: oil + filter every 6 months or 12,000 km.
+"""
+
+FAQS = """
+❓ Frequently Asked Questions (FAQs)
+
+1. **What is a factory or manufacturer’s warranty?**  
+Every new vehicle comes with a factory warranty that covers non-wear & tear parts. Once it expires, you’re on your own. Autopair fills that gap with extended coverage.
+
+2. **Why not just get this from a dealer?**  
+Dealers charge 2–3x more and force you to use specific repair centers. Autopair lets you choose your shop and buy directly — saving you thousands.
+
+3. **I still have factory coverage. Why buy now?**  
+You can defer Autopair coverage to begin right after your manufacturer warranty ends — up to 12 months in advance.
+
+4. **My dealer gave me a 3-month warranty. What should I do?**  
+You can still purchase Autopair and set it to start after the dealer plan ends.
+
+5. **Can I transfer my plan if I sell the car?**  
+Yes! Plans are fully transferable to the next owner. Just contact support.
+
+6. **What happens during a breakdown?**  
+Refer to the claims process: get a diagnosis, submit it, get approval, and choose your payment method (card or e-transfer).
+
+7. **Are you better than other warranty companies?**  
+Yes — we cut out middlemen, offer direct pricing, allow any licensed repair shop, and include $0 deductible on all plans.
+
+8. **Can I cancel my plan?**  
+Yes, within 10 days of purchase and no claims made. A $99 fee applies. After 10 days, plans are non-cancellable and non-refundable.
+
+9. **Is there a limit to how many claims I can make?**  
+No limit to the number of claims — but the max per claim is {claim_limits}, and total claim value cannot exceed the vehicle’s acquisition cost.
+
+10. **Do I need to maintain the vehicle?**  
+Yes. You must do oil + filter changes every 6 months or 12,000 km to keep coverage valid.
+
+11. **Do I need an inspection to buy a plan?**  
+No inspection is required to purchase. However, one is needed to process a claim.
+""".format(claim_limits=_claim_limits())
+
+
+SECTIONS = {
+    "overview": KNOWLEDGE_OVERVIEW,
+    "plans": PLAN_DETAILS,
+    "coverage": COVERAGE_COMPARISON,
+    "claims": CLAIMS_INFO,
+    "faqs": FAQS,
+}
+
+# Plan-specific passages in PLAN_DETAILS, so leads only see plans they qualify for
+PLAN_MARKERS = {
+    f"🔹 {plan['title']}": name
+    for name, plan in sorted(get_plan_rules().plans.items(), key=lambda item: len(item[1]["title"]), reverse=True)
+}
+
+# Question words carry no topic signal for retrieval
+STOP_WORDS = QUESTION_STOP_WORDS | {"what", "how", "can", "if", "with", "any", "all", "our", "us", "get"}
+
+# Customers rarely use the knowledge base's own words
+QUERY_SYNONYMS = {
+    "much": ["price", "payment"],
+    "cost": ["price", "payment"],
+    "pay": ["payment", "price"],
+    "expensive": ["price"],
+    "cheap": ["price"],
+    "monthly": ["payment"],
+    "fix": ["repair"],
+    "broke": ["breakdown", "repair"],
+    "broken": ["breakdown", "repair"],
+    "garage": ["shop", "repair"],
+    "mechanic": ["shop", "repair"],
+    "covered": ["coverage", "cover"],
+    "refund": ["cancel", "refundable"],
+    "sell": ["transfer", "transferable"],
+    "wait": ["waiting"],
+    "start": ["begin", "begins"],
+    "deductible": ["deductible"],
+}
+
+
+def estimate_tokens(text):
+    """Rough GPT token count (~4 characters per token)."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _stem(word):
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    return [_stem(word) for word in re.findall(r"[a-z0-9$]+", text.lower()) if word not in STOP_WORDS]
+
+
+def split_passages(name, text):
+    """Split a knowledge block into small passages.
+
+    Blocks split on blank lines; markdown tables split into row groups that
+    each repeat the title and header so a passage reads on its own.
+    """
+    lines = [line.rstrip() for line in text.strip().splitlines()]
+    title = lines[0].strip()
+    if any(line.startswith("|") for line in lines):
+        header = [line for line in lines if line.startswith("|")][:2]
+        rows = [line for line in lines if line.startswith("|")][2:]
+        chunks = ["\n".join([title] + header + rows[i:i + 5]) for i in range(0, len(rows), 5)]
+    else:
+        chunks = [chunk.strip() for chunk in re.split(r"\n\s*\n", "\n".join(lines[1:])) if chunk.strip()]
+        chunks = [f"{title}\n{chunk}" if name != "faqs" else chunk for chunk in chunks]
+
+    passages = []
+    for i, chunk in enumerate(chunks):
+        plan = next((plan for marker, plan in PLAN_MARKERS.items() if marker in chunk), None) if name == "plans" else None
+        passages.append({"id": f"{name}:{i}", "section": name, "text": chunk, "plan": plan})
+    return passages
+
+
+class KnowledgeIndex:
+    """BM25 index over knowledge passages; built once, read-only afterwards."""
+
+    def __init__(self, sections=SECTIONS, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.passages = [p for name, text in sections.items() for p in split_passages(name, text)]
+        self._terms = [Counter(tokenize(p["text"])) for p in self.passages]
+        self._lengths = [sum(terms.values()) for terms in self._terms]
+        self._avg_length = sum(self._lengths) / len(self._lengths)
+        doc_freq = Counter(term for terms in self._terms for term in terms)
+        count = len(self.passages)
+        self._idf = {term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def search(self, question):
+        """(score, passage) pairs with a positive score, best first."""
+        query = tokenize(question)
+        query += [_stem(syn) for word in list(query) for syn in QUERY_SYNONYMS.get(word, [])]
+        scored = []
+        for passage, terms, length in zip(self.passages, self._terms, self._lengths):
+            score = 0.0
+            for term in set(query):
+                freq = terms.get(term)
+                if freq:
+                    norm = freq + self.k1 * (1 - self.b + self.b * length / self._avg_length)
+                    score += self._idf[term] * freq * (self.k1 + 1) / norm
+            if score > 0:
+                scored.append((score, passage))
+        scored.sort(key=lambda pair: -pair[0])
+        return scored
+
+    def select(self, question, plans=None, top_k=KNOWLEDGE_TOP_K, token_budget=KNOWLEDGE_TOKEN_BUDGET):
+        """Top passages for a question that fit the token budget.
+
+        Plan passages for plans the lead doesn't qualify for are skipped.
+        Falls back to the overview when nothing matches.
+        """
+        allowed = {p.strip() for p in (plans or "").split(",") if p.strip()}
+        if "Works Plus Plan" in allowed:
+            allowed.add("Works Plan")
+        candidates = [p for _, p in self.search(question) if not (allowed and p["plan"] and p["plan"] not in allowed)]
+        if not candidates:
+            candidates = [p for p in self.passages if p["section"] == "overview"]
+
+        selected, used = [], 0
+        for passage in candidates:
+            cost = estimate_tokens(passage["text"])
+            if used + cost > token_budget and selected:
+                continue
+            selected.append(passage)
+            used += cost
+            if len(selected) >= top_k:
+                break
+        return selected
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = KnowledgeIndex()
+    return _index
+
+
+def retrieve_knowledge(question, plans=None):
+    """Knowledge text for the system prompt: only the passages that matter."""
+    return "\n\n".join(p["text"] for p in get_knowledge_index().select(question, plans))
+
+
+def keyword_route(question, context=""):
+    """The original hard-coded section router, kept for KNOWLEDGE_ROUTER=keyword."""
+    question_lower = question.lower()
+
+    # Plan-specific response customization
+    if any(word in question_lower for word in ["plan", "price", "cost", "monthly"]):
+        works_section_start = PLAN_DETAILS.rfind("\n", 0, PLAN_DETAILS.find("🔹 THE WORKS PLAN")) + 1
+        if "Works Plus Plan" in context or "Works Plan" in context:
+            # Extract only the WORKS plans from PLAN_DETAILS
+            return PLAN_DETAILS[works_section_start:].strip()
+        elif "Standard Plan" in context:
+            # Extract only the STANDARD plan from PLAN_DETAILS
+            return PLAN_DETAILS[:works_section_start].strip()
+        return PLAN_DETAILS
+    elif any(word in question_lower for word in ["coverage", "included", "compare", "parts"]):
+        return COVERAGE_COMPARISON
+    elif any(word in question_lower for word in ["claim", "repair", "shop", "approval", "mechanic"]):
+        return CLAIMS_INFO
+    elif any(word in question_lower for word in ["how", "what if", "can i", "faq", "cancel"]):
+        return FAQS
+    return KNOWLEDGE_OVERVIEW
@@ -1,15 +1,14 @@
 # File: autopair_chatbot/lead_monitor.py
+import json
 import time
 import threading
-import requests
-from autopair_chatbot.config import logger
-from autopair_chatbot.hubspot import fetch_lead_details
-from autopair_chatbot.utils import now_in_toronto
-from autopair_chatbot.hubspot import update_lead_in_hubspot
-
-most_recent_lead_id = None
-most_recent_lead_time = None
-processing_locks = {}
+from autopair_chatbot.config import logger, LEAD_POLL_INTERVAL, LEAD_WATERMARK_PATH, LOCK_LEASE_SECONDS
+from autopair_chatbot.hubspot import fetch_lead_details, hubspot_client, LEAD_PROPERTIES
+from autopair_chatbot.phone_index import phone_index
+from autopair_chatbot.utils import now_in_toronto, to_epoch_millis, write_json_atomic
+from autopair_chatbot.jobs import queue_contact_update
+from autopair_chatbot.workers import lead_executor
+from autopair_chatbot.locks import lead_locks
 
 
 def start_lead_monitor():
@@ -19,70 +18,154 @@ def start_lead_monitor():
 
 
 def lead_monitor_loop():
-    global most_recent_lead_id, most_recent_lead_time
-    initial_leads = fetch_latest_leads()
-    if initial_leads:
-        most_recent_lead = initial_leads[0]
-        most_recent_lead_id = most_recent_lead.get("id")
-        props = most_recent_lead.get("properties", {})
-        most_recent_lead_time = props.get("createdate")
-        logger.info(f"Lead monitor initialized. Most recent lead: {most_recent_lead_id}")
+    watermark = load_watermark()
+    if watermark is None:
+        # First run: start from the newest lead; older ones belong to a backfill
+        initial_leads = fetch_latest_leads(limit=1)
+        if initial_leads:
+            newest = initial_leads[0]
+            watermark = {
+                "createdate": to_epoch_millis(newest.get("properties", {}).get("createdate")),
+                "ids": [newest.get("id")]
+            }
+            logger.info(f"Lead monitor initialized. Most recent lead: {newest.get('id')}")
+        else:
+            watermark = {"createdate": int(time.time() * 1000), "ids": []}
+        save_watermark(watermark)
+    else:
+        logger.info(f"Lead monitor resuming from watermark {watermark['createdate']}")
 
     while True:
         try:
-            time.sleep(60)
+            time.sleep(LEAD_POLL_INTERVAL)
             logger.info("Checking for new leads...")
-            latest_leads = fetch_latest_leads()
-            new_leads = identify_new_leads(latest_leads)
-            for lead in reversed(new_leads):
-                lead_id = lead.get("id")
-                logger.info(f"Processing new lead from polling: {lead_id}")
-                threading.Thread(target=process_new_lead, args=(lead_id,)).start()
+            watermark = poll_new_leads(watermark)
         except Exception as e:
             logger.error(f"Error in lead monitor: {e}")
 
 
-def fetch_latest_leads():
-    url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    from autopair_chatbot.config import HUBSPOT_API_KEY
-    headers = {
-        "Authorization": f"Bearer {HUBSPOT_API_KEY}",
-        "Content-Type": "application/json"
-    }
+def poll_new_leads(watermark):
+    """Page through every lead created at or after the watermark.
+
+    The watermark is the newest createdate seen plus the ids sharing it, so
+    leads with identical timestamps on a page boundary are neither skipped
+    nor processed twice. It is saved after every page, and never moves past
+    a lead the worker pool couldn't take, so that lead is fetched again on
+    the next sweep. Every page of a sweep
+    is fetched with the createdate the sweep started from: the search API's
+    `after` cursor is an offset into one query's results, so it's only valid
+    while the filter stays the same.
+    """
+    since = watermark["createdate"]
+    seen_ids = set(watermark["ids"])
+    after = None
+    while True:
+        page, after = fetch_leads_since(since, after)
+        page = [lead for lead in page if lead.get("id") not in seen_ids]
+        new_ids = {lead.get("id") for lead in identify_new_leads(page)}
+        for lead in page:
+            if lead.get("id") in new_ids and not dispatch_lead(lead.get("id"), source="polling"):
+                logger.warning(f"⚠️ Lead queue full; sweep paused before lead {lead.get('id')}")
+                save_watermark(watermark)
+                return watermark
+            watermark = advance_watermark(watermark, lead)
+        if page:
+            save_watermark(watermark)
+
+        # The search API caps paging at 10k results; the next sweep resumes from the watermark
+        if not after or int(after) >= 9900:
+            return watermark
+
+
+def advance_watermark(watermark, lead):
+    created = to_epoch_millis(lead.get("properties", {}).get("createdate"))
+    if created is None:
+        return watermark
+    if created > watermark["createdate"]:
+        return {"createdate": created, "ids": [lead.get("id")]}
+    if created == watermark["createdate"] and lead.get("id") not in watermark["ids"]:
+        watermark["ids"].append(lead.get("id"))
+    return watermark
+
+
+def load_watermark():
+    try:
+        with open(LEAD_WATERMARK_PATH) as f:
+            watermark = json.load(f)
+        return {"createdate": int(watermark["createdate"]), "ids": list(watermark.get("ids", []))}
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError) as e:
+        logger.error(f"Ignoring unreadable lead watermark {LEAD_WATERMARK_PATH}: {e}")
+        return None
+
+
+def save_watermark(watermark):
+    write_json_atomic(LEAD_WATERMARK_PATH, watermark)
+
+
+def dispatch_lead(lead_id, source="polling", block_timeout=None):
+    """Queue a lead for process_new_lead; polling and the HubSpot webhook share
+    one worker pool. Returns False if the queue had no room. Webhook leads are
+    read fresh from HubSpot: the event means the local copy is out of date."""
+    logger.info(f"Processing new lead from {source}: {lead_id}")
+    return lead_executor.submit("process_lead", lead_id, source == "webhook", block_timeout=block_timeout)
+
+
+def _search_leads(body):
+    response = hubspot_client.post("/crm/v3/objects/contacts/search", json=body)
+    response.raise_for_status()
+    data = response.json()
+    results = data.get("results", [])
+    for lead in results:
+        phone_index.put(lead)
+    return results, data.get("paging", {}).get("next", {}).get("after")
+
+
+def fetch_latest_leads(limit=10):
     body = {
         "filterGroups": [{
             "filters": [{"propertyName": "lifecyclestage", "operator": "EQ", "value": "lead"}]
         }],
         "sorts": [{"propertyName": "createdate", "direction": "DESCENDING"}],
-        "properties": [
-            "firstname", "lastname", "email", "phone", "createdate",
-            "vehicle_make", "vehicle_model", "vehicle_year", "vehicle_mileage",
-            "autopair_processed", "hs_object_id"
-        ],
-        "limit": 10
+        "properties": LEAD_PROPERTIES + ["createdate"],
+        "limit": limit
     }
     try:
-        response = requests.post(url, headers=headers, json=body)
-        response.raise_for_status()
-        return response.json().get("results", [])
+        return _search_leads(body)[0]
     except Exception as e:
         logger.error(f"Error fetching leads: {e}")
         return []
 
 
-def identify_new_leads(leads):
-    global most_recent_lead_id, most_recent_lead_time
-    if not leads:
-        return []
+def fetch_leads_since(created_after_ms, after=None, page_size=100):
+    """One page of leads created at or after `created_after_ms`, oldest first.
 
+    Returns (leads, next_after); next_after is None on the last page.
+    Errors propagate so the poller doesn't advance past a failed page.
+    """
+    body = {
+        "filterGroups": [{
+            "filters": [
+                {"propertyName": "lifecyclestage", "operator": "EQ", "value": "lead"},
+                {"propertyName": "createdate", "operator": "GTE", "value": str(created_after_ms)}
+            ]
+        }],
+        "sorts": [{"propertyName": "createdate", "direction": "ASCENDING"}],
+        "properties": LEAD_PROPERTIES + ["createdate"],
+        "limit": page_size
+    }
+    if after:
+        body["after"] = after
+    return _search_leads(body)
+
+
+def identify_new_leads(leads):
     new_leads = []
     for lead in leads:
         lead_id = lead.get("id")
         props = lead.get("properties", {})
-        lead_time = props.get("createdate")
 
-        if most_recent_lead_time and lead_time <= most_recent_lead_time:
-            continue
         if props.get("autopair_processed") == "true":
             continue
 
@@ -94,29 +177,23 @@ def identify_new_leads(leads):
 
         new_leads.append(lead)
 
-    if new_leads:
-        most_recent_lead_id = new_leads[0].get("id")
-        most_recent_lead_time = new_leads[0].get("properties", {}).get("createdate")
-
     return new_leads
 
 
-def process_new_lead(lead_id):
+def process_new_lead(lead_id, refresh=False):
     from autopair_chatbot.hubspot import fetch_lead_details
     from autopair_chatbot.sms_handlers import handle_question_submission, handle_schedule_submission
     from autopair_chatbot.utils import qualify_plans, send_qualification_sms
 
-    global processing_locks
-
-    if lead_id in processing_locks:
+    lock_key = f"lead:{lead_id}"
+    if not lead_locks.acquire(lock_key, LOCK_LEASE_SECONDS):
         logger.info(f"Lead {lead_id} already processing")
         return
 
-    processing_locks[lead_id] = True
-
+    sms_sent = False
     try:
         logger.info(f"Processing lead {lead_id}")
-        lead = fetch_lead_details(lead_id)
+        lead = fetch_lead_details(lead_id, refresh=refresh)
         if not lead:
             logger.error(f"No data for lead {lead_id}")
             return
@@ -125,10 +202,16 @@ def process_new_lead(lead_id):
         if props.get("autopair_processed") == "true":
             logger.info(f"Lead {lead_id} already processed")
             return
+        if props.get("lifecyclestage") not in (None, "", "lead"):
+            logger.info(f"Lead {lead_id} is not a lead ({props.get('lifecyclestage')}). Skipping.")
+            return
 
+        # HubSpot returns unset properties as null; a webhook can arrive before
+        # the form has filled them in, and a later property change retriggers
         required = ['phone', 'vehicle_year', 'vehicle_mileage']
-        if any(field not in props for field in required):
-            logger.error(f"Lead {lead_id} missing required fields")
+        missing = [field for field in required if not props.get(field)]
+        if missing:
+            logger.info(f"Lead {lead_id} missing required fields: {missing}")
             return
 
         qualification = qualify_plans(props['vehicle_year'], props['vehicle_mileage'])
@@ -140,14 +223,21 @@ def process_new_lead(lead_id):
         }
 
         if send_qualification_sms(lead, qualification):
+            sms_sent = True
             update_data["properties"].update({
                 "autopair_processed": "true",
                 "autopair_last_processed": int(now_in_toronto().timestamp() * 1000)
             })
 
-        update_lead_in_hubspot(lead_id, update_data)
+        queue_contact_update(lead_id, update_data)
 
     except Exception as e:
         logger.error(f"Error processing lead {lead_id}: {e}")
     finally:
-        processing_locks.pop(lead_id, None)
+        # After a send the lease is left to expire, so no other worker can text
+        # the lead again before HubSpot reflects autopair_processed
+        if not sms_sent:
+            lead_locks.release(lock_key)
+
+
+lead_executor.register("process_lead", process_new_lead)
@@ -0,0 +1,204 @@
+# File: autopair_chatbot/lead_store.py
+import json
+import sqlite3
+import threading
+import time
+from autopair_chatbot.config import (
+    LEAD_STORE_PATH, LEAD_STORE_SYNC_INTERVAL, LEAD_STORE_SYNC_LOOKBACK_DAYS, LEAD_STORE_OVERLAY_TTL, logger
+)
+from autopair_chatbot.utils import format_phone_number, to_epoch_millis
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id TEXT PRIMARY KEY,
+    phone_key TEXT,
+    properties TEXT NOT NULL,
+    local_properties TEXT NOT NULL DEFAULT '{}',
+    remote_modified_at INTEGER,
+    local_modified_at INTEGER,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS leads_phone_key ON leads (phone_key);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class LeadStore:
+    """Local SQLite mirror of the lead properties the bot reads.
+
+    Our own writes land here once HubSpot accepts them (`apply_update`) and
+    are kept on top of whatever HubSpot returns, so reads never go back to a
+    pre-write status because of search-index lag. A written property is
+    dropped from the overlay once HubSpot returns the same value, and the
+    whole overlay once an object read sent after the write comes back (those
+    aren't lagged) or after LEAD_STORE_OVERLAY_TTL seconds. Only our own
+    clock is compared with our own clock, so clock skew against HubSpot
+    can't matter. A webhook for a lead `invalidate`s its row until the next
+    fetch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, lead_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, properties, local_properties FROM leads WHERE id = ? AND complete = 1",
+                (str(lead_id),)
+            ).fetchone()
+        return self._to_contact(row)
+
+    def find_by_phone(self, phone):
+        phone_key = format_phone_number(phone) if phone else None
+        if not phone_key:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, properties, local_properties FROM leads WHERE phone_key = ? AND complete = 1 "
+                "ORDER BY remote_modified_at DESC LIMIT 1",
+                (phone_key,)
+            ).fetchone()
+        return self._to_contact(row)
+
+    def upsert(self, contact, requested_at=None):
+        """Store a contact as returned by HubSpot. `requested_at` (epoch ms,
+        our clock) marks an object read, which reflects every write made
+        before it was sent; search results may lag."""
+        lead_id = str(contact.get("id"))
+        props = contact.get("properties", {})
+        remote_modified_at = to_epoch_millis(contact.get("updatedAt") or props.get("lastmodifieddate")) or 0
+        phone_key = format_phone_number(props["phone"]) if props.get("phone") else None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT properties, local_properties, local_modified_at FROM leads WHERE id = ?", (lead_id,)
+            ).fetchone()
+            merged = {**json.loads(row[0]), **props} if row else dict(props)
+            local_props = json.loads(row[1]) if row else {}
+            written_at = row[2] if row else None
+            if written_at and (
+                (requested_at and requested_at > written_at)
+                or time.time() * 1000 - written_at > LEAD_STORE_OVERLAY_TTL * 1000
+            ):
+                local_props = {}
+            else:
+                # HubSpot has caught up with these writes
+                local_props = {k: v for k, v in local_props.items() if str(props.get(k)) != v}
+            self._conn.execute(
+                "INSERT OR REPLACE INTO leads (id, phone_key, properties, local_properties, "
+                "remote_modified_at, local_modified_at, complete) VALUES (?, ?, ?, ?, ?, ?, 1)",
+                (lead_id, phone_key, json.dumps(merged), json.dumps(local_props),
+                 remote_modified_at, row[2] if row else None)
+            )
+
+    def apply_update(self, lead_id, properties):
+        """Write-through of our own HubSpot update."""
+        props = {k: str(v) for k, v in properties.items()}
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT local_properties FROM leads WHERE id = ?", (str(lead_id),)
+            ).fetchone()
+            if row:
+                local_props = {**json.loads(row[0]), **props}
+                self._conn.execute(
+                    "UPDATE leads SET local_properties = ?, local_modified_at = ? WHERE id = ?",
+                    (json.dumps(local_props), now_ms, str(lead_id))
+                )
+            else:
+                # Not mirrored yet: keep the write, but don't serve it until HubSpot fills in the rest
+                self._conn.execute(
+                    "INSERT INTO leads (id, properties, local_properties, local_modified_at, complete) "
+                    "VALUES (?, '{}', ?, ?, 0)",
+                    (str(lead_id), json.dumps(props), now_ms)
+                )
+
+    def invalidate(self, lead_id):
+        """Stop serving a lead until it is fetched from HubSpot again."""
+        with self._lock:
+            self._conn.execute("UPDATE leads SET complete = 0 WHERE id = ?", (str(lead_id),))
+
+    def get_state(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, name, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)", (name, str(value))
+            )
+
+    def sync_once(self):
+        """Pull contacts modified since the last sync. Returns the number mirrored."""
+        from autopair_chatbot.hubspot import hubspot_client, LEAD_PROPERTIES
+        from autopair_chatbot.phone_index import phone_index
+
+        watermark = self.get_state("lastmodifieddate")
+        if watermark is None:
+            watermark = int((time.time() - LEAD_STORE_SYNC_LOOKBACK_DAYS * 86400) * 1000)
+        watermark = int(watermark)
+
+        synced = 0
+        after = None
+        while True:
+            body = {
+                "filterGroups": [{
+                    "filters": [{"propertyName": "lastmodifieddate", "operator": "GTE", "value": str(watermark)}]
+                }],
+                "sorts": [{"propertyName": "lastmodifieddate", "direction": "ASCENDING"}],
+                "properties": LEAD_PROPERTIES + ["lastmodifieddate"],
+                "limit": 100
+            }
+            if after:
+                body["after"] = after
+            response = hubspot_client.post("/crm/v3/objects/contacts/search", json=body)
+            response.raise_for_status()
+            data = response.json()
+            results = data.get("results", [])
+            for contact in results:
+                self.upsert(contact)
+                phone_index.invalidate_lead(contact.get("id"))
+            synced += len(results)
+            if results:
+                newest = to_epoch_millis(results[-1].get("properties", {}).get("lastmodifieddate"))
+                if newest:
+                    self.set_state("lastmodifieddate", max(newest, watermark))
+            after = data.get("paging", {}).get("next", {}).get("after")
+            # The search API stops paging at 10k results; the next sweep resumes from the watermark
+            if not after or int(after) >= 9900:
+                break
+        return synced
+
+    @staticmethod
+    def _to_contact(row):
+        if not row:
+            return None
+        return {"id": row[0], "properties": {**json.loads(row[1]), **json.loads(row[2])}}
+
+
+lead_store = LeadStore(LEAD_STORE_PATH) if LEAD_STORE_PATH else None
+
+
+def start_lead_store_sync():
+    if not lead_store:
+        return
+    threading.Thread(target=lead_store_sync_loop, daemon=True).start()
+    logger.info(f"Lead store sync thread started ({LEAD_STORE_PATH})")
+
+
+def lead_store_sync_loop():
+    while True:
+        try:
+            synced = lead_store.sync_once()
+            if synced:
+                logger.info(f"🗄️ Lead store synced {synced} contacts from HubSpot")
+        except Exception as e:
+            logger.error(f"Error syncing lead store: {e}")
+        time.sleep(LEAD_STORE_SYNC_INTERVAL)
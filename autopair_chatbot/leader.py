@@ -0,0 +1,77 @@
+# File: autopair_chatbot/leader.py
+"""Pick one worker process to run the background loops.
+
+Under a multi-worker server (see gunicorn.conf.py) every worker serves web
+requests, but only the one holding an exclusive flock on LEADER_LOCK_PATH
+runs the lead monitor, lead store sync, job drainer, callback scheduler and
+dialer. The kernel drops the lock when its holder exits, even on SIGKILL,
+so a standby worker takes over within LEADER_RETRY_INTERVAL seconds.
+
+The lock only coordinates processes on one host; with several replicas,
+set BACKGROUND_TASKS=false on all but one.
+"""
+import fcntl
+import os
+import threading
+import time
+from autopair_chatbot.config import LEADER_LOCK_PATH, LEADER_RETRY_INTERVAL, logger
+
+
+class LeaderElection:
+    def __init__(self, path, on_elected, retry_interval=LEADER_RETRY_INTERVAL):
+        self.path = path
+        self.on_elected = on_elected
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self.elected_at = None
+        self._file = None
+
+    def try_acquire(self):
+        """Take the lock if it's free. The file stays open (and locked) for the
+        life of the process."""
+        handle = open(self.path, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{os.getpid()}\n")
+        handle.flush()
+        self._file = handle
+        self.is_leader = True
+        self.elected_at = time.time()
+        return True
+
+    def run(self):
+        while not self.try_acquire():
+            time.sleep(self.retry_interval)
+        logger.info(f"👑 Worker {os.getpid()} elected leader; starting background loops")
+        self.on_elected()
+
+    def start(self):
+        threading.Thread(target=self.run, name="leader-election", daemon=True).start()
+
+    def stats(self):
+        return {
+            "pid": os.getpid(),
+            "is_leader": self.is_leader,
+            "leader_for_s": round(time.time() - self.elected_at, 1) if self.elected_at else None
+        }
+
+
+election = None
+
+
+def start_leader_election(on_elected):
+    """Call on_elected() in this process once it becomes the leader. Call
+    after fork, in each worker."""
+    global election
+    election = LeaderElection(LEADER_LOCK_PATH, on_elected)
+    election.start()
+    return election
+
+
+def leader_stats():
+    return election.stats() if election else None
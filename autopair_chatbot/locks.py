@@ -0,0 +1,91 @@
+# File: autopair_chatbot/locks.py
+import os
+import socket
+import sqlite3
+import threading
+import time
+from autopair_chatbot.config import LOCK_BACKEND, LOCK_DB_PATH, logger
+
+
+class MemoryLockBackend:
+    """Lease locks for a single process (the default)."""
+
+    def __init__(self):
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            if self._leases.get(key, 0) > now:
+                return False
+            self._leases[key] = now + ttl
+            # Keep the dict from growing with every lead ever seen
+            for expired in [k for k, expires_at in self._leases.items() if expires_at <= now]:
+                del self._leases[expired]
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
+
+
+class SQLiteLockBackend:
+    """Lease locks shared by every process that can open the same SQLite file.
+
+    A lease expires after `ttl` seconds, so a crashed worker can't hold a
+    lead forever.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def acquire(self, key, ttl):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, self.owner, now + ttl)
+            )
+            conn.execute("COMMIT")
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.error(f"Lease acquire failed for {key}: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return False
+        finally:
+            conn.close()
+
+    def release(self, key):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+
+def get_lock_backend(name=LOCK_BACKEND):
+    if name == "memory":
+        return MemoryLockBackend()
+    if name == "sqlite":
+        return SQLiteLockBackend(LOCK_DB_PATH)
+    raise ValueError(f"Unknown LOCK_BACKEND {name!r}; expected 'memory' or 'sqlite'")
+
+
+lead_locks = get_lock_backend()
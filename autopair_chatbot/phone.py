@@ -0,0 +1,105 @@
+# File: autopair_chatbot/phone.py
+import re
+from functools import lru_cache
+from autopair_chatbot.config import PHONE_CACHE_SIZE, logger
+
+# Regions tried, in order, for numbers without a country code
+FALLBACK_REGIONS = ["US", "GB", "PK", "IN", "CA", "AU"]
+
+# 10-digit NANP (optionally prefixed with 1): area code and exchange start 2-9
+NANP_DIGITS = re.compile(r"1?([2-9]\d{2}[2-9]\d{6})")
+PUNCTUATION = re.compile(r"[\s().\-]")
+
+
+# NANP area code -> region it was last valid in (at most ~800 entries)
+_npa_regions = {}
+
+
+def _is_valid_nanp(national):
+    """is_valid_number for +1<national>, without parsing.
+
+    Checking the area code's known region first skips libphonenumber's scan
+    of all ~25 NANP regions; a miss falls back to the full check.
+    """
+    import phonenumbers  # imported on first use: its metadata takes ~0.1s to load
+
+    number = phonenumbers.PhoneNumber(country_code=1, national_number=int(national))
+    region = _npa_regions.get(national[:3])
+    if region and phonenumbers.is_valid_number_for_region(number, region):
+        return True
+    if not phonenumbers.is_valid_number(number):
+        return False
+    _npa_regions[national[:3]] = phonenumbers.region_code_for_number(number)
+    return True
+
+
+def _normalize(phone):
+    """E.164 for a raw phone string, or None. Results match the region scan
+    of the original format_phone_number; the fast paths only skip work."""
+    import phonenumbers
+
+    compact = PUNCTUATION.sub("", phone)
+    if phone.startswith("+"):
+        match = NANP_DIGITS.fullmatch(compact[2:]) if compact.startswith("+1") else None
+        if match and len(compact) == 12:
+            if not _is_valid_nanp(match.group(1)):
+                raise ValueError("Phone number not valid")
+            return "+1" + match.group(1)
+        # Other international numbers: one parse
+        parsed = phonenumbers.parse(phone, None)
+        if not phonenumbers.is_valid_number(parsed):
+            raise ValueError("Phone number not valid")
+        return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+    # Plain NANP number: US is the first region tried, so a valid +1 number is
+    # exactly what the scan would return. Invalid ones fall through to the scan.
+    match = NANP_DIGITS.fullmatch(compact)
+    if match and _is_valid_nanp(match.group(1)):
+        return "+1" + match.group(1)
+
+    for region in FALLBACK_REGIONS:
+        try:
+            parsed = phonenumbers.parse(phone, region)
+            if phonenumbers.is_valid_number(parsed):
+                return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+        except phonenumbers.NumberParseException:
+            continue
+    raise ValueError("Could not parse number")
+
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def _normalize_cached(phone):
+    try:
+        return _normalize(phone)
+    except Exception as e:
+        logger.error(f"Phone format error: {e} | Raw: {phone}")
+        return None
+
+
+def normalize_phone(phone):
+    """E.164 phone number, or None if it can't be parsed. Memoized."""
+    if not isinstance(phone, str):
+        logger.error(f"Phone format error: not a string | Raw: {phone}")
+        return None
+    return _normalize_cached(phone.strip())
+
+
+def normalize_phones(phones):
+    """Normalize many numbers at once (e.g. a backfill page); each distinct
+    input is parsed once. Returns results in input order."""
+    results = {}
+    for phone in phones:
+        if phone not in results:
+            results[phone] = normalize_phone(phone)
+    return [results[phone] for phone in phones]
+
+
+def phone_cache_stats():
+    info = _normalize_cached.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 3) if lookups else 0.0
+    }
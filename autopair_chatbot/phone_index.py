@@ -0,0 +1,103 @@
+# File: autopair_chatbot/phone_index.py
+import threading
+import time
+from collections import OrderedDict
+from autopair_chatbot.config import PHONE_INDEX_MAX_SIZE, PHONE_INDEX_TTL
+
+
+def _phone_key(phone):
+    from autopair_chatbot.utils import format_phone_number
+    if not phone:
+        return None
+    return format_phone_number(phone)
+
+
+class PhoneIndex:
+    """LRU + TTL index of HubSpot contacts keyed by E.164 phone number."""
+
+    def __init__(self, max_size=PHONE_INDEX_MAX_SIZE, ttl=PHONE_INDEX_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_lead = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, phone):
+        key = _phone_key(phone)
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                contact = entry[0]
+                return {**contact, "properties": dict(contact.get("properties", {}))}
+            if entry:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, contact, phone=None):
+        """Index a contact under its own phone and, if given, the phone it was searched by."""
+        lead_id = contact.get("id")
+        if not lead_id or self.max_size <= 0:
+            return
+        keys = {_phone_key(contact.get("properties", {}).get("phone")), _phone_key(phone)} - {None}
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key in keys:
+                previous = self._entries.get(key)
+                if previous and str(previous[0].get("id")) != str(lead_id):
+                    # The number now belongs to another contact
+                    self._drop(key)
+                self._entries[key] = (contact, expires_at)
+                self._entries.move_to_end(key)
+                self._keys_by_lead.setdefault(str(lead_id), set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def update_properties(self, lead_id, properties):
+        """Apply our own write to the indexed copy so reads see it immediately."""
+        if "phone" in properties:
+            self.invalidate_lead(lead_id)
+            return
+        with self._lock:
+            for key in self._keys_by_lead.get(str(lead_id), ()):
+                entry = self._entries.get(key)
+                if not entry:
+                    continue
+                contact, expires_at = entry
+                merged = {**contact.get("properties", {}), **{k: str(v) for k, v in properties.items()}}
+                self._entries[key] = ({**contact, "properties": merged}, expires_at)
+
+    def invalidate_lead(self, lead_id):
+        with self._lock:
+            for key in list(self._keys_by_lead.get(str(lead_id), ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_lead.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def _drop(self, key):
+        contact, _ = self._entries.pop(key)
+        keys = self._keys_by_lead.get(str(contact.get("id")))
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_lead[str(contact.get("id"))]
+
+
+phone_index = PhoneIndex()
@@ -0,0 +1,183 @@
+# File: autopair_chatbot/plans.py
+"""Plan eligibility from the rule table in plan_rules.json.
+
+Tiers are checked in order and the first match wins: vehicle age (years)
+at most max_age_years and mileage strictly below mileage_below_km. The
+table also holds plan metadata and make-class surcharges, and the plan
+knowledge the model is given is written from it, so a pricing update is a
+JSON edit. Point PLAN_RULES_PATH at another file to override.
+"""
+import json
+import os
+import threading
+from autopair_chatbot.config import PLAN_RULES_PATH, logger
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plan_rules.json")
+
+
+class PlanRules:
+    def __init__(self, table):
+        self.tiers = table["tiers"]
+        self.plans = table["plans"]
+        self.make_classes = {
+            make.lower(): make_class
+            for make_class, makes in table.get("make_classes", {}).items()
+            for make in makes
+        }
+        for tier in self.tiers:
+            for name in tier["plans"]:
+                if name not in self.plans:
+                    raise ValueError(f"Tier {tier['name']!r} lists unknown plan {name!r}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def make_class(self, make):
+        return self.make_classes.get((make or "").strip().lower(), "standard")
+
+    def tier_for(self, vehicle_age, mileage):
+        """Index of the first tier the vehicle fits, or None."""
+        for index, tier in enumerate(self.tiers):
+            if vehicle_age <= tier["max_age_years"] and mileage < tier["mileage_below_km"]:
+                return index
+        return None
+
+    def result_for(self, tier_index, make_class=None):
+        """The qualify_plans() dict for a tier (None = not qualified)."""
+        if tier_index is None:
+            return {"qualified": False}
+        plans = []
+        for name in self.tiers[tier_index]["plans"]:
+            plan = {"name": name, "duration": self.plans[name]["duration"]}
+            if make_class is not None:
+                plan["surcharge"] = self.plans[name]["surcharges"].get(make_class, 0)
+            plans.append(plan)
+        return {"qualified": True, "plans": plans}
+
+
+_rules = None
+_rules_lock = threading.Lock()
+
+
+def get_plan_rules():
+    """The rule table, loaded once."""
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                _rules = PlanRules.load(PLAN_RULES_PATH or DEFAULT_RULES_PATH)
+    return _rules
+
+
+def qualify_plans(vehicle_year, mileage, make=None, current_year=None):
+    """Same result as always ({"qualified": ..., "plans": [{"name", "duration"}]});
+    passing `make` adds each plan's surcharge for that make."""
+    from autopair_chatbot.utils import now_in_toronto
+
+    try:
+        rules = get_plan_rules()
+        vehicle_age = (current_year or now_in_toronto().year) - _parse_int(vehicle_year, strip_commas=False)
+        mileage = _parse_int(mileage)
+        make_class = rules.make_class(make) if make is not None else None
+        return rules.result_for(rules.tier_for(vehicle_age, mileage), make_class)
+    except Exception as e:
+        logger.error(f"Qualification error: {e}")
+        return {"qualified": False, "error": "Invalid vehicle data"}
+
+
+def _parse_int(value, strip_commas=True):
+    """int(value), except that a float must be a whole number (2015.0, not
+    2015.5) and mileage text may contain commas."""
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"{value!r} is not a whole number")
+        return int(value)
+    return int(str(value).replace(",", "").strip() if strip_commas else value)
+
+
+def _parse_ints(values, np, strip_commas=True):
+    """Vectorized _parse_int; returns (ints, valid)."""
+    array = np.asarray(values)
+    if array.dtype.kind in "iu":
+        return array.astype(np.int64), np.ones(array.shape, dtype=bool)
+    if array.dtype.kind == "f":
+        valid = np.isfinite(array) & (array == np.floor(array))
+        return np.where(valid, array, 0).astype(np.int64), valid
+    text = array if array.dtype.kind == "U" else array.astype(str)
+    text = np.char.strip(np.char.replace(text, ",", "") if strip_commas else text)
+    negative = np.char.startswith(text, "-")
+    digits = np.char.lstrip(text, "+-")
+    valid = np.char.isdigit(digits) & (np.char.str_len(text) - np.char.str_len(digits) <= 1)
+    numbers = np.where(valid, digits, "0").astype(np.int64)
+    return np.where(negative, -numbers, numbers), valid
+
+
+class BatchQualification:
+    """Array results for a batch of leads.
+
+    tier:      index into the rule table's tiers, -1 when not qualified
+    valid:     False where year or mileage couldn't be parsed
+    make_class / surcharge: per lead, when makes were given (surcharge of the
+               tier's entry plan)
+    """
+
+    def __init__(self, rules, tier, valid, make_class=None, surcharge=None):
+        self.rules = rules
+        self.tier = tier
+        self.valid = valid
+        self.make_class = make_class
+        self.surcharge = surcharge
+
+    @property
+    def qualified(self):
+        return self.tier >= 0
+
+    def results(self):
+        """Materialize qualify_plans()-style dicts (for small batches)."""
+        out = []
+        for i, tier in enumerate(self.tier.tolist()):
+            if not self.valid[i]:
+                out.append({"qualified": False, "error": "Invalid vehicle data"})
+            else:
+                make_class = None if self.make_class is None else str(self.make_class[i])
+                out.append(self.rules.result_for(tier if tier >= 0 else None, make_class))
+        return out
+
+
+def qualify_batch(vehicle_years, mileages, makes=None, current_year=None):
+    """Qualify many leads at once with NumPy array operations."""
+    import numpy as np
+    from autopair_chatbot.utils import now_in_toronto
+
+    rules = get_plan_rules()
+    years, years_valid = _parse_ints(vehicle_years, np, strip_commas=False)
+    miles, miles_valid = _parse_ints(mileages, np)
+    valid = years_valid & miles_valid
+    age = (current_year or now_in_toronto().year) - years
+
+    tier = np.full(age.shape, -1, dtype=np.int8)
+    # Walk tiers last to first so earlier (better) tiers overwrite later ones
+    for index in range(len(rules.tiers) - 1, -1, -1):
+        rule = rules.tiers[index]
+        tier[valid & (age <= rule["max_age_years"]) & (miles < rule["mileage_below_km"])] = index
+
+    make_class = surcharge = None
+    if makes is not None:
+        # Few distinct makes: classify each once, then map back by index
+        distinct, inverse = np.unique(np.asarray(makes, dtype=str), return_inverse=True)
+        class_names = sorted(set(rules.make_classes.values()) | {"standard"})
+        class_index = np.array([class_names.index(rules.make_class(make)) for make in distinct], dtype=np.int8)
+        class_per_lead = class_index[inverse.reshape(-1)] if len(distinct) else np.zeros(0, dtype=np.int8)
+        make_class = np.array(class_names)[class_per_lead]
+
+        # Surcharge table: one row per tier (last row = not qualified), one column per make class
+        table = np.zeros((len(rules.tiers) + 1, len(class_names)), dtype=np.int64)
+        for index, rule in enumerate(rules.tiers):
+            entry_plan = rules.plans[rule["plans"][0]]
+            for column, name in enumerate(class_names):
+                table[index, column] = entry_plan["surcharges"].get(name, 0)
+        surcharge = table[tier, class_per_lead]
+
+    return BatchQualification(rules, tier, valid, make_class, surcharge)
@@ -0,0 +1,390 @@
+# File: autopair_chatbot/scheduler.py
+"""Place scheduled callbacks when they come due.
+
+handle_schedule_submission saves each callback to SQLite; a scheduler
+thread keeps pending ones in a heap ordered by due time and dials them
+through the same place_call -> /call-handler flow as "call me now", never
+running more than CALLBACK_CAPACITY calls at once (with DIALER_ENABLED, due
+callbacks are handed to the dialer, which paces them against its slots). Pending callbacks are
+reloaded from the database on restart, and new rows written by other
+processes are picked up every CALLBACK_REFRESH_INTERVAL seconds.
+
+A placed callback holds its slot until Twilio reports the call ended on
+/call-status. If that report never arrives (a lost webhook), the slot is
+freed CALLBACK_CALL_SECONDS after dialing.
+
+    python -m autopair_chatbot.scheduler stats
+    python -m autopair_chatbot.scheduler list
+    python -m autopair_chatbot.scheduler import-hubspot
+"""
+import argparse
+import heapq
+import json
+import sqlite3
+import threading
+import time
+from autopair_chatbot.config import (
+    CALLBACK_SCHEDULER, CALLBACK_DB_PATH, CALLBACK_CAPACITY, CALLBACK_CALL_SECONDS, CALLBACK_MAX_LATENESS,
+    CALLBACK_REFRESH_INTERVAL, logger
+)
+from autopair_chatbot.dialer import TERMINAL_STATUSES, dialer, request_call
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS callbacks (
+    lead_id TEXT PRIMARY KEY,
+    phone TEXT NOT NULL,
+    due_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    locked_until REAL,
+    updated_at REAL NOT NULL,
+    call_ends_at REAL
+);
+CREATE INDEX IF NOT EXISTS callbacks_pending ON callbacks (status, due_at);
+CREATE INDEX IF NOT EXISTS callbacks_updated ON callbacks (updated_at);
+"""
+
+
+class CallbackStore:
+    """SQLite table of callbacks, one per lead (rescheduling replaces it)."""
+
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            if "call_ends_at" not in [row[1] for row in conn.execute("PRAGMA table_info(callbacks)")]:
+                # Databases created before slots were freed by call status
+                conn.execute("ALTER TABLE callbacks ADD COLUMN call_ends_at REAL")
+        finally:
+            conn.close()
+
+    def schedule(self, lead_id, phone, due_at):
+        self._execute(
+            "INSERT OR REPLACE INTO callbacks (lead_id, phone, due_at, status, locked_until, updated_at) "
+            "VALUES (?, ?, ?, 'pending', NULL, ?)",
+            (str(lead_id), phone, due_at, time.time())
+        )
+
+    def pending(self, updated_after=0.0):
+        """(lead_id, phone, due_at) for pending callbacks, plus ones whose
+        dialing lease expired (the process died mid-call)."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT lead_id, phone, due_at FROM callbacks "
+                "WHERE ((status = 'pending' AND updated_at > ?) OR (status = 'dialing' AND locked_until <= ?))",
+                (updated_after, time.time())
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def claim(self, lead_id, due_at):
+        """Mark a callback as dialing, unless it was rescheduled or claimed
+        by another process since we loaded it."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE callbacks SET status = 'dialing', locked_until = ?, updated_at = ? "
+                "WHERE lead_id = ? AND due_at = ? AND (status = 'pending' OR (status = 'dialing' AND locked_until <= ?))",
+                (now + CALLBACK_CALL_SECONDS, now, lead_id, due_at, now)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def finish(self, lead_id, due_at, status, call_ends_at=None):
+        self._execute(
+            "UPDATE callbacks SET status = ?, locked_until = NULL, updated_at = ?, call_ends_at = ? "
+            "WHERE lead_id = ? AND due_at = ?",
+            (status, time.time(), call_ends_at, lead_id, due_at)
+        )
+
+    def active_call_ends(self):
+        """When each placed callback still holding a slot will free it at the
+        latest, soonest first."""
+        conn = self._connect()
+        try:
+            return [row[0] for row in conn.execute(
+                "SELECT call_ends_at FROM callbacks WHERE status = 'placed' AND call_ends_at > ? ORDER BY call_ends_at",
+                (time.time(),)
+            )]
+        finally:
+            conn.close()
+
+    def call_ended(self, lead_id):
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE callbacks SET call_ends_at = ? WHERE lead_id = ? AND status = 'placed' AND call_ends_at > ?",
+                (now, str(lead_id), now)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM callbacks GROUP BY status").fetchall())
+            next_due = conn.execute("SELECT MIN(due_at) FROM callbacks WHERE status = 'pending'").fetchone()[0]
+        finally:
+            conn.close()
+        return {**counts, "next_due_in_s": round(next_due - time.time(), 1) if next_due else None}
+
+    def list_callbacks(self, status="pending", limit=50):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT lead_id, phone, due_at, status FROM callbacks WHERE status = ? ORDER BY due_at LIMIT ?",
+                (status, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(["lead_id", "phone", "due_at", "status"], row)) for row in rows]
+
+    def _execute(self, query, params):
+        conn = self._connect()
+        try:
+            conn.execute(query, params)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+
+class CallbackScheduler:
+    """Heap of due times over the pending callbacks, dialed within a fixed
+    number of specialist slots (tracked in the store, so /call-status can
+    free one from any process)."""
+
+    def __init__(self, store, capacity=CALLBACK_CAPACITY, call_seconds=CALLBACK_CALL_SECONDS,
+                 max_lateness=CALLBACK_MAX_LATENESS, refresh_interval=CALLBACK_REFRESH_INTERVAL):
+        self.store = store
+        self.capacity = capacity
+        self.call_seconds = call_seconds
+        self.max_lateness = max_lateness
+        self.refresh_interval = refresh_interval
+        self._heap = []
+        self._current = {}  # lead_id -> (due_at, phone); heap entries not matching are stale
+        self._refreshed_at = 0.0
+        self._wakeup = threading.Condition()
+        self.placed = 0
+        self.missed = 0
+
+    def add(self, lead_id, phone, due_at):
+        with self._wakeup:
+            self._current[str(lead_id)] = (due_at, phone)
+            heapq.heappush(self._heap, (due_at, str(lead_id)))
+            self._wakeup.notify()
+
+    def wake(self):
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def refresh(self):
+        """Load callbacks written since the last refresh (or all, the first time)."""
+        since = self._refreshed_at - 1 if self._refreshed_at else 0.0
+        self._refreshed_at = time.time()
+        for lead_id, phone, due_at in self.store.pending(since):
+            if self._current.get(lead_id, (None,))[0] != due_at:
+                self.add(lead_id, phone, due_at)
+
+    def run_forever(self):
+        self.refresh()
+        logger.info(f"📅 Callback scheduler running with {len(self._current)} pending callbacks")
+        while True:
+            try:
+                self.run_due()
+                with self._wakeup:
+                    self._wakeup.wait(self._sleep_time())
+                if time.time() - self._refreshed_at >= self.refresh_interval:
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Error in callback scheduler: {e}")
+                time.sleep(self.refresh_interval)
+
+    def run_due(self):
+        """Dial every due callback that fits in a free slot."""
+        while True:
+            now = time.time()
+            with self._wakeup:
+                entry = self._next_due(now)
+                if entry is None or (not dialer and len(self.store.active_call_ends()) >= self.capacity):
+                    return
+                heapq.heappop(self._heap)
+                due_at, lead_id = entry
+                phone = self._current.pop(lead_id)[1]
+            self._dial(lead_id, phone, due_at, now)
+
+    def stats(self):
+        active_calls = len(self.store.active_call_ends())
+        with self._wakeup:
+            now = time.time()
+            return {
+                "pending": len(self._current),
+                "due_now": sum(1 for due_at, _ in self._current.values() if due_at <= now),
+                "active_calls": active_calls,
+                "capacity": self.capacity,
+                "placed": self.placed,
+                "missed": self.missed
+            }
+
+    def _next_due(self, now):
+        # Drop heap entries for callbacks that were rescheduled
+        while self._heap and self._current.get(self._heap[0][1], (None,))[0] != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if self._heap and self._heap[0][0] <= now:
+            return self._heap[0]
+        return None
+
+    def _sleep_time(self):
+        now = time.time()
+        wait = self.refresh_interval - (now - self._refreshed_at)
+        if self._heap:
+            wait = min(wait, self._heap[0][0] - now)
+        busy_until = [] if dialer else self.store.active_call_ends()
+        if len(busy_until) >= self.capacity:
+            # Woken early by wake() when a call-status report frees a slot
+            wait = max(wait, busy_until[0] - now)
+        return max(wait, 0.05)
+
+    def _dial(self, lead_id, phone, due_at, now):
+        from autopair_chatbot.jobs import queue_call, queue_contact_update
+        from autopair_chatbot.utils import now_in_toronto
+
+        if not self.store.claim(lead_id, due_at):
+            return
+        if now - due_at > self.max_lateness:
+            # Don't ring someone hours after the time they picked; let a person follow up
+            self.missed += 1
+            self.store.finish(lead_id, due_at, "missed")
+            logger.warning(f"⏰ Callback for lead {lead_id} missed by {int(now - due_at)}s; not dialing")
+            queue_contact_update(lead_id, {"properties": {"autopair_status": "Callback Missed"}})
+            return
+        call_ends_at = None
+        try:
+            if dialer:
+                # The dialer paces calls against live specialist slots
+                request_call(lead_id, phone, source="callback")
+            else:
+                queue_call(lead_id, phone, status_callback=True)
+                call_ends_at = time.time() + self.call_seconds
+        except Exception as e:
+            logger.error(f"❌ Scheduled callback to lead {lead_id} failed: {e}")
+            self.store.finish(lead_id, due_at, "failed")
+            return
+        self.placed += 1
+        self.store.finish(lead_id, due_at, "placed", call_ends_at)
+        logger.info(f"📅 Placed scheduled callback to lead {lead_id} ({int(now - due_at)}s after due)")
+        queue_contact_update(lead_id, {
+            "properties": {
+                "autopair_status": "Callback Placed",
+                "autopair_last_response": now_in_toronto().isoformat()
+            }
+        })
+
+
+_callback_store = None
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_callback_store():
+    global _callback_store
+    with _scheduler_lock:
+        if _callback_store is None:
+            _callback_store = CallbackStore(CALLBACK_DB_PATH)
+        return _callback_store
+
+
+def schedule_callback(lead_id, phone, due_at):
+    """Persist a callback (due_at in epoch seconds) and wake the scheduler if
+    it runs in this process."""
+    if not CALLBACK_SCHEDULER:
+        return
+    get_callback_store().schedule(lead_id, phone, due_at)
+    if _scheduler:
+        _scheduler.add(lead_id, phone, due_at)
+    logger.info(f"📅 Callback for lead {lead_id} saved for {time.strftime('%Y-%m-%d %H:%M', time.localtime(due_at))}")
+
+
+def record_call_status(lead_id, status):
+    """/call-status for a callback placed without the dialer: free its slot
+    once the call is over."""
+    if not CALLBACK_SCHEDULER or not lead_id or status not in TERMINAL_STATUSES:
+        return
+    if get_callback_store().call_ended(lead_id) and _scheduler:
+        _scheduler.wake()
+
+
+def callback_stats():
+    return _scheduler.stats() if _scheduler else None
+
+
+def start_callback_scheduler():
+    global _scheduler
+    if not CALLBACK_SCHEDULER:
+        return
+    _scheduler = CallbackScheduler(get_callback_store())
+    threading.Thread(target=_scheduler.run_forever, name="callback-scheduler", daemon=True).start()
+    logger.info(f"Callback scheduler thread started ({CALLBACK_DB_PATH}, {CALLBACK_CAPACITY} concurrent calls)")
+
+
+def import_from_hubspot(store):
+    """One-off: load future "Call Scheduled" leads saved before the scheduler existed."""
+    from autopair_chatbot.hubspot import hubspot_client
+    from autopair_chatbot.utils import format_phone_number
+
+    imported, after = 0, None
+    while True:
+        body = {
+            "filterGroups": [{"filters": [
+                {"propertyName": "autopair_status", "operator": "EQ", "value": "Call Scheduled"},
+                {"propertyName": "autopair_scheduled_time", "operator": "GT", "value": str(int(time.time() * 1000))}
+            ]}],
+            "properties": ["phone", "autopair_scheduled_time"],
+            "limit": 100
+        }
+        if after:
+            body["after"] = after
+        response = hubspot_client.post("/crm/v3/objects/contacts/search", json=body)
+        response.raise_for_status()
+        data = response.json()
+        for lead in data.get("results", []):
+            props = lead.get("properties", {})
+            phone = format_phone_number(props.get("phone") or "")
+            if phone and props.get("autopair_scheduled_time"):
+                store.schedule(lead["id"], phone, int(props["autopair_scheduled_time"]) / 1000)
+                imported += 1
+        after = data.get("paging", {}).get("next", {}).get("after")
+        if not after:
+            return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m autopair_chatbot.scheduler", description="Inspect scheduled callbacks")
+    parser.add_argument("--db", default=CALLBACK_DB_PATH, help="callback database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="count callbacks by status")
+    list_parser = sub.add_parser("list", help="list callbacks, soonest first")
+    list_parser.add_argument("--status", default="pending")
+    list_parser.add_argument("--limit", type=int, default=50)
+    sub.add_parser("import-hubspot", help="load future 'Call Scheduled' leads from HubSpot")
+    args = parser.parse_args(argv)
+
+    store = CallbackStore(args.db)
+    if args.command == "stats":
+        print(json.dumps(store.stats(), indent=2))
+    elif args.command == "list":
+        for callback in store.list_callbacks(args.status, args.limit):
+            print(json.dumps(callback))
+    elif args.command == "import-hubspot":
+        print(f"Imported {import_from_hubspot(store)} scheduled callbacks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# File: autopair_chatbot/sms_dispatcher.py
+import threading
+import time
+import zlib
+from collections import deque, Counter, OrderedDict
+from concurrent.futures import Future
+from autopair_chatbot.config import (
+    SMS_DISPATCHER, TWILIO_SENDER_NUMBERS, SMS_RATE_PER_SENDER, SMS_BURST_PER_SENDER, SMS_DISPATCH_WORKERS,
+    SMS_DISPATCH_QUEUE_SIZE, SMS_STATUS_CALLBACK, SMS_SENDER_MAX_WAIT, NGROK_URL, logger
+)
+from autopair_chatbot.workers import KeyedExecutor, TokenBucket
+
+
+class SenderPool:
+    """Token bucket per sender number, with a sticky sender per recipient.
+
+    A recipient's messages all come from one number (crc32 of the recipient
+    picks its home sender) so the conversation threads on the handset and
+    replies come back to the same number. Only when that sender would make
+    the message wait more than `max_wait` seconds does the recipient move to
+    the sender whose next token comes soonest, and stay there.
+    """
+
+    def __init__(self, numbers, rate, burst, max_wait=SMS_SENDER_MAX_WAIT, max_moved=10000):
+        if not numbers:
+            raise ValueError("At least one sender number is required")
+        self.numbers = list(numbers)
+        self.max_wait = max_wait
+        self.max_moved = max_moved
+        self._buckets = [TokenBucket(rate, burst) for _ in self.numbers]
+        self._moved = OrderedDict()
+        self._lock = threading.Lock()
+
+    def home(self, to_number):
+        return zlib.crc32(str(to_number).encode("utf-8")) % len(self.numbers)
+
+    def acquire(self, to_number):
+        with self._lock:
+            index = self._moved.get(to_number, self.home(to_number))
+            if self._buckets[index].delay() > self.max_wait:
+                index = min(range(len(self.numbers)), key=lambda i: self._buckets[i].delay())
+                self._move(to_number, index)
+            wait = self._buckets[index].reserve()
+        if wait:
+            time.sleep(wait)
+        return self.numbers[index], wait
+
+    def _move(self, to_number, index):
+        # Only recipients away from their home sender are remembered
+        self._moved.pop(to_number, None)
+        if index != self.home(to_number):
+            self._moved[to_number] = index
+            while len(self._moved) > self.max_moved:
+                self._moved.popitem(last=False)
+
+
+class SmsDispatcher:
+    """Paced outbound SMS.
+
+    Messages to the same recipient go out in order (one shard per recipient),
+    every send waits for a token from its sender number, and 429s back off and
+    re-queue for a token instead of failing the message.
+    """
+
+    def __init__(self, senders, rate=SMS_RATE_PER_SENDER, burst=SMS_BURST_PER_SENDER,
+                 workers=SMS_DISPATCH_WORKERS, queue_size=SMS_DISPATCH_QUEUE_SIZE):
+        self.pool = SenderPool(senders, rate, burst)
+        self._executor = KeyedExecutor("sms-dispatch", workers, queue_size)
+        self._lock = threading.Lock()
+        self._counters = Counter()
+        self._per_sender = Counter()
+        self._delivery = Counter()
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._recent_sends = deque()
+
+    def send(self, to_number, body, max_retries=3):
+        """Queue a message; the Future resolves to True once Twilio accepts it."""
+        future = Future()
+        if not self._executor.submit(to_number, self._deliver, to_number, body, max_retries, future, time.monotonic()):
+            self._count("rejected")
+            logger.error(f"❌ SMS dispatch queue full; dropped message to {to_number}")
+            future.set_result(False)
+        return future
+
+    def record_status(self, message_sid, status):
+        """Delivery outcome from Twilio's status callback."""
+        with self._lock:
+            self._delivery[status] += 1
+        if status in ("failed", "undelivered"):
+            logger.warning(f"⚠️ SMS {message_sid} {status}")
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._recent_sends and self._recent_sends[0] < now - 60:
+                self._recent_sends.popleft()
+            sent = self._counters["sent"]
+            return {
+                "senders": len(self.pool.numbers),
+                **dict(self._counters),
+                "queue_depth": self._executor.stats()["queue_depth"],
+                "throughput_per_s_1m": round(len(self._recent_sends) / 60, 3),
+                "queue_latency_avg_s": round(self._latency_total / sent, 3) if sent else 0.0,
+                "queue_latency_max_s": round(self._latency_max, 3),
+                "per_sender": dict(self._per_sender),
+                "delivery": dict(self._delivery)
+            }
+
+    def _deliver(self, to_number, body, max_retries, future, enqueued_at):
+        from autopair_chatbot.config import get_twilio_client
+
+        params = {"body": body, "to": to_number}
+        if SMS_STATUS_CALLBACK:
+            params["status_callback"] = f"{NGROK_URL}/sms-status"
+        try:
+            for attempt in range(1, max_retries + 1):
+                sender, _ = self.pool.acquire(to_number)
+                try:
+                    logger.info(f"📨 Sending SMS to {to_number} from {sender} (Attempt {attempt})")
+                    message = get_twilio_client().messages.create(from_=sender, **params)
+                except Exception as e:
+                    if getattr(e, "status", None) == 429 or "429" in str(e) or "Too Many Requests" in str(e):
+                        self._count("rate_limited")
+                        time.sleep(2 * attempt)
+                        continue
+                    logger.error(f"❌ Twilio error sending SMS to {to_number}: {e}")
+                    self._count("failed")
+                    future.set_result(False)
+                    return
+                latency = time.monotonic() - enqueued_at
+                with self._lock:
+                    self._counters["sent"] += 1
+                    self._per_sender[sender] += 1
+                    self._latency_total += latency
+                    self._latency_max = max(self._latency_max, latency)
+                    self._recent_sends.append(time.monotonic())
+                logger.info(f"✅ SMS sent to {to_number} ({getattr(message, 'sid', '')}, queued {latency:.2f}s)")
+                future.set_result(True)
+                return
+            logger.error(f"❌ Failed to send SMS to {to_number} after {max_retries} attempts")
+            self._count("failed")
+            future.set_result(False)
+        except Exception as e:
+            self._count("failed")
+            future.set_exception(e)
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+
+sms_dispatcher = SmsDispatcher(TWILIO_SENDER_NUMBERS) if SMS_DISPATCHER and TWILIO_SENDER_NUMBERS else None
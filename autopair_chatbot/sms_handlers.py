@@ -1,16 +1,77 @@
 # File: autopair_chatbot/sms_handlers.py
-from flask import request, jsonify
-from autopair_chatbot.utils import format_phone_number, is_schedule_text, get_ai_response, now_in_toronto, get_vehicle_info, send_sms
-from autopair_chatbot.hubspot import find_lead_by_phone, update_lead_in_hubspot
+from flask import request, jsonify, current_app, has_request_context
+from autopair_chatbot.utils import (
+    format_phone_number, is_schedule_text, get_ai_response, lead_context, now_in_toronto, get_vehicle_info
+)
+from autopair_chatbot.hubspot import find_lead_by_phone
+from autopair_chatbot.jobs import queue_sms, queue_contact_update, queue_call
+from autopair_chatbot.fast_answers import answer_engine
+from autopair_chatbot.conversation import conversations
+from autopair_chatbot.scheduler import schedule_callback
+from autopair_chatbot.dialer import dialer, request_call, wait_message
+
+
+EMPTY_TWIML = '<?xml version="1.0" encoding="UTF-8"?><Response/>'
 
 
 def sms_webhook():
+    from autopair_chatbot.config import SMS_ASYNC, TWILIO_VALIDATE_SIGNATURE, logger
+
     from_number = request.form.get("From")
     body = request.form.get("Body", "").strip().lower()
 
+    if TWILIO_VALIDATE_SIGNATURE and not is_valid_twilio_request():
+        logger.warning("⚠️ Rejected SMS webhook with invalid Twilio signature")
+        return jsonify({"status": "error", "message": "Invalid signature"}), 403
+
     if not from_number:
         return jsonify({"status": "error", "message": "Missing phone"}), 400
 
+    if SMS_ASYNC:
+        from autopair_chatbot.workers import sms_executor
+        app = current_app._get_current_object()
+        if sms_executor.submit(from_number, _run_sms_turn, app, from_number, body):
+            return EMPTY_TWIML, 200, {'Content-Type': 'text/xml'}
+        logger.warning(f"⚠️ SMS queue full; handling message from {from_number} inline")
+
+    return process_sms_turn(from_number, body)
+
+
+def is_valid_twilio_request():
+    from twilio.request_validator import RequestValidator
+    from autopair_chatbot.config import TWILIO_AUTH_TOKEN, NGROK_URL
+
+    url = f"{NGROK_URL}{request.full_path.rstrip('?')}"
+    validator = RequestValidator(TWILIO_AUTH_TOKEN)
+    return validator.validate(url, request.form, request.headers.get("X-Twilio-Signature", ""))
+
+
+def _run_sms_turn(app, from_number, body):
+    # Handlers build Flask responses, so the background turn needs an app context
+    with app.app_context():
+        process_sms_turn(from_number, body)
+
+
+def reply_to_lead(phone, message, payload):
+    """Send a reply to an inbound SMS.
+
+    With SMS_REPLY_MODE=twiml and a live webhook request, the reply goes back
+    as a TwiML <Message> in the response body instead of a separate REST send.
+    Background turns (SMS_ASYNC) have no request to answer, so they use REST.
+    """
+    from autopair_chatbot.config import SMS_REPLY_MODE
+
+    if SMS_REPLY_MODE == "twiml" and has_request_context():
+        from twilio.twiml.messaging_response import MessagingResponse
+        response = MessagingResponse()
+        response.message(message)
+        return str(response), 200, {'Content-Type': 'text/xml'}
+
+    queue_sms(phone, message)
+    return jsonify(payload)
+
+
+def process_sms_turn(from_number, body):
     lead = find_lead_by_phone(from_number)
     if not lead:
         return jsonify({"status": "error", "message": "Lead not found"}), 404
@@ -36,14 +97,14 @@ def sms_webhook():
 
 
 def handle_call_request(lead):
-    from autopair_chatbot.config import TWILIO_PHONE_NUMBER, NGROK_URL, twilio_client, logger
+    from autopair_chatbot.config import logger
 
     props = lead.get("properties", {})
     phone = format_phone_number(props.get("phone", ""))
     if not phone:
         return jsonify({"status": "error", "message": "Invalid phone number"}), 400
 
-    update_lead_in_hubspot(lead["id"], {
+    queue_contact_update(lead["id"], {
         "properties": {
             "autopair_status": "Call Requested",
             "autopair_last_response": now_in_toronto().isoformat()
@@ -51,43 +112,51 @@ def handle_call_request(lead):
     })
 
     try:
-        twilio_client.calls.create(
-            url=f"{NGROK_URL}/call-handler/{lead['id']}",
-            to=phone,
-            from_=TWILIO_PHONE_NUMBER
-        )
-        send_sms(phone, "We're calling you now! Please pick up.")
+        if dialer:
+            wait = request_call(lead["id"], phone)
+            queue_sms(phone, wait_message(wait) or "We're calling you now! Please pick up.")
+            return jsonify({"status": "success", "action": "Call queued", "estimated_wait_seconds": int(wait)})
+        queue_call(lead["id"], phone)
+        queue_sms(phone, "We're calling you now! Please pick up.")
         return jsonify({"status": "success", "action": "Call initiated"})
     except Exception as e:
         logger.error(f"Call failed: {e}")
-        send_sms(phone, "We're having trouble calling. Please try again later.")
+        queue_sms(phone, "We're having trouble calling. Please try again later.")
         return jsonify({"status": "error", "message": "Call failed"}), 500
 
 
 def handle_schedule_request(lead):
     phone = format_phone_number(lead.get("properties", {}).get("phone"))
-    send_sms(phone, "We're available Mon–Fri, 9am–6pm Eastern Time. When should we call you? (e.g. 'Tomorrow 10am' or 'Friday afternoon')")
+    response = reply_to_lead(
+        phone,
+        "We're available Mon–Fri, 9am–6pm Eastern Time. When should we call you? (e.g. 'Tomorrow 10am' or 'Friday afternoon')",
+        {"status": "success", "action": "Schedule requested"}
+    )
 
-    update_lead_in_hubspot(lead["id"], {
+    queue_contact_update(lead["id"], {
         "properties": {
             "autopair_status": "Awaiting Schedule",
             "autopair_last_response": now_in_toronto().isoformat()
         }
     })
-    return jsonify({"status": "success", "action": "Schedule requested"})
+    return response
 
 
 def handle_question_request(lead):
     phone = format_phone_number(lead.get("properties", {}).get("phone"))
-    send_sms(phone, "What would you like to know about your warranty options?")
+    response = reply_to_lead(
+        phone,
+        "What would you like to know about your warranty options?",
+        {"status": "success", "action": "Question requested"}
+    )
 
-    update_lead_in_hubspot(lead["id"], {
+    queue_contact_update(lead["id"], {
         "properties": {
             "autopair_status": "Awaiting Question",
             "autopair_last_response": now_in_toronto().isoformat()
         }
     })
-    return jsonify({"status": "success", "action": "Question requested"})
+    return response
 
 
 def handle_schedule_submission(lead, schedule_text):
@@ -98,7 +167,7 @@ def handle_schedule_submission(lead, schedule_text):
 
     if scheduled_time:
         formatted_time = scheduled_time.strftime("%A, %B %d at %I:%M %p")
-        send_sms(phone, f"Thank you! We've scheduled your callback for {formatted_time} (Eastern Time).")
+        message = f"Thank you! We've scheduled your callback for {formatted_time} (Eastern Time)."
         update_data = {
             "properties": {
                 "autopair_status": "Call Scheduled",
@@ -106,16 +175,19 @@ def handle_schedule_submission(lead, schedule_text):
                 "autopair_last_response": now_in_toronto().isoformat()
             }
         }
+        if phone:
+            schedule_callback(lead["id"], phone, scheduled_time.timestamp())
     else:
-        send_sms(phone, "I didn't understand that time. Please try again (e.g. 'Friday 2pm').")
+        message = "I didn't understand that time. Please try again (e.g. 'Friday 2pm')."
         update_data = {
             "properties": {
                 "autopair_last_response": now_in_toronto().isoformat()
             }
         }
 
-    update_lead_in_hubspot(lead["id"], update_data)
-    return jsonify({"status": "success"})
+    response = reply_to_lead(phone, message, {"status": "success"})
+    queue_contact_update(lead["id"], update_data)
+    return response
 
 
 def handle_question_submission(lead, question):
@@ -125,18 +197,22 @@ def handle_question_submission(lead, question):
     if not phone:
         return jsonify({"status": "error", "message": "Invalid phone number"}), 400
 
-    context = f"Customer: {props.get('firstname', '')}, Vehicle: {props.get('vehicle_year', '')} {props.get('vehicle_make', '')} {props.get('vehicle_model', '')}, Qualified plans: {props.get('autopair_qualified_plans', 'Unknown')}"
-    ai_response = get_ai_response(question, context)
+    context = lead_context(props)
+    ai_response = answer_engine.answer(question, props.get('autopair_qualified_plans'))
+    if ai_response is None:
+        answer_engine.record_llm()
+        ai_response = get_ai_response(question, context, conversations.messages(lead["id"]))
     if not ai_response or "trouble" in ai_response:
         ai_response = "A specialist will contact you shortly to assist further."
+    conversations.record(lead["id"], question, ai_response)
 
-    send_sms(phone, ai_response)
+    response = reply_to_lead(phone, ai_response, {"status": "success", "response": ai_response})
 
-    update_lead_in_hubspot(lead["id"], {
+    queue_contact_update(lead["id"], {
         "properties": {
             "autopair_status": "Question Answered",
             "autopair_last_question": question,
             "autopair_last_response": int(now_in_toronto().timestamp() * 1000)
         }
     })
-    return jsonify({"status": "success", "response": ai_response})
+    return response
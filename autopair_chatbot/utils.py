@@ -1,163 +1,42 @@
 # File: autopair_chatbot/utils.py
+import os
 import re
+import json
 import time
+import tempfile
 import pytz
-import phonenumbers
 from datetime import datetime, timedelta
-from autopair_chatbot.config import logger, client
-from autopair_chatbot.config import twilio_client, TWILIO_PHONE_NUMBER
-
-
-
-# === Modular Warranty Knowledge ===
-KNOWLEDGE_OVERVIEW = """
-🏆 Welcome to Autopair Warranty — Canada's Most Trusted Direct-to-Consumer Auto Warranty.
-
-We are transforming how Canadians protect their vehicles by:
-- Offering **coverage for all makes and models**
-- Providing access to **ANY licensed repair facility** in Canada or the US
-- Saving you up to **250% vs dealership markups**
-- Including **$0 deductible** in every plan — no extra cost for repairs
-- Eliminating dealership upsells, quotes, inspections, or hidden fees
-
-Trusted, insured, and backed by industry professionals:
-- 30+ years combined experience in automotive sales
-- Highly rated on Google and BBB
-- Thousands of satisfied customers across North America
-
-Compare us with others:
-- 💡 No quotes required, instant pricing
-- 🛠️ No forced repair centers — choose any licensed shop
-- 💳 Flexible payment options (bi-weekly or monthly), interest-FREE on approved credit
-"""
-
-PLAN_DETAILS = """
-🚘 Autopair Warranty Plans
-
-1. 🔹 STANDARD PLAN
-   - Duration: 24 months / Unlimited KM
-   - Price: $1299 or 6 bi-weekly payments of $217
-   - Repair Limit: $3,000 per claim
-   - Includes: Powertrain, electrical, brakes, A/C, transmission
-   - Excludes: Suspension, high-tech, sensors, hybrid
-   - Surcharge: $0 (premium), $499 (exotic)
-
-2. 🔹 THE WORKS PLAN
-   - Duration: 24 months / 50,000 KM
-   - Price: $1799 or 18 monthly payments of $100
-   - Repair Limit: $6,000 per claim
-   - Includes: All items in Standard + suspension, sensors, hybrid, electronics
-   - Surcharge: $299 (premium), $499 (exotic)
-
-3. 🔹 THE WORKS PLUS PLAN
-   - Duration: 48 months / 100,000 KM
-   - Price: $2599 or 18 monthly payments of $145
-   - Same coverage as THE WORKS, with double the term + km
-   - Surcharge: Same as WORKS
-
-🟩 Plan Eligibility:
-- STANDARD: Vehicle must be ≤10 years & <200,000 KM
-- WORKS / PLUS: Vehicle must be ≤6 years & <120,000 KM
-"""
-
-COVERAGE_COMPARISON = """
-📊 Coverage Comparison by Plan
-
-| Component                        | STANDARD | WORKS | WORKS PLUS |
-|----------------------------------|----------|--------|-------------|
-| Engine (gas/diesel)             | ✅       | ✅     | ✅          |
-| Transmission (auto/manual)      | ✅       | ✅     | ✅          |
-| Differentials (front/rear)      | ✅       | ✅     | ✅          |
-| Transfer Case (4x4)             | ✅       | ✅     | ✅          |
-| Turbo / Supercharger            | ✅       | ✅     | ✅          |
-| Seals & Gaskets (major)         | ✅       | ✅     | ✅          |
-| Front Suspension                | ❌       | ✅     | ✅          |
-| Rear Suspension                 | ❌       | ✅     | ✅          |
-| Steering System                 | ✅       | ✅     | ✅          |
-| Cooling System                  | ✅       | ✅     | ✅          |
-| Brakes                          | ✅       | ✅     | ✅          |
-| Electrical System               | ✅       | ✅     | ✅          |
-| Air Conditioning                | ✅       | ✅     | ✅          |
-| High-Tech & Electronics         | ❌       | ✅     | ✅          |
-| Sensors (ABS, O2, etc.)         | ❌       | ✅     | ✅          |
-| Hybrid Vehicle Components       | ❌       | ✅     | ✅          |
-| Courtesy Rental ($350 max)      | ✅       | ✅     | ✅          |
-| Towing ($100 max)               | ✅       | ✅     | ✅          |
-| Trip Interruption ($750 max)    | ✅       | ✅     | ✅          |
-| $0 Deductible                   | ✅       | ✅     | ✅          |
-"""
-
-CLAIMS_INFO = """
-🛠️ Autopair Warranty — Claims Process (Simple 4-Step Guide)
-
-1. 🏁 Choose Your Repair Shop  
-   - Take your vehicle to ANY licensed repair facility across Canada or the USA.  
-   - You’re not limited to dealers or pre-approved shops.
-
-2. 🔍 Get a Diagnostic Report  
-   - Ask the mechanic for a full diagnostic report.  
-   - Submit the report through Autopair’s online claims portal.
-
-3. ✅ Wait for Approval (12–24 hours)  
-   - If the issue is covered in your plan, it’s approved.  
-   - Wait for Autopair to confirm before approving any repairs.
-
-4. 💰 Receive Payment  
-   - Choose either:  
-     1. Payment via your Autopair prepaid card  
-     2. Direct Interac e-Transfer  
-   - All payments are processed through email after approval.
-
-⏳ Wait Period:  
-- Coverage begins after 30 days + 1,500 km from warranty purchase date.  
-- Claims cannot be made before this period is completed.
-
-🛑 Reminders:  
-- Do not authorize repairs until approval is received.  
-- Coverage applies to **listed components only**.  
-- **Inspection is not required at purchase**, but is required at time of claim.
-- **Maintenance required**: oil + filter every 6 months or 12,000 km.
-"""
-
-FAQS = """
-❓ Frequently Asked Questions (FAQs)
-
-1. **What is a factory or manufacturer’s warranty?**  
-Every new vehicle comes with a factory warranty that covers non-wear & tear parts. Once it expires, you’re on your own. Autopair fills that gap with extended coverage.
-
-2. **Why not just get this from a dealer?**  
-Dealers charge 2–3x more and force you to use specific repair centers. Autopair lets you choose your shop and buy directly — saving you thousands.
-
-3. **I still have factory coverage. Why buy now?**  
-You can defer Autopair coverage to begin right after your manufacturer warranty ends — up to 12 months in advance.
-
-4. **My dealer gave me a 3-month warranty. What should I do?**  
-You can still purchase Autopair and set it to start after the dealer plan ends.
-
-5. **Can I transfer my plan if I sell the car?**  
-Yes! Plans are fully transferable to the next owner. Just contact support.
-
-6. **What happens during a breakdown?**  
-Refer to the claims process: get a diagnosis, submit it, get approval, and choose your payment method (card or e-transfer).
-
-7. **Are you better than other warranty companies?**  
-Yes — we cut out middlemen, offer direct pricing, allow any licensed repair shop, and include $0 deductible on all plans.
-
-8. **Can I cancel my plan?**  
-Yes, within 10 days of purchase and no claims made. A $99 fee applies. After 10 days, plans are non-cancellable and non-refundable.
-
-9. **Is there a limit to how many claims I can make?**  
-No limit to the number of claims — but the max per claim is $3,000 (Standard) or $6,000 (Works), and total claim value cannot exceed the vehicle’s acquisition cost.
-
-10. **Do I need to maintain the vehicle?**  
-Yes. You must do oil + filter changes every 6 months or 12,000 km to keep coverage valid.
-
-11. **Do I need an inspection to buy a plan?**  
-No inspection is required to purchase. However, one is needed to process a claim.
-"""
+from autopair_chatbot.config import logger, TWILIO_PHONE_NUMBER
+from autopair_chatbot.config import KNOWLEDGE_ROUTER
+from autopair_chatbot.ai_client import chat_completer
+from autopair_chatbot.phone import normalize_phone
+from autopair_chatbot.answer_cache import answer_cache, cache_key, depersonalize, personalize
+from autopair_chatbot.knowledge import (
+    KNOWLEDGE_OVERVIEW, PLAN_DETAILS, COVERAGE_COMPARISON, CLAIMS_INFO, FAQS, keyword_route, retrieve_knowledge
+)
+
+
+AI_FALLBACK_ANSWER = "I'm having trouble answering that. A specialist will contact you soon."
+
+
+def build_qualification_message(lead, qualification):
+    props = lead.get("properties", {})
+    first_name = props.get("firstname", "there")
+    vehicle = f"{props.get('vehicle_year')} {props.get('vehicle_make', '')} {props.get('vehicle_model', '')}".strip()
+
+    if not qualification["qualified"]:
+        return f"Hi {first_name}, your vehicle doesn't qualify for our warranty plans."
+    plans = "\n".join(f"○ {p['name']}: {p['duration']}" for p in qualification["plans"])
+    return (
+        f"Hi {first_name}, your {vehicle} qualifies for:\n"
+        f"{plans}\n\n"
+        "Reply with:\n1⃣ Call now\n2⃣ Schedule call\n3⃣ Questions"
+    )
+
+
 def send_qualification_sms(lead, qualification):
-    """Send qualification SMS via Twilio"""
-    from autopair_chatbot.config import twilio_client, TWILIO_PHONE_NUMBER
+    """Send qualification SMS via Twilio (or the job queue when enabled)"""
+    from autopair_chatbot.config import JOBS_ENABLED
     props = lead.get("properties", {})
     
     phone = format_phone_number(props.get("phone", ""))
@@ -165,27 +44,15 @@ def send_qualification_sms(lead, qualification):
         logger.error("Invalid phone number format")
         return False
 
-    first_name = props.get("firstname", "there")
-    vehicle = f"{props.get('vehicle_year')} {props.get('vehicle_make', '')} {props.get('vehicle_model', '')}".strip()
-
     try:
-        if not qualification["qualified"]:
-            message = f"Hi {first_name}, your vehicle doesn't qualify for our warranty plans."
-        else:
-            plans = "\n".join(f"○ {p['name']}: {p['duration']}" for p in qualification["plans"])
-            message = (
-                f"Hi {first_name}, your {vehicle} qualifies for:\n"
-                f"{plans}\n\n"
-                "Reply with:\n1⃣ Call now\n2⃣ Schedule call\n3⃣ Questions"
-            )
+        message = build_qualification_message(lead, qualification)
+        if JOBS_ENABLED:
+            from autopair_chatbot.jobs import queue_sms
+            logger.info(f"📲 Queueing SMS to {phone} with message: {message}")
+            return queue_sms(phone, message)
 
         logger.info(f"📲 Sending SMS to {phone} with message: {message}")
-        twilio_client.messages.create(
-            body=message,
-            from_=TWILIO_PHONE_NUMBER,
-            to=phone
-        )
-        return True
+        return send_sms(phone, message)
     except Exception as e:
         logger.error(f"SMS send failed: {e}")
         return False
@@ -195,94 +62,119 @@ def now_in_toronto():
     return datetime.now(pytz.timezone("America/Toronto"))
 
 
-def qualify_plans(vehicle_year, mileage):
+def write_json_atomic(path, data):
+    """Write JSON so readers (and restarts) never see a half-written file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
     try:
-        current_year = now_in_toronto().year
-        vehicle_age = current_year - int(vehicle_year)
-        mileage = int(str(mileage).replace(",", "").strip())
-
-        qualifies_standard = vehicle_age <= 10 and mileage < 200000
-        qualifies_works = vehicle_age <= 6 and mileage < 120000
-
-        if qualifies_works:
-            return {
-                "qualified": True,
-                "plans": [
-                    {"name": "Works Plan", "duration": "24 months / 50,000 km"},
-                    {"name": "Works Plus Plan", "duration": "48 months / 100,000 km"}
-                ]
-            }
-        elif qualifies_standard:
-            return {
-                "qualified": True,
-                "plans": [{"name": "Standard Plan", "duration": "Basic coverage"}]
-            }
-        return {"qualified": False}
-    except Exception as e:
-        logger.error(f"Qualification error: {e}")
-        return {"qualified": False, "error": "Invalid vehicle data"}
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def to_epoch_millis(value):
+    """HubSpot timestamps come back as ISO strings or epoch millis."""
+    if value in (None, ""):
+        return None
+    value = str(value)
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def qualify_plans(vehicle_year, mileage, make=None):
+    from autopair_chatbot.plans import qualify_plans as qualify
+    return qualify(vehicle_year, mileage, make)
+
+
+def lead_context(props):
+    """The lead fields get_ai_response puts in the prompt and keys its cache on."""
+    vehicle = " ".join(props.get(field) or "" for field in ("vehicle_year", "vehicle_make", "vehicle_model"))
+    return {
+        "first_name": props.get("firstname") or "",
+        "vehicle": " ".join(vehicle.split()),
+        "plans": props.get("autopair_qualified_plans") or "Unknown"
+    }
 
 
-def get_ai_response(question, context=""):
+def get_ai_response(question, context=None, history=None):
+    """Answer a lead's question; `context` comes from lead_context and
+    `history` is earlier chat messages for follow-ups."""
     try:
-        question_lower = question.lower()
-
-        # Plan-specific response customization
-        if any(word in question_lower for word in ["plan", "price", "cost", "monthly"]):
-            if "Works Plus Plan" in context or "Works Plan" in context:
-                # Extract only the WORKS plans from PLAN_DETAILS
-                works_section_start = PLAN_DETAILS.find("2. 🔹 THE WORKS PLAN")
-                section = PLAN_DETAILS[works_section_start:].strip()
-            elif "Standard Plan" in context:
-                # Extract only the STANDARD plan from PLAN_DETAILS
-                works_section_start = PLAN_DETAILS.find("2. 🔹 THE WORKS PLAN")
-                section = PLAN_DETAILS[:works_section_start].strip()
-            else:
-                section = PLAN_DETAILS
-
-        elif any(word in question_lower for word in ["coverage", "included", "compare", "parts"]):
-            section = COVERAGE_COMPARISON
-        elif any(word in question_lower for word in ["claim", "repair", "shop", "approval", "mechanic"]):
-            section = CLAIMS_INFO
-        elif any(word in question_lower for word in ["how", "what if", "can i", "faq", "cancel"]):
-            section = FAQS
-        else:
-            section = KNOWLEDGE_OVERVIEW
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"You're a friendly warranty expert assistant. Use this knowledge:\n{section}\n\nCurrent context: {context}"
-                },
-                {
-                    "role": "user",
-                    "content": question
-                }
-            ],
-            temperature=0.7,
-            max_tokens=150
+        context = context or {}
+        context_text = (
+            f"Customer: {context.get('first_name', '')}, Vehicle: {context.get('vehicle', '')}, "
+            f"Qualified plans: {context.get('plans', 'Unknown')}"
         )
-        return response.choices[0].message.content.strip()
+        # Follow-ups ("what about the other one?") retrieve with the previous question too
+        previous = [m["content"] for m in history or [] if m["role"] == "user"][-1:]
+        query = " ".join(previous + [question])
+        if KNOWLEDGE_ROUTER == "keyword":
+            section = keyword_route(query, context_text)
+        else:
+            section = retrieve_knowledge(query, context.get("plans"))
+
+        # Answers that depend on earlier turns aren't reusable
+        key = None
+        if answer_cache.enabled and not history:
+            key = cache_key(section, question, context.get("plans"), context.get("vehicle"))
+            cached = answer_cache.get(key)
+            if cached:
+                logger.info("💾 Answer cache hit")
+                return personalize(cached, context)
+
+        answer = chat_completer.complete([
+            {
+                "role": "system",
+                "content": f"You're a friendly warranty expert assistant. Use this knowledge:\n{section}\n\nCurrent context: {context_text}"
+            },
+            *(history or []),
+            {
+                "role": "user",
+                "content": question
+            }
+        ])
+        if not answer:
+            return AI_FALLBACK_ANSWER
+        if key and answer:
+            answer_cache.set(key, depersonalize(answer, context))
+        return answer
 
     except Exception as e:
         logger.error(f"AI response error: {e}")
-        return "I'm having trouble answering that. A specialist will contact you soon."
+        return AI_FALLBACK_ANSWER
 
 
 def send_sms(to_number, message, max_retries=3):
-    from autopair_chatbot.config import twilio_client, TWILIO_PHONE_NUMBER
+    from autopair_chatbot.config import get_twilio_client, TWILIO_PHONE_NUMBER
     try:
         to_number = format_phone_number(to_number)
         if not to_number:
             logger.error("Invalid phone number format")
             return False
 
+        from autopair_chatbot.sms_dispatcher import sms_dispatcher
+        if sms_dispatcher:
+            from concurrent.futures import TimeoutError as FutureTimeout
+            from autopair_chatbot.config import SMS_SEND_TIMEOUT
+            future = sms_dispatcher.send(to_number, message, max_retries)
+            try:
+                return future.result(timeout=SMS_SEND_TIMEOUT)
+            except FutureTimeout:
+                # Still queued: the dispatcher owns it now, and a failure shows up in its
+                # counters and /sms-status. Reporting False would make callers resend it.
+                logger.warning(f"SMS to {to_number} still queued after {SMS_SEND_TIMEOUT:.0f}s; counting it as sent")
+                return True
+
         for attempt in range(1, max_retries + 1):
             try:
                 logger.info(f"📨 Sending SMS to {to_number} (Attempt {attempt})")
-                twilio_client.messages.create(
+                get_twilio_client().messages.create(
                     body=message,
                     from_=TWILIO_PHONE_NUMBER,
                     to=to_number
@@ -303,28 +195,7 @@ def send_sms(to_number, message, max_retries=3):
 
 
 def format_phone_number(phone):
-    try:
-        phone = phone.strip()
-        if phone.startswith("+"):
-            parsed = phonenumbers.parse(phone, None)
-        else:
-            for region in ["US", "GB", "PK", "IN", "CA", "AU"]:
-                try:
-                    parsed = phonenumbers.parse(phone, region)
-                    if phonenumbers.is_valid_number(parsed):
-                        break
-                except phonenumbers.NumberParseException:
-                    continue
-            else:
-                raise ValueError("Could not parse number")
-
-        if not phonenumbers.is_valid_number(parsed):
-            raise ValueError("Phone number not valid")
-
-        return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
-    except Exception as e:
-        logger.error(f"Phone format error: {e} | Raw: {phone}")
-        return None
+    return normalize_phone(phone)
 
 
 def is_schedule_text(text):
@@ -337,6 +208,13 @@ def is_schedule_text(text):
 
 
 def parse_schedule_text(text):
+    """Callback time for text like "Friday 2pm" as an aware America/Toronto
+    datetime (so .timestamp() doesn't depend on the host's timezone), or None."""
+    wall_time = _parse_schedule_wall_time(text)
+    return pytz.timezone("America/Toronto").localize(wall_time) if wall_time else None
+
+
+def _parse_schedule_wall_time(text):
     text = text.lower().strip()
     now = now_in_toronto()
     try:
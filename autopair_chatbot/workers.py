@@ -0,0 +1,301 @@
+# File: autopair_chatbot/workers.py
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from autopair_chatbot.config import (
+    LEAD_WORKERS, LEAD_QUEUE_SIZE, LEAD_QUEUE_POLICY, LEAD_QUEUE_BLOCK_TIMEOUT, LEAD_SPILL_PATH,
+    SMS_ASYNC_WORKERS, SMS_ASYNC_QUEUE_SIZE, BACKGROUND_WRITE_WORKERS, BACKGROUND_WRITE_QUEUE_SIZE, logger
+)
+
+QUEUE_POLICIES = ("block", "drop", "spill")
+
+
+class BoundedExecutor:
+    """Fixed pool of worker threads in front of a bounded queue.
+
+    Tasks are registered by name so they can be spilled to disk as JSON when
+    the queue is full. `policy` decides what happens then: "block" waits up
+    to `block_timeout` seconds for room (and drops after that), "drop"
+    rejects immediately, "spill" appends the task to `spill_path` and the
+    workers pick it back up once the queue drains.
+    """
+
+    def __init__(self, name, workers, queue_size, policy="block", block_timeout=5.0, spill_path=None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}; expected one of {QUEUE_POLICIES}")
+        if policy == "spill" and not spill_path:
+            raise ValueError("The spill policy needs a spill_path")
+        self.name = name
+        self.workers = workers
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._threads = []
+        self._in_flight = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "dropped": 0, "spilled": 0}
+        self._timings = {}
+
+    def register(self, task_name, func):
+        self._tasks[task_name] = func
+
+    def submit(self, task_name, *args, block_timeout=None):
+        """Queue a registered task. Returns False if it was dropped.
+        `block_timeout` overrides the executor's wait under the block policy."""
+        if task_name not in self._tasks:
+            raise KeyError(f"Task {task_name!r} is not registered with the {self.name} executor")
+        self._ensure_started()
+        item = (task_name, args, time.monotonic())
+        try:
+            if self.policy == "block":
+                self._queue.put(item, timeout=self.block_timeout if block_timeout is None else block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.policy == "spill":
+                self._spill(task_name, args)
+                self._count("spilled")
+                logger.warning(f"⚠️ {self.name} queue full; spilled {task_name}{args} to {self.spill_path}")
+                return True
+            self._count("dropped")
+            logger.error(f"❌ {self.name} queue full; dropped {task_name}{args}")
+            return False
+        self._count("submitted")
+        return True
+
+    def stats(self):
+        with self._lock:
+            timings = {
+                task: {
+                    "count": t["count"],
+                    "total_s": round(t["total_s"], 3),
+                    "max_s": round(t["max_s"], 3),
+                    "avg_s": round(t["total_s"] / t["count"], 3) if t["count"] else 0.0
+                }
+                for task, t in self._timings.items()
+            }
+            return {
+                "workers": self.workers,
+                "policy": self.policy,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "in_flight": self._in_flight,
+                **self._counters,
+                "timings": timings
+            }
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        if self.policy == "spill":
+            self._reload_spill()
+
+    def _run(self):
+        while True:
+            try:
+                task_name, args, queued_at = self._queue.get(timeout=1)
+            except queue.Empty:
+                if self.policy == "spill":
+                    self._reload_spill()
+                continue
+
+            with self._lock:
+                self._in_flight += 1
+            started = time.monotonic()
+            failed = False
+            try:
+                self._tasks[task_name](*args)
+            except Exception as e:
+                failed = True
+                logger.error(f"❌ {self.name} task {task_name}{args} failed: {e}")
+            finally:
+                finished = time.monotonic()
+                with self._lock:
+                    self._in_flight -= 1
+                    self._counters["failed" if failed else "completed"] += 1
+                    timing = self._timings.setdefault(task_name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+                    timing["count"] += 1
+                    timing["total_s"] += finished - started
+                    timing["max_s"] = max(timing["max_s"], finished - started)
+                logger.info(f"⏱️ {self.name} task {task_name}{args} took {finished - started:.2f}s "
+                            f"(queued {started - queued_at:.2f}s)")
+                self._queue.task_done()
+            if self.policy == "spill" and self._queue.empty():
+                self._reload_spill()
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _spill(self, task_name, args):
+        with self._spill_lock:
+            with open(self.spill_path, "a") as f:
+                f.write(json.dumps({"task": task_name, "args": list(args)}) + "\n")
+
+    def _reload_spill(self):
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            with open(self.spill_path) as f:
+                lines = [line.rstrip("\n") + "\n" for line in f if line.strip()]
+            remaining = []
+            bad = []
+            for line in lines:
+                if remaining:
+                    remaining.append(line)
+                    continue
+                try:
+                    entry = json.loads(line)
+                    item = (entry["task"], tuple(entry["args"]), time.monotonic())
+                except (ValueError, KeyError, TypeError) as e:
+                    # e.g. a line cut short by a crash mid-write; keep it for inspection
+                    bad.append(line)
+                    logger.error(f"❌ {self.name} skipped unreadable spill line ({e}): {line.strip()[:200]}")
+                    continue
+                try:
+                    self._queue.put_nowait(item)
+                    self._count("submitted")
+                except queue.Full:
+                    remaining.append(line)
+            if bad:
+                with open(f"{self.spill_path}.bad", "a") as f:
+                    f.writelines(bad)
+            tmp_path = f"{self.spill_path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(remaining)
+            os.replace(tmp_path, self.spill_path)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` banked."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Seconds until a token is available, without taking one."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def reserve(self):
+        """Take a token now (possibly going into debt) and return how long to wait before using it."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class KeyedExecutor:
+    """Runs tasks for the same key in submission order, different keys in parallel.
+
+    Each key is hashed onto one of `workers` shards; a shard is a single
+    thread with its own bounded queue.
+    """
+
+    def __init__(self, name, workers, queue_size):
+        self.name = name
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._total_s = 0.0
+        self._max_s = 0.0
+
+    def submit(self, key, func, *args):
+        """Queue func(*args) behind earlier tasks for `key`. Returns False if that shard is full."""
+        self._ensure_started()
+        shard = self._queues[zlib.crc32(str(key).encode("utf-8")) % len(self._queues)]
+        try:
+            shard.put_nowait((func, args))
+        except queue.Full:
+            with self._lock:
+                self._counters["rejected"] += 1
+            return False
+        with self._lock:
+            self._counters["submitted"] += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            done = self._counters["completed"] + self._counters["failed"]
+            return {
+                "workers": len(self._queues),
+                "queue_depth": sum(q.qsize() for q in self._queues),
+                "in_flight": self._in_flight,
+                **self._counters,
+                "avg_s": round(self._total_s / done, 3) if done else 0.0,
+                "max_s": round(self._max_s, 3)
+            }
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i, shard in enumerate(self._queues):
+                thread = threading.Thread(target=self._run, args=(shard,), name=f"{self.name}-shard-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self, shard):
+        while True:
+            func, args = shard.get()
+            with self._lock:
+                self._in_flight += 1
+            started = time.monotonic()
+            failed = False
+            try:
+                func(*args)
+            except Exception as e:
+                failed = True
+                logger.error(f"❌ {self.name} task failed: {e}")
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self._in_flight -= 1
+                    self._counters["failed" if failed else "completed"] += 1
+                    self._total_s += elapsed
+                    self._max_s = max(self._max_s, elapsed)
+                shard.task_done()
+
+
+lead_executor = BoundedExecutor(
+    "lead", LEAD_WORKERS, LEAD_QUEUE_SIZE, LEAD_QUEUE_POLICY,
+    block_timeout=LEAD_QUEUE_BLOCK_TIMEOUT, spill_path=LEAD_SPILL_PATH
+)
+
+sms_executor = KeyedExecutor("sms", SMS_ASYNC_WORKERS, SMS_ASYNC_QUEUE_SIZE)
+
+# Fire-and-forget CRM writes from latency-sensitive paths (e.g. IVR keypresses)
+write_executor = KeyedExecutor("crm-write", BACKGROUND_WRITE_WORKERS, BACKGROUND_WRITE_QUEUE_SIZE)
@@ -0,0 +1,115 @@
+# File: autopair_chatbot/write_queue.py
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from autopair_chatbot.config import HUBSPOT_BATCH_SIZE, HUBSPOT_FLUSH_INTERVAL, logger
+
+
+class HubSpotWriteQueue:
+    """Write-behind queue for contact updates.
+
+    Property changes are merged per contact and flushed through the batch
+    update endpoint once `batch_size` contacts are pending or
+    `flush_interval` seconds have passed, whichever comes first. Every
+    submit returns a Future that resolves to True/False when its contact
+    is written.
+    """
+
+    def __init__(self, batch_size=HUBSPOT_BATCH_SIZE, flush_interval=HUBSPOT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, lead_id, properties, callback=None):
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("HubSpot write queue is shut down")
+            entry = self._pending.setdefault(str(lead_id), {"properties": {}, "futures": []})
+            entry["properties"].update(properties)
+            entry["futures"].append(future)
+            self._ensure_started()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return future
+
+    def flush(self):
+        """Write everything pending right now. Safe to call from any thread."""
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    if not self._pending:
+                        return
+                    batch = []
+                    while self._pending and len(batch) < self.batch_size:
+                        batch.append(self._pending.popitem(last=False))
+                self._write(batch)
+
+    def shutdown(self, timeout=30):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hubspot-write-queue", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopped and len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                stopped = self._stopped
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing HubSpot write queue: {e}")
+            if stopped:
+                return
+
+    def _write(self, batch):
+        from autopair_chatbot.hubspot import batch_update_leads
+
+        inputs = [{"id": lead_id, "properties": entry["properties"]} for lead_id, entry in batch]
+        try:
+            outcome = batch_update_leads(inputs)
+        except Exception as e:
+            logger.error(f"❌ Batch write of {len(inputs)} contacts raised: {e}")
+            outcome = {}
+        for lead_id, entry in batch:
+            result = outcome.get(lead_id, False)
+            for future in entry["futures"]:
+                # None (contact not found) is passed through so callers can stop retrying
+                future.set_result(None if result is None else bool(result))
+
+
+write_queue = HubSpotWriteQueue()
+atexit.register(write_queue.shutdown)
+
+
+def queue_lead_update(lead_id, update_data, callback=None):
+    """Queue a contact update; returns a Future resolving to True/False (None
+    if the contact doesn't exist)."""
+    properties = update_data.get("properties", {})
+    logger.info(f"🗂️ Queued HubSpot update for lead {lead_id}: {sorted(properties)}")
+    return write_queue.submit(lead_id, properties, callback)
@@ -0,0 +1,129 @@
+"""Check the no-LLM answer engine against a corpus of customer questions.
+
+    python benchmarks/fast_answers.py [--threshold 0.8] [-v]
+
+Each entry is a question as customers text it and the intent that should
+answer it, or None when it must go to the model (open-ended, compound or
+off-topic). Reports coverage (share answered locally), precision (local
+answers with the right intent) and the per-question routing time.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autopair_chatbot.fast_answers import AnswerEngine  # noqa: E402
+
+CORPUS = [
+    ("can i cancel?", "cancel"),
+    ("what if i want to cancel later", "cancel"),
+    ("is it refundable", "cancel"),
+    ("can i get my money back if i change my mind", "cancel"),
+    ("whats the cancellation policy", "cancel"),
+    ("is there a deductible?", "deductible"),
+    ("whats the deductible", "deductible"),
+    ("do i pay a deductible per repair", "deductible"),
+    ("how much out of pocket per repair?", None),
+    ("when does coverage start", "waiting_period"),
+    ("is there a waiting period", "waiting_period"),
+    ("how soon can i make a claim? right away?", "waiting_period"),
+    ("when does the coverage begin after i buy", "waiting_period"),
+    ("can i transfer it if i sell my car", "transfer"),
+    ("is the plan transferable", "transfer"),
+    ("what happens if i sell the car, does the new owner get it", "transfer"),
+    ("is there a claim limit", "claim_limit"),
+    ("whats the max per claim", "claim_limit"),
+    ("how many claims can i make", "claim_limit"),
+    ("whats the repair limit on the works plan", "claim_limit"),
+    ("how much is it", "price"),
+    ("how much does it cost", "price"),
+    ("price?", "price"),
+    ("what are the monthly payments", "price"),
+    ("can i pay bi-weekly", "price"),
+    ("how long does the plan last", "term"),
+    ("how long is the warranty", "term"),
+    ("whats the duration", "term"),
+    ("do i need an inspection", "inspection"),
+    ("will you inspect the car first", "inspection"),
+    ("do i need to do oil changes", "maintenance"),
+    ("what maintenance do i need to do", "maintenance"),
+    ("can i use my own mechanic", "repair_shop"),
+    ("can i go to any shop", "repair_shop"),
+    ("which shop do i have to use", "repair_shop"),
+    # Must go to the model
+    ("is my transmission covered", None),
+    ("what does the works plan cover that standard doesnt", None),
+    ("whats the difference between the plans", None),
+    ("are you guys legit", None),
+    ("why should i buy from you instead of the dealer", None),
+    ("my check engine light is on what do i do", None),
+    ("how much is it and can i cancel if i dont like it", None),
+    ("i have a 2015 civic with 180k is that ok", None),
+    ("do you cover hybrids", None),
+    ("hello?", None),
+    ("ok thanks", None),
+    ("what happens during a breakdown", None),
+    ("how do i file a claim", None),
+    ("does the warranty cover rental cars while mine is in the shop and how long does approval take and "
+     "who pays the mechanic", None),
+    # A cue word about another topic, or negated: must go to the model
+    ("How much is towing covered?", None),
+    ("What does it cost to fix a transmission?", None),
+    ("I don't want to cancel, I want to buy the works plan", None),
+    ("Can I get a refund for the tow truck I paid for?", None),
+    ("Is an oil change covered under the plan?", None),
+    ("im not worried about the price, is the engine covered", None),
+    ("does it cover the inspection fee at the shop", None),
+    ("is there no limit on engine repairs", None),
+    ("cancel my call please", None),
+    ("i want to transfer my call to a specialist", None),
+    ("is there a deductible for towing", None),
+    ("whats covered during the waiting period", None),
+    ("do you do inspections on used cars before i buy", None),
+    ("cost", None),
+    # Generic cues still answer when the question is about the plan
+    ("whats the cost of the works plan", "price"),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=None, help="override FAST_ANSWER_THRESHOLD")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every routing decision")
+    args = parser.parse_args(argv)
+
+    engine = AnswerEngine(enabled=True) if args.threshold is None else AnswerEngine(args.threshold, True)
+    answered, correct, wrong_local, missed = 0, 0, [], []
+    started = time.perf_counter()
+    for question, expected in CORPUS:
+        match = engine.match(question)
+        intent = match[0] if match else None
+        if intent:
+            answered += 1
+            if intent == expected:
+                correct += 1
+            else:
+                wrong_local.append((question, expected, intent))
+        elif expected:
+            missed.append((question, expected))
+        if args.verbose:
+            print(f"{str(intent):<16} {str(expected):<16} {question}")
+    elapsed_us = (time.perf_counter() - started) * 1e6 / len(CORPUS)
+
+    answerable = sum(1 for _, expected in CORPUS if expected)
+    print(f"threshold {engine.threshold}")
+    print(f"answered locally  {answered}/{len(CORPUS)} ({answered / len(CORPUS):.0%} of all questions)")
+    print(f"coverage          {correct}/{answerable} of answerable questions")
+    print(f"precision         {correct}/{answered}" if answered else "precision         n/a")
+    print(f"routing time      {elapsed_us:.0f}us per question")
+    for question, expected, intent in wrong_local:
+        print(f"WRONG  {question!r}: answered as {intent}, expected {expected}")
+    for question, expected in missed:
+        print(f"MISSED {question!r}: expected {expected}")
+    return 1 if wrong_local else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
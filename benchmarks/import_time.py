@@ -0,0 +1,70 @@
+"""Cold-start import cost of the app, from `python -X importtime`.
+
+    python benchmarks/import_time.py [--module main] [--budget-ms 1000]
+
+Imports the module in a fresh interpreter --repeat times and reports the
+fastest run and the slowest imports in it. Exits 1 if the import takes
+longer than --budget-ms, or if a module that should only load on first use
+(the API clients, phone metadata, NumPy) is imported at startup.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ["openai", "twilio.rest", "phonenumbers", "numpy"]
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def measure(module):
+    """{name: (self_us, cumulative_us)} for one cold import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            imports[match.group(3)] = (int(match.group(1)), int(match.group(2)))
+    return imports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    best = min(runs, key=lambda imports: imports[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    print(f"import {args.module}: {total_ms:.1f}ms (best of {args.repeat}), {len(best)} modules")
+    print("slowest top-level packages (cumulative):")
+    packages = sorted(
+        ((name, cumulative) for name, (_, cumulative) in best.items() if "." not in name and name not in ("site", args.module)),
+        key=lambda item: -item[1]
+    )
+    for name, cumulative in packages[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}ms  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in best]
+    if eager:
+        print(f"FAIL: imported at startup, should load on first use: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f}ms is over the {args.budget_ms:.0f}ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Compare the keyword section router with BM25 passage retrieval.
+
+    python benchmarks/knowledge_retrieval.py
+
+Each labelled question names the knowledge section(s) that hold its answer.
+"top-1" counts questions whose first (best) block of prompt text comes from one
+of those sections; "recall" counts questions where any of the prompt text does. Prompt size is the knowledge text only, in estimated tokens.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autopair_chatbot.knowledge import (  # noqa: E402
+    SECTIONS, estimate_tokens, get_knowledge_index, keyword_route
+)
+
+PLANS = "Works Plan, Standard Plan"
+CONTEXT = f"Customer: Sam, Vehicle: 2018 Honda Civic, Qualified plans: {PLANS}"
+
+LABELLED_QUESTIONS = [
+    ("How much does the warranty cost?", {"plans"}),
+    ("What's the monthly payment?", {"plans"}),
+    ("How long does the Works plan last?", {"plans"}),
+    ("Is my car too old for the standard plan?", {"plans"}),
+    ("What's the mileage limit for the plans?", {"plans"}),
+    ("Is the transmission covered?", {"coverage"}),
+    ("Does it cover air conditioning?", {"coverage"}),
+    ("What parts are included?", {"coverage"}),
+    ("Are electrical components covered?", {"coverage"}),
+    ("Compare the plans for me", {"coverage", "plans"}),
+    ("How do I make a claim?", {"claims"}),
+    ("Can I use my own mechanic?", {"claims", "overview"}),
+    ("Do I need approval before a repair?", {"claims"}),
+    ("How long before coverage starts?", {"claims"}),
+    ("Who pays the shop?", {"claims"}),
+    ("Can I cancel my plan?", {"faqs"}),
+    ("Can I transfer it if I sell the car?", {"faqs"}),
+    ("Do I need an inspection?", {"faqs"}),
+    ("Is there a limit on claims?", {"faqs"}),
+    ("Do I have to do oil changes?", {"faqs"}),
+    ("I still have factory coverage, why buy now?", {"faqs"}),
+    ("Why not buy from the dealer?", {"faqs", "overview"}),
+    ("Is there a deductible?", {"overview", "coverage", "faqs"}),
+    ("Who are you guys?", {"overview"}),
+    ("Are you legit? Any reviews?", {"overview"}),
+    ("Do you offer financing?", {"overview"}),
+]
+
+
+def section_of(text):
+    return {name for name, body in SECTIONS.items() if text.strip() and text.strip() in body}
+
+
+def run_keyword(question):
+    text = keyword_route(question, CONTEXT)
+    return text, sorted(section_of(text))
+
+
+def run_bm25(question):
+    passages = get_knowledge_index().select(question, PLANS)
+    return "\n\n".join(p["text"] for p in passages), [p["section"] for p in passages]
+
+
+def evaluate(name, router):
+    top1, recall, tokens = 0, 0, 0
+    started = time.perf_counter()
+    for question, expected in LABELLED_QUESTIONS:
+        text, sections = router(question)
+        top1 += bool(sections) and sections[0] in expected
+        recall += bool(set(sections) & expected)
+        tokens += estimate_tokens(text)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    count = len(LABELLED_QUESTIONS)
+    print(f"{name:<8} top-1 {top1}/{count}  recall {recall}/{count}  "
+          f"avg knowledge tokens {tokens / count:.0f}  avg route time {elapsed_ms / count:.2f}ms")
+
+
+if __name__ == "__main__":
+    get_knowledge_index()
+    evaluate("keyword", run_keyword)
+    evaluate("bm25", run_bm25)
@@ -0,0 +1,126 @@
+"""Closed-loop HTTP load test for sizing gunicorn workers and threads.
+
+    python benchmarks/load_test.py --url http://localhost:5000 --path /call-handler/123 \
+        --concurrency 1 8 32 --duration 10
+
+Each of `concurrency` client threads sends a request, waits for the reply
+and sends the next one over a keep-alive connection. Prints throughput,
+latency percentiles and errors for each concurrency level. Start the
+server separately, e.g. WEB_CONCURRENCY=2 WEB_THREADS=8 gunicorn -c
+gunicorn.conf.py main:app.
+
+Most real requests wait on HubSpot/OpenAI. To load-test that shape without
+touching production APIs, run a stand-in HubSpot that answers every request
+with an empty result after a fixed delay, and point HUBSPOT_BASE_URL at it:
+
+    python benchmarks/load_test.py --stub-upstream 8099 --stub-delay-ms 200
+    HUBSPOT_BASE_URL=http://localhost:8099 SMS_ASYNC=false gunicorn -c gunicorn.conf.py main:app
+    python benchmarks/load_test.py --path /sms-webhook --data From=+14165550100 --data Body=hi
+
+(an unknown number costs one contact search, then a 404 "Lead not found").
+"""
+import argparse
+import http.client
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlsplit
+
+
+def serve_stub_upstream(port, delay_ms):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(delay_ms / 1000)
+            body = b'{"results": [], "total": 0}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PATCH = _reply
+
+        def log_message(self, *args):
+            pass
+
+    print(f"stand-in upstream on :{port}, {delay_ms}ms per request")
+    ThreadingHTTPServer(("0.0.0.0", port), Handler).serve_forever()
+
+
+def run_client(target, method, path, body, deadline, latencies, errors):
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+    conn.close()
+
+
+def run_level(target, method, path, body, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=run_client, args=(target, method, path, body, deadline, latencies, errors))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--path", default="/call-handler/123")
+    parser.add_argument("--method", default="POST")
+    parser.add_argument("--data", action="append", default=[], metavar="KEY=VALUE", help="form field (repeatable)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--stub-upstream", type=int, metavar="PORT", help="serve a slow stand-in HubSpot instead")
+    parser.add_argument("--stub-delay-ms", type=float, default=200)
+    args = parser.parse_args(argv)
+    if args.stub_upstream:
+        serve_stub_upstream(args.stub_upstream, args.stub_delay_ms)
+        return 0
+
+    target = urlsplit(args.url)
+    body = urlencode([tuple(field.split("=", 1)) for field in args.data]) if args.data else None
+    print(f"{args.method} {args.url}{args.path}, {args.duration:.0f}s per level")
+    print(f"{'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for concurrency in args.concurrency:
+        latencies, errors, elapsed = run_level(target, args.method, args.path, body, concurrency, args.duration)
+        if not latencies:
+            print(f"{concurrency:>8} {'-':>9} {'-':>8} {'-':>8} {'-':>8} {len(errors):>7}")
+            continue
+        latencies.sort()
+        print(f"{concurrency:>8} {len(latencies) / elapsed:>9.1f} {statistics.median(latencies) * 1000:>8.1f} "
+              f"{percentile(latencies, 0.95) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} {len(errors):>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
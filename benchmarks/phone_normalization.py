@@ -0,0 +1,105 @@
+"""Throughput of phone normalization: the original region scan vs normalize_phone.
+
+    python benchmarks/phone_normalization.py [--count 5000]
+
+Runs a realistic mix (E.164, NANP with punctuation, 11-digit NANP, UK and
+Indian numbers, junk) through:
+  legacy   the original format_phone_number (no cache)
+  cold     normalize_phone on distinct inputs (fast paths, cache misses)
+  warm     normalize_phone on repeated inputs (cache hits)
+  batch    normalize_phones over the whole list
+and checks every result matches the legacy function.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+import phonenumbers
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autopair_chatbot import phone as phone_module  # noqa: E402
+from autopair_chatbot.phone import normalize_phone, normalize_phones  # noqa: E402
+
+
+def legacy_format_phone_number(phone):
+    """format_phone_number as it was before the phone module (logging removed)."""
+    try:
+        phone = phone.strip()
+        if phone.startswith("+"):
+            parsed = phonenumbers.parse(phone, None)
+        else:
+            for region in ["US", "GB", "PK", "IN", "CA", "AU"]:
+                try:
+                    parsed = phonenumbers.parse(phone, region)
+                    if phonenumbers.is_valid_number(parsed):
+                        break
+                except phonenumbers.NumberParseException:
+                    continue
+            else:
+                raise ValueError("Could not parse number")
+        if not phonenumbers.is_valid_number(parsed):
+            raise ValueError("Phone number not valid")
+        return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+    except Exception:
+        return None
+
+
+def sample_numbers(count, seed=7):
+    rng = random.Random(seed)
+    area_codes = ["416", "647", "905", "613", "212", "415", "312", "604"]
+    numbers = []
+    for _ in range(count):
+        area, exchange, line = rng.choice(area_codes), rng.randint(200, 999), rng.randint(0, 9999)
+        kind = rng.random()
+        if kind < 0.35:
+            numbers.append(f"+1{area}{exchange}{line:04d}")
+        elif kind < 0.65:
+            numbers.append(f"({area}) {exchange}-{line:04d}")
+        elif kind < 0.75:
+            numbers.append(f"1-{area}-{exchange}-{line:04d}")
+        elif kind < 0.85:
+            numbers.append(f"07{rng.randint(100, 999)} {rng.randint(100000, 999999)}")
+        elif kind < 0.95:
+            numbers.append(f"9{rng.randint(100000000, 999999999)}")
+        else:
+            numbers.append(rng.choice(["", "n/a", "12345", "555-CALL-NOW"]))
+    return numbers
+
+
+def timed(label, func, inputs):
+    started = time.perf_counter()
+    results = func(inputs)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<8} {len(inputs) / elapsed:>12,.0f} numbers/s  ({elapsed * 1e6 / len(inputs):.1f}us each)")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5000)
+    args = parser.parse_args(argv)
+    logging.getLogger(phone_module.logger.name).setLevel(logging.CRITICAL)
+
+    numbers = sample_numbers(args.count)
+    expected = timed("legacy", lambda xs: [legacy_format_phone_number(x) for x in xs], numbers)
+
+    phone_module._normalize_cached.cache_clear()
+    cold = timed("cold", lambda xs: [normalize_phone(x) for x in xs], numbers)
+    warm = timed("warm", lambda xs: [normalize_phone(x) for x in xs], numbers)
+    phone_module._normalize_cached.cache_clear()
+    batch = timed("batch", normalize_phones, numbers)
+
+    mismatches = [(n, e, c) for n, e, c in zip(numbers, expected, cold) if e != c]
+    assert cold == warm == batch
+    print(f"results identical to legacy: {not mismatches} ({len(mismatches)} mismatches)")
+    for number, legacy, new in mismatches[:10]:
+        print(f"  {number!r}: legacy={legacy} new={new}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
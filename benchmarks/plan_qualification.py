@@ -0,0 +1,71 @@
+"""Per-lead cost of plan qualification: scalar qualify_plans vs qualify_batch.
+
+    python benchmarks/plan_qualification.py [--count 100000]
+
+Generates HubSpot-shaped string inputs (years, mileages with thousands
+separators, makes, a few junk values), qualifies them one at a time and as
+one batch, and checks both give the same answers.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autopair_chatbot.config import logger  # noqa: E402
+from autopair_chatbot.plans import qualify_batch, qualify_plans, get_plan_rules  # noqa: E402
+
+MAKES = ["Honda", "Toyota", "Ford", "BMW", "Audi", "Porsche", "Kia", "Lexus", "Ferrari", "Chevrolet"]
+CURRENT_YEAR = 2025
+
+
+def sample_leads(count, seed=11):
+    rng = random.Random(seed)
+    years, mileages, makes = [], [], []
+    for _ in range(count):
+        years.append(str(rng.randint(2005, CURRENT_YEAR)) if rng.random() > 0.01 else rng.choice(["", "n/a"]))
+        miles = rng.randint(0, 260000)
+        mileages.append(f"{miles:,}" if rng.random() < 0.5 else str(miles))
+        makes.append(rng.choice(MAKES))
+    return years, mileages, makes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args(argv)
+    logger.setLevel(logging.CRITICAL)
+
+    years, mileages, makes = sample_leads(args.count)
+    get_plan_rules()
+    qualify_batch(years[:10], mileages[:10], makes[:10], current_year=CURRENT_YEAR)  # import numpy outside the timing
+
+    started = time.perf_counter()
+    scalar = [qualify_plans(y, m, make, current_year=CURRENT_YEAR) for y, m, make in zip(years, mileages, makes)]
+    scalar_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = qualify_batch(years, mileages, makes, current_year=CURRENT_YEAR)
+    batch_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    materialized = batch.results()
+    results_s = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(scalar, materialized) if a != b)
+    per_lead = lambda seconds: seconds / args.count * 1e6  # noqa: E731
+    print(f"leads                {args.count:,}")
+    print(f"scalar qualify_plans {scalar_s * 1000:8.1f}ms  {per_lead(scalar_s):6.2f}us/lead")
+    print(f"qualify_batch        {batch_s * 1000:8.1f}ms  {per_lead(batch_s):6.2f}us/lead  "
+          f"({scalar_s / batch_s:.0f}x)")
+    print(f"  + .results() dicts {results_s * 1000:8.1f}ms  {per_lead(results_s):6.2f}us/lead")
+    print(f"qualified            {int(batch.qualified.sum()):,}")
+    print(f"mismatches           {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# gunicorn.conf.py
+"""Production server: gunicorn -c gunicorn.conf.py main:app
+
+Each worker serves requests with WEB_THREADS threads. Exactly one worker
+(elected through autopair_chatbot.leader) also runs the background loops;
+if it dies, another worker takes over. See "Production server" in the
+README for sizing.
+
+Lead locks, SMS pacing and ordering, and conversation memory still live in
+each process, so the default is one worker with many threads. More workers
+require LOCK_BACKEND=sqlite and are refused otherwise.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("WEB_THREADS", "16"))
+worker_class = "gthread"
+# The synchronous SMS path can wait up to AI_TURN_DEADLINE on OpenAI plus HubSpot calls
+timeout = int(os.getenv("WEB_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+
+def on_starting(server):
+    from autopair_chatbot.config import LOCK_BACKEND, logger
+
+    if server.cfg.workers <= 1:
+        return
+    if LOCK_BACKEND != "sqlite":
+        # With in-process locks a webhook lead and the leader's poll can both send the qualification SMS
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={server.cfg.workers} needs LOCK_BACKEND=sqlite (got {LOCK_BACKEND!r}); "
+            "use one worker with more WEB_THREADS instead"
+        )
+    logger.warning(
+        f"⚠️ Running {server.cfg.workers} workers: the SMS rate limit applies per worker, per-number SMS "
+        "ordering and conversation memory only hold within a worker"
+    )
+
+
+def post_worker_init(worker):
+    from autopair_chatbot.config import BACKGROUND_TASKS
+    from autopair_chatbot.leader import start_leader_election
+    from main import start_background_tasks
+
+    if BACKGROUND_TASKS:
+        start_leader_election(start_background_tasks)
@@ -1,11 +1,8 @@
 # main.py
-import os
-from dotenv import load_dotenv
-from flask import Flask
+from flask import Flask, jsonify, request
 import logging
-from autopair_chatbot import call_handlers, sms_handlers, hubspot, lead_monitor
+from autopair_chatbot import call_handlers, sms_handlers, hubspot, lead_monitor, lead_store, jobs, scheduler, dialer
 
-load_dotenv()
 app = Flask(__name__)
 
 # Setup logging
@@ -32,15 +29,110 @@ def sms_webhook_route():
 def hubspot_webhook_route():
     return hubspot.hubspot_webhook()
 
+def is_admin_request():
+    """X-Admin-Token matches ADMIN_TOKEN (never, when ADMIN_TOKEN is unset)."""
+    import hmac
+    from autopair_chatbot.config import ADMIN_TOKEN
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    if not is_admin_request():
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+    from autopair_chatbot.phone_index import phone_index
+    from autopair_chatbot.workers import lead_executor, sms_executor, write_executor
+    from autopair_chatbot.sms_dispatcher import sms_dispatcher
+    from autopair_chatbot.answer_cache import answer_cache
+    from autopair_chatbot.fast_answers import answer_engine
+    from autopair_chatbot.ai_client import chat_completer
+    from autopair_chatbot.conversation import conversations
+    from autopair_chatbot.phone import phone_cache_stats
+    from autopair_chatbot.scheduler import callback_stats
+    from autopair_chatbot.dialer import dialer
+    from autopair_chatbot.leader import leader_stats
+    return jsonify({
+        "phone_index": phone_index.stats(),
+        "phone_cache": phone_cache_stats(),
+        "lead_executor": lead_executor.stats(),
+        "sms_executor": sms_executor.stats(),
+        "write_executor": write_executor.stats(),
+        "sms_dispatcher": sms_dispatcher.stats() if sms_dispatcher else None,
+        "answer_cache": answer_cache.stats(),
+        "fast_answers": answer_engine.stats(),
+        "ai": chat_completer.stats(),
+        "conversations": conversations.stats(),
+        "callbacks": callback_stats(),
+        "dialer": dialer.stats() if dialer else None,
+        "leader": leader_stats()
+    })
+
+@app.route("/admin/answer-cache/clear", methods=["POST"])
+def clear_answer_cache_route():
+    from autopair_chatbot.answer_cache import answer_cache
+    if not is_admin_request():
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+    answer_cache.clear()
+    return jsonify({"status": "cleared"})
+
+@app.route("/sms-status", methods=["POST"])
+def sms_status_route():
+    from autopair_chatbot.config import TWILIO_VALIDATE_SIGNATURE
+    from autopair_chatbot.sms_dispatcher import sms_dispatcher
+    if TWILIO_VALIDATE_SIGNATURE and not sms_handlers.is_valid_twilio_request():
+        return "", 403
+    if sms_dispatcher:
+        sms_dispatcher.record_status(request.form.get("MessageSid"), request.form.get("MessageStatus"))
+    return "", 204
+
+@app.route("/call-status", methods=["POST"])
+def call_status_route():
+    from autopair_chatbot.config import TWILIO_VALIDATE_SIGNATURE
+    from autopair_chatbot.dialer import dialer
+    if TWILIO_VALIDATE_SIGNATURE and not sms_handlers.is_valid_twilio_request():
+        return "", 403
+    if "DialCallStatus" in request.form:
+        # <Dial action> for an inbound call: the specialist leg ended, so hang up
+        from twilio.twiml.voice_response import VoiceResponse
+        from autopair_chatbot.dialer import TERMINAL_STATUSES
+        status = request.form.get("DialCallStatus")
+        if dialer:
+            dialer.record_status(request.form.get("CallSid"), status if status in TERMINAL_STATUSES else "completed",
+                                 request.form.get("DialCallDuration"))
+        return str(VoiceResponse()), 200, {'Content-Type': 'text/xml'}
+    if dialer:
+        dialer.record_status(request.form.get("CallSid"), request.form.get("CallStatus"),
+                             request.form.get("CallDuration"), request.args.get("lead_id"))
+    else:
+        scheduler.record_call_status(request.args.get("lead_id"), request.form.get("CallStatus"))
+    return "", 204
+
 # Add this route for Twilio direct voice webhook
 @app.route("/voice-inbound", methods=["POST"])
 def voice_inbound_handler():
     from twilio.twiml.voice_response import VoiceResponse
+    from autopair_chatbot.config import NGROK_URL
+    from autopair_chatbot.dialer import dialer
     response = VoiceResponse()
     response.say("Welcome to Auto Pair Warranty. Please wait while we connect you.")
-    response.dial("+12185683118", record="record-from-answer")
+    if dialer:
+        # Hold a specialist slot for this call until the dial ends (reported to /call-status)
+        destination = dialer.assign_destination(request.values.get("CallSid"), f"inbound:{request.values.get('From', '')}")
+        response.dial(destination, record="record-from-answer", action=f"{NGROK_URL}/call-status")
+    else:
+        response.dial("+12185683118", record="record-from-answer")
     return str(response), 200, {'Content-Type': 'text/xml'}
 
-if __name__ == "__main__":
+def start_background_tasks():
+    """Polling, sync, job and call loops. Run these in exactly one process:
+    directly under the dev server, in the elected leader under gunicorn."""
     lead_monitor.start_lead_monitor()
+    lead_store.start_lead_store_sync()
+    jobs.start_job_drainer()
+    scheduler.start_callback_scheduler()
+    dialer.start_dialer()
+
+if __name__ == "__main__":
+    # Development server; in production use: gunicorn -c gunicorn.conf.py main:app
+    start_background_tasks()
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,25 @@
+import pytest
+import main
+from autopair_chatbot import config
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    return main.app.test_client()
+
+
+def test_metrics_needs_the_admin_token(client):
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.get("/metrics", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    assert "lead_executor" in response.get_json()
+
+
+def test_metrics_is_closed_without_an_admin_token(client, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", None)
+
+    assert client.get("/metrics", headers={"X-Admin-Token": ""}).status_code == 403
@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+import pytest
+from autopair_chatbot import config
+from autopair_chatbot.ai_client import ChatCompleter
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.response = SimpleNamespace(close=lambda: None)
+
+    def __iter__(self):
+        for delay, text in self.chunks:
+            time.sleep(delay)
+            yield chunk(text)
+
+
+class FakeClient:
+    """Plays one scripted reply per request: an exception or (delay, text) chunks."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **options):
+        return self
+
+    def create(self, **kwargs):
+        reply = self.replies[self.requests]
+        self.requests += 1
+        if isinstance(reply, Exception):
+            raise reply
+        return FakeStream(reply)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(*replies):
+        client = FakeClient(replies)
+        monkeypatch.setattr(config, "get_openai_client", lambda: client)
+        return client
+    return install
+
+
+def test_hedges_as_soon_as_the_primary_fails(client):
+    fake = client(RuntimeError("connection reset"), [(0, "Yes, it's covered.")])
+    started = time.monotonic()
+
+    reply = ChatCompleter(deadline=5, hedge_delay=2).complete([])
+
+    assert reply == "Yes, it's covered."
+    assert fake.requests == 2
+    assert time.monotonic() - started < 1
+
+
+def test_deadline_returns_the_text_streamed_so_far(client):
+    client([(0, "Yes, engines are covered. "), (0, "The Works plan also"), (5, " covers turbos.")])
+
+    reply = ChatCompleter(deadline=0.5, hedge_delay=0).complete([])
+
+    assert reply == "Yes, engines are covered."
+
+
+def test_nothing_streamed_by_the_deadline_falls_back(client):
+    client([(5, "Too late.")])
+
+    assert ChatCompleter(deadline=0.3, hedge_delay=0).complete([]) is None
@@ -0,0 +1,48 @@
+import pytest
+from autopair_chatbot import utils
+from autopair_chatbot.answer_cache import AnswerCache, depersonalize
+
+
+class FakeCompleter:
+    def __init__(self):
+        self.prompts = []
+
+    def complete(self, messages):
+        self.prompts.append(messages[0]["content"])
+        return f"Hi Sam, yes, your Civic is covered ({len(self.prompts)})"
+
+
+@pytest.fixture
+def completer(monkeypatch):
+    completer = FakeCompleter()
+    monkeypatch.setattr(utils, "chat_completer", completer)
+    monkeypatch.setattr(utils, "answer_cache", AnswerCache(max_size=100, ttl=60, path=None))
+    return completer
+
+
+def lead(firstname, year, make, model):
+    return utils.lead_context({
+        "firstname": firstname, "vehicle_year": year, "vehicle_make": make, "vehicle_model": model,
+        "autopair_qualified_plans": "Standard Plan"
+    })
+
+
+def test_other_vehicles_do_not_share_answers(completer):
+    civic = utils.get_ai_response("is my engine covered?", lead("Sam", "2018", "Honda", "Civic"))
+    f150 = utils.get_ai_response("is my engine covered?", lead("Sam", "2012", "Ford", "F-150"))
+
+    assert len(completer.prompts) == 2
+    assert civic != f150
+    assert "Vehicle: 2012 Ford F-150" in completer.prompts[1]
+
+
+def test_same_vehicle_reuses_answer_with_own_name(completer):
+    utils.get_ai_response("is my engine covered?", lead("Sam", "2018", "Honda", "Civic"))
+    answer = utils.get_ai_response("is my engine covered?", lead("Alex", "2018", "Honda", "Civic"))
+
+    assert len(completer.prompts) == 1
+    assert answer.startswith("Hi Alex,")
+
+
+def test_depersonalize_only_replaces_whole_words():
+    assert depersonalize("Al, also call us", {"first_name": "Al"}) == "{first_name}, also call us"
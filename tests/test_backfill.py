@@ -0,0 +1,53 @@
+import pytest
+from autopair_chatbot import backfill
+from autopair_chatbot.backfill import Backfill, SentLog
+from autopair_chatbot.locks import MemoryLockBackend
+
+
+def lead(lead_id, phone):
+    return {"id": lead_id, "properties": {
+        "phone": phone, "firstname": "Sam", "vehicle_year": "2021", "vehicle_make": "Honda",
+        "vehicle_model": "Civic", "vehicle_mileage": "40000", "lifecyclestage": "lead"
+    }}
+
+
+@pytest.fixture
+def crm(monkeypatch):
+    leads = {"1": lead("1", "4165550100"), "2": lead("2", "4165550101")}
+    texted = []
+    writes = []
+    monkeypatch.setattr(backfill, "lead_locks", MemoryLockBackend())
+    monkeypatch.setattr(backfill, "batch_read_leads", lambda ids, properties: [leads[i] for i in ids])
+    monkeypatch.setattr(backfill, "send_qualification_sms", lambda lead, qualification: texted.append(lead["id"]) or True)
+    monkeypatch.setattr(backfill, "batch_update_leads", lambda inputs: writes.append(inputs) or {
+        item["id"]: item["id"] != "2" for item in inputs
+    })
+    return texted, writes
+
+
+def test_rerun_after_crash_does_not_text_again(crm, monkeypatch, tmp_path):
+    texted, writes = crm
+    path = str(tmp_path / "sent.log")
+
+    def crash(inputs):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as patch:
+        patch.setattr(backfill, "batch_update_leads", crash)
+        with pytest.raises(KeyboardInterrupt):
+            Backfill(2, 100, False, SentLog(path)).run_page(["1", "2"])
+
+    rerun = Backfill(2, 100, False, SentLog(path))
+    rerun.run_page(["1", "2"])
+
+    assert sorted(texted) == ["1", "2"]
+    assert rerun.stats["already_sent"] == 2
+    assert [item["properties"]["autopair_processed"] for item in writes[0]] == ["true", "true"]
+
+
+def test_failed_updates_are_counted(crm, tmp_path):
+    run = Backfill(2, 100, False, SentLog(str(tmp_path / "sent.log")))
+
+    run.run_page(["1", "2"])
+
+    assert run.stats["updated"] == 1
+    assert run.stats["update_failed"] == 1
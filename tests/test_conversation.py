@@ -0,0 +1,50 @@
+from autopair_chatbot.conversation import MAX_MESSAGE_CHARS, ConversationStore
+
+
+def text(label, tokens):
+    """`label` padded to exactly `tokens` estimated tokens (4 chars each)."""
+    return label.ljust(tokens * 4, ".")
+
+
+def contents(messages):
+    return [message["content"] for message in messages]
+
+
+def test_keeps_the_newest_turns_that_fit_the_budget():
+    store = ConversationStore(max_turns=10, token_budget=45)
+    for n in range(4):
+        store.record("1", text(f"q{n}", 10), text(f"a{n}", 10))
+
+    messages = store.messages("1")
+
+    assert contents(messages) == [text("q2", 10), text("a2", 10), text("q3", 10), text("a3", 10)]
+    assert [message["role"] for message in messages] == ["user", "assistant", "user", "assistant"]
+
+
+def test_never_skips_a_turn_to_fit_an_older_one():
+    store = ConversationStore(max_turns=10, token_budget=45)
+    store.record("1", text("q0", 5), text("a0", 5))
+    store.record("1", text("q1", 30), text("a1", 30))
+
+    assert store.messages("1") == []
+
+
+def test_summary_of_older_questions_is_added_only_when_it_fits():
+    roomy = ConversationStore(max_turns=2, token_budget=100)
+    tight = ConversationStore(max_turns=2, token_budget=40)
+    for store in (roomy, tight):
+        for n in range(3):
+            store.record("1", text(f"q{n}", 10), text(f"a{n}", 10))
+
+    assert roomy.messages("1")[0] == {
+        "role": "system", "content": f"Earlier in this conversation the customer asked: {text('q0', 10)}"
+    }
+    assert len(roomy.messages("1")) == 5
+    assert [message["role"] for message in tight.messages("1")] == ["user", "assistant", "user", "assistant"]
+
+
+def test_long_messages_are_clipped_before_counting():
+    store = ConversationStore(max_turns=10, token_budget=1000)
+    store.record("1", "x" * 5000, "ok")
+
+    assert len(store.messages("1")[0]["content"]) == MAX_MESSAGE_CHARS
@@ -0,0 +1,34 @@
+import pytest
+from autopair_chatbot import call_handlers
+from autopair_chatbot.dialer import Dialer
+
+
+@pytest.fixture
+def dialer(tmp_path):
+    return Dialer(str(tmp_path / "dialer.db"), slots=2, destinations=["+15550001", "+15550002"])
+
+
+def test_inbound_call_holds_a_slot_until_its_dial_ends(dialer):
+    assert dialer.assign_destination("CA-in", "inbound:+14165550100") == "+15550001"
+    assert dialer.stats()["active_calls"] == 1
+    # The next call goes to the other specialist
+    assert dialer.assign_destination("CA-in-2", "inbound:+14165550101") == "+15550002"
+
+    dialer.record_status("CA-in", "completed", "30")
+
+    assert dialer.stats()["per_destination"] == {"+15550001": 0, "+15550002": 1}
+
+
+def test_callback_before_sid_is_stored_frees_the_slot(dialer, monkeypatch):
+    def place_call(lead_id, phone, status_callback=False):
+        # Twilio reports the call failed before calls.create has returned
+        dialer.record_status("CA-out", "failed", None, lead_id)
+        return "CA-out"
+
+    monkeypatch.setattr(call_handlers, "place_call", place_call)
+    dialer.enqueue("42", "+14165550100")
+
+    assert dialer.dial_next()
+    stats = dialer.stats()
+    assert stats["active_calls"] == 0
+    assert stats["outcomes"] == {"failed": 1}
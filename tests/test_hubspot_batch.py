@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+from autopair_chatbot import hubspot
+from autopair_chatbot.write_queue import HubSpotWriteQueue
+
+
+def multi_status(monkeypatch, body):
+    response = SimpleNamespace(status_code=207, raise_for_status=lambda: None, json=lambda: body)
+    monkeypatch.setattr(hubspot.hubspot_client, "post", lambda path, json: response)
+
+
+def test_missing_contact_in_a_batch_is_reported_as_not_found(monkeypatch):
+    multi_status(monkeypatch, {
+        "results": [{"id": "1"}],
+        "errors": [{"category": "OBJECT_NOT_FOUND", "message": "Object not found", "context": {"ids": ["404"]}}]
+    })
+
+    outcome = hubspot.batch_update_leads([{"id": "1", "properties": {}}, {"id": "404", "properties": {}}])
+
+    assert outcome == {"1": True, "404": None}
+
+
+def test_write_behind_future_resolves_none_for_a_missing_contact(monkeypatch):
+    multi_status(monkeypatch, {
+        "results": [],
+        "errors": [{"category": "OBJECT_NOT_FOUND", "message": "Object not found", "context": {"ids": ["404"]}}]
+    })
+    queue = HubSpotWriteQueue(batch_size=10, flush_interval=60)
+    future = queue.submit("404", {"hs_lead_status": "OPEN"})
+
+    queue.flush()
+
+    assert future.result(timeout=1) is None
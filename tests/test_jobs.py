@@ -0,0 +1,83 @@
+import threading
+import time
+import pytest
+from autopair_chatbot import hubspot, jobs
+from autopair_chatbot.jobs import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_slow_job_keeps_its_lease(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_VISIBILITY_TIMEOUT", 0.3)
+    release = threading.Event()
+    monkeypatch.setitem(jobs._handlers, "slow_test", lambda payload: release.wait(5))
+    queue.enqueue("slow_test", {})
+
+    worker = threading.Thread(target=queue.run_one)
+    worker.start()
+    time.sleep(1)
+    second_claim = queue.claim()
+    release.set()
+    worker.join()
+
+    assert second_claim is None
+    assert queue.stats() == {"pending": 0, "running": 0, "dead": 0}
+
+
+def test_missing_contact_is_dead_lettered_without_retries(queue, monkeypatch):
+    monkeypatch.setattr(hubspot, "update_lead_in_hubspot", lambda lead_id, update_data, max_retries: None)
+    queue.enqueue("update_contact", {"lead_id": "404", "update_data": {"properties": {}}})
+
+    assert queue.run_one()
+
+    assert queue.stats() == {"pending": 0, "running": 0, "dead": 1}
+    assert "not found" in queue.list_jobs(dead=True)[0]["last_error"]
+
+
+def test_retried_update_cannot_overwrite_a_newer_one(queue, monkeypatch):
+    writes = []
+    monkeypatch.setattr(jobs, "backoff_delay", lambda attempts: 0)
+    monkeypatch.setattr(
+        hubspot, "update_lead_in_hubspot",
+        lambda lead_id, update_data, max_retries: writes.append(update_data["properties"]) or True
+    )
+    queue.enqueue("update_contact", {"lead_id": "7", "update_data": {"properties": {"hs_lead_status": "OPEN", "note": "a"}}})
+    job = queue.claim()
+    # A newer update lands while the first is running and then fails
+    queue.enqueue("update_contact", {"lead_id": "7", "update_data": {"properties": {"hs_lead_status": "CONNECTED"}}})
+    assert queue.claim() is None
+    queue.fail(job, "timeout")
+
+    assert queue.run_one()
+
+    assert writes == [{"hs_lead_status": "CONNECTED", "note": "a"}]
+    assert queue.stats() == {"pending": 0, "running": 0, "dead": 0}
+
+
+def test_pending_updates_for_a_lead_are_merged(queue):
+    queue.enqueue("update_contact", {"lead_id": "7", "update_data": {"properties": {"hs_lead_status": "OPEN"}}})
+    queue.enqueue("update_contact", {"lead_id": "7", "update_data": {"properties": {"hs_lead_status": "CONNECTED"}}})
+    queue.enqueue("update_contact", {"lead_id": "8", "update_data": {"properties": {"hs_lead_status": "OPEN"}}})
+
+    assert [job["payload"] for job in queue.list_jobs()] == [
+        '{"lead_id": "7", "update_data": {"properties": {"hs_lead_status": "CONNECTED"}}}',
+        '{"lead_id": "8", "update_data": {"properties": {"hs_lead_status": "OPEN"}}}'
+    ]
+
+
+def test_texts_to_one_number_are_claimed_in_order(queue):
+    queue.enqueue("send_sms", {"to": "+14165550100", "body": "first"})
+    queue.enqueue("send_sms", {"to": "+14165550100", "body": "second"})
+    queue.enqueue("send_sms", {"to": "+14165550101", "body": "other"})
+
+    first = queue.claim()
+    other = queue.claim()
+
+    assert first["payload"]["body"] == "first"
+    assert other["payload"]["body"] == "other"
+    assert queue.claim() is None
+    queue.complete(first["id"])
+    assert queue.claim()["payload"]["body"] == "second"
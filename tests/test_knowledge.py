@@ -0,0 +1,24 @@
+import json
+from autopair_chatbot import knowledge, plans
+from autopair_chatbot.plans import DEFAULT_RULES_PATH, PlanRules
+
+
+def test_plan_passages_follow_the_rule_table(monkeypatch):
+    with open(DEFAULT_RULES_PATH) as f:
+        table = json.load(f)
+    table["plans"]["Works Plan"]["price"] = "$1899 or 18 monthly payments of $106"
+    table["plans"]["Works Plan"]["surcharges"]["premium"] = 349
+    table["tiers"][1]["mileage_below_km"] = 180000
+    monkeypatch.setattr(plans, "_rules", PlanRules(table))
+
+    text = knowledge._plan_details()
+
+    assert "2. 🔹 THE WORKS PLAN\n   - Duration: 24 months / 50,000 KM\n   - Price: $1899 or 18 monthly payments of $106" in text
+    assert "Surcharge: $349 (premium), $499 (exotic)" in text
+    assert "STANDARD: Vehicle must be ≤10 years & <180,000 KM" in text
+
+
+def test_each_plan_passage_is_tagged_with_its_plan():
+    tagged = [p["plan"] for p in knowledge.split_passages("plans", knowledge.PLAN_DETAILS) if p["plan"]]
+
+    assert tagged == list(plans.get_plan_rules().plans)
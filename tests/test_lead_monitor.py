@@ -0,0 +1,109 @@
+from autopair_chatbot import lead_monitor
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeSearch:
+    """Contact search with HubSpot's semantics: filters, sort, offset paging."""
+
+    def __init__(self, leads):
+        self.leads = leads
+
+    def post(self, path, json):
+        filters = {f["propertyName"]: f["value"] for f in json["filterGroups"][0]["filters"]}
+        since = int(filters["createdate"])
+        matches = sorted(
+            (lead for lead in self.leads if int(lead["properties"]["createdate"]) >= since),
+            key=lambda lead: int(lead["properties"]["createdate"])
+        )
+        offset = int(json.get("after") or 0)
+        page = matches[offset:offset + json["limit"]]
+        data = {"results": page}
+        if offset + json["limit"] < len(matches):
+            data["paging"] = {"next": {"after": str(offset + json["limit"])}}
+        return FakeResponse(data)
+
+
+def make_lead(i, created):
+    return {"id": str(i), "properties": {
+        "createdate": str(created), "phone": "+14165550100", "vehicle_year": "2020",
+        "vehicle_mileage": "50000", "lifecyclestage": "lead"
+    }}
+
+
+def run_sweep(monkeypatch, leads, watermark):
+    dispatched, saved = [], []
+    monkeypatch.setattr(lead_monitor, "hubspot_client", FakeSearch(leads))
+    monkeypatch.setattr(lead_monitor.phone_index, "put", lambda lead, phone=None: None)
+    monkeypatch.setattr(lead_monitor, "dispatch_lead", lambda lead_id, source: dispatched.append(lead_id) or True)
+    monkeypatch.setattr(lead_monitor, "save_watermark", lambda wm: saved.append(dict(wm, ids=list(wm["ids"]))))
+    return lead_monitor.poll_new_leads(watermark), dispatched, saved
+
+
+def test_burst_spanning_several_pages_is_fully_dispatched(monkeypatch):
+    # 250 leads, some sharing a createdate (including across page boundaries)
+    leads = [make_lead(i, 1_000_000 + i // 3) for i in range(250)]
+    watermark, dispatched, saved = run_sweep(monkeypatch, leads, {"createdate": 999_999, "ids": []})
+
+    assert dispatched == [str(i) for i in range(250)]
+    assert watermark["createdate"] == 1_000_000 + 249 // 3
+    assert sorted(watermark["ids"]) == ["249"]
+    assert len(saved) == 3
+
+
+def test_next_sweep_skips_leads_already_seen(monkeypatch):
+    leads = [make_lead(i, 1_000_000 + i // 3) for i in range(12)]
+    watermark, _, _ = run_sweep(monkeypatch, leads[:10], {"createdate": 999_999, "ids": []})
+    watermark, dispatched, _ = run_sweep(monkeypatch, leads, watermark)
+
+    assert dispatched == ["10", "11"]
+
+
+def test_sweep_stops_at_first_lead_the_queue_refuses(monkeypatch):
+    leads = [make_lead(i, 1_000_000 + i) for i in range(10)]
+    accepted = []
+
+    def dispatch(lead_id, source):
+        if len(accepted) == 4:
+            return False
+        accepted.append(lead_id)
+        return True
+
+    monkeypatch.setattr(lead_monitor, "hubspot_client", FakeSearch(leads))
+    monkeypatch.setattr(lead_monitor.phone_index, "put", lambda lead, phone=None: None)
+    monkeypatch.setattr(lead_monitor, "dispatch_lead", dispatch)
+    monkeypatch.setattr(lead_monitor, "save_watermark", lambda wm: None)
+    watermark = lead_monitor.poll_new_leads({"createdate": 999_999, "ids": []})
+    assert watermark == {"createdate": 1_000_003, "ids": ["3"]}
+
+    accepted.clear()
+    monkeypatch.setattr(lead_monitor, "dispatch_lead", lambda lead_id, source: accepted.append(lead_id) or True)
+    lead_monitor.poll_new_leads(watermark)
+    assert accepted == [str(i) for i in range(4, 10)]
+
+
+def test_webhook_lead_without_vehicle_fields_is_not_texted(monkeypatch):
+    from autopair_chatbot import hubspot, utils
+    texted, updates = [], []
+    lead = {"id": "7", "properties": {
+        "phone": "4165550100", "vehicle_year": None, "vehicle_mileage": None,
+        "autopair_processed": None, "lifecyclestage": "lead"
+    }}
+    monkeypatch.setattr(hubspot, "fetch_lead_details", lambda lead_id, refresh=False: lead)
+    monkeypatch.setattr(utils, "send_qualification_sms", lambda lead, qualification: texted.append(lead) or True)
+    monkeypatch.setattr(lead_monitor, "queue_contact_update", lambda lead_id, data: updates.append(data))
+
+    # What the executor runs for a webhook dispatch: process_new_lead(lead_id, refresh=True)
+    lead_monitor.process_new_lead("7", True)
+
+    assert texted == []
+    assert updates == []
@@ -0,0 +1,102 @@
+import pytest
+from autopair_chatbot import hubspot
+from autopair_chatbot.lead_store import LeadStore
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeContacts:
+    """Contact reads that return whatever HubSpot currently holds."""
+
+    def __init__(self, properties):
+        self.properties = properties
+        self.gets = 0
+
+    def get(self, path, params=None):
+        self.gets += 1
+        return FakeResponse({"id": "1", "properties": dict(self.properties), "updatedAt": "2026-01-01T00:00:00Z"})
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = LeadStore(str(tmp_path / "leads.db"))
+    contacts = FakeContacts({"phone": "4165550100", "hs_lead_status": "NEW"})
+    monkeypatch.setattr(hubspot, "lead_store", store)
+    monkeypatch.setattr(hubspot, "hubspot_client", contacts)
+    monkeypatch.setattr(hubspot, "HUBSPOT_WRITE_BEHIND", False)
+    return store, contacts
+
+
+def test_property_change_webhook_refetches_the_lead(store):
+    store, contacts = store
+    assert hubspot.fetch_lead_details("1")["properties"]["hs_lead_status"] == "NEW"
+    contacts.properties["hs_lead_status"] = "OPEN"
+
+    hubspot.extract_webhook_lead_ids([
+        {"eventId": 101, "objectId": 1, "subscriptionType": "contact.propertyChange", "propertyName": "hs_lead_status"}
+    ])
+
+    assert hubspot.fetch_lead_details("1")["properties"]["hs_lead_status"] == "OPEN"
+    assert contacts.gets == 2
+
+
+def test_refresh_skips_the_local_copy(store):
+    store, contacts = store
+    hubspot.fetch_lead_details("1")
+    contacts.properties["hs_lead_status"] = "OPEN"
+
+    assert hubspot.fetch_lead_details("1", refresh=True)["properties"]["hs_lead_status"] == "OPEN"
+
+
+def test_failed_patch_leaves_the_local_copy_alone(store, monkeypatch):
+    store, _ = store
+    hubspot.fetch_lead_details("1")
+    monkeypatch.setattr(hubspot, "_patch_lead", lambda lead_id, update_data, max_retries: False)
+
+    assert not hubspot.update_lead_in_hubspot("1", {"properties": {"hs_lead_status": "CONNECTED"}})
+    assert store.get("1")["properties"]["hs_lead_status"] == "NEW"
+
+
+def test_accepted_patch_is_served_locally(store, monkeypatch):
+    store, _ = store
+    hubspot.fetch_lead_details("1")
+    monkeypatch.setattr(hubspot, "_patch_lead", lambda lead_id, update_data, max_retries: True)
+
+    assert hubspot.update_lead_in_hubspot("1", {"properties": {"hs_lead_status": "CONNECTED"}})
+    assert store.get("1")["properties"]["hs_lead_status"] == "CONNECTED"
+
+
+def search_result(status, updated_at):
+    return {"id": "1", "properties": {"phone": "4165550100", "hs_lead_status": status}, "updatedAt": updated_at}
+
+
+def test_lagging_search_result_does_not_undo_our_write(store):
+    store, _ = store
+    store.upsert(search_result("NEW", "2026-01-01T00:00:00Z"))
+    store.apply_update("1", {"hs_lead_status": "CONNECTED"})
+
+    # HubSpot's clock runs ahead of ours, but the index hasn't caught up
+    store.upsert(search_result("NEW", "2099-01-01T00:00:00Z"))
+
+    assert store.get("1")["properties"]["hs_lead_status"] == "CONNECTED"
+
+
+def test_later_remote_change_shows_once_hubspot_has_our_write(store):
+    store, _ = store
+    store.upsert(search_result("NEW", "2000-01-01T00:00:00Z"))
+    store.apply_update("1", {"hs_lead_status": "CONNECTED"})
+
+    # HubSpot's clock runs behind ours
+    store.upsert(search_result("CONNECTED", "2000-01-01T00:01:00Z"))
+    store.upsert(search_result("OPEN", "2000-01-01T00:02:00Z"))
+
+    assert store.get("1")["properties"]["hs_lead_status"] == "OPEN"
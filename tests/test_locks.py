@@ -0,0 +1,35 @@
+import time
+import pytest
+from autopair_chatbot.locks import SQLiteLockBackend
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two processes' views of one lock database."""
+    path = str(tmp_path / "locks.db")
+    first, second = SQLiteLockBackend(path), SQLiteLockBackend(path)
+    first.owner, second.owner = "host-a:1", "host-b:2"
+    return first, second
+
+
+def test_lease_is_exclusive_until_it_expires(workers):
+    first, second = workers
+
+    assert first.acquire("lead:1", ttl=0.2)
+    assert not second.acquire("lead:1", ttl=0.2)
+    assert second.acquire("lead:2", ttl=0.2)
+    time.sleep(0.3)
+
+    assert second.acquire("lead:1", ttl=60)
+    assert not first.acquire("lead:1", ttl=60)
+
+
+def test_only_the_owner_can_release(workers):
+    first, second = workers
+    assert first.acquire("lead:1", ttl=60)
+
+    second.release("lead:1")
+    assert not second.acquire("lead:1", ttl=60)
+
+    first.release("lead:1")
+    assert second.acquire("lead:1", ttl=60)
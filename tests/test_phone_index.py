@@ -0,0 +1,31 @@
+from autopair_chatbot.phone_index import PhoneIndex
+
+
+def contact(lead_id, phone, status="NEW"):
+    return {"id": lead_id, "properties": {"phone": phone, "hs_lead_status": status}}
+
+
+def test_number_reassigned_to_another_lead_leaves_the_old_owner():
+    index = PhoneIndex(max_size=10, ttl=60)
+    index.put(contact("1", "4165550100"))
+    index.put(contact("2", "4165550100"))
+
+    index.update_properties("1", {"hs_lead_status": "OPEN"})
+    index.invalidate_lead("1")
+
+    found = index.get("4165550100")
+    assert found["id"] == "2"
+    assert found["properties"]["hs_lead_status"] == "NEW"
+
+
+def test_update_after_reassigned_number_is_evicted():
+    index = PhoneIndex(max_size=1, ttl=60)
+    index.put(contact("1", "4165550100"))
+    index.put(contact("2", "4165550100"))
+    index.put(contact("3", "4165550101"))
+
+    index.update_properties("1", {"hs_lead_status": "OPEN"})
+    index.update_properties("2", {"hs_lead_status": "OPEN"})
+
+    assert index.get("4165550100") is None
+    assert index.get("4165550101")["properties"]["hs_lead_status"] == "NEW"
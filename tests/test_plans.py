@@ -0,0 +1,18 @@
+import pytest
+from autopair_chatbot.plans import qualify_batch, qualify_plans
+
+
+@pytest.mark.parametrize("years, mileages", [
+    (["2021", "20x1", "", " 2019 ", "-5", "2018.0"], ["45,000", "45000", "abc", "45000.5", "+100", "1,2,3"]),
+    ([2021.0, 2019.5, float("nan"), 2015.0], [45000.0, 1000.5, 10000.0, float("inf")]),
+    ([2021, 2005, 2018], [45000, 45000, 199999]),
+])
+def test_batch_matches_scalar_on_bad_input(years, mileages):
+    batch = qualify_batch(years, mileages, current_year=2025).results()
+
+    assert batch == [qualify_plans(year, miles, current_year=2025) for year, miles in zip(years, mileages)]
+
+
+def test_fractional_float_is_invalid():
+    assert qualify_plans(2019.5, 45000, current_year=2025) == {"qualified": False, "error": "Invalid vehicle data"}
+    assert qualify_batch([2019.5], [45000], current_year=2025).valid.tolist() == [False]
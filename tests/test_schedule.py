@@ -0,0 +1,45 @@
+import os
+import time
+from datetime import datetime
+
+import pytest
+import pytz
+
+from autopair_chatbot import sms_handlers
+from autopair_chatbot.utils import parse_schedule_text
+
+TORONTO = pytz.timezone("America/Toronto")
+
+
+@pytest.fixture
+def utc_host():
+    # The Docker image runs with TZ=UTC; wall-clock Toronto times must not be read as UTC
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "UTC"
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+def test_parsed_times_are_toronto_wall_clock(utc_host):
+    scheduled = parse_schedule_text("tomorrow 10am")
+    in_toronto = datetime.fromtimestamp(scheduled.timestamp(), TORONTO)
+    assert (in_toronto.hour, in_toronto.minute) == (10, 0)
+
+
+def test_callback_and_hubspot_get_the_toronto_time(utc_host, monkeypatch):
+    callbacks, updates = [], []
+    monkeypatch.setattr(sms_handlers, "schedule_callback", lambda lead_id, phone, due_at: callbacks.append(due_at))
+    monkeypatch.setattr(sms_handlers, "queue_contact_update", lambda lead_id, data: updates.append(data))
+    monkeypatch.setattr(sms_handlers, "reply_to_lead", lambda phone, message, payload: message)
+
+    lead = {"id": "1", "properties": {"phone": "+14165550100"}}
+    sms_handlers.handle_schedule_submission(lead, "friday 2pm")
+
+    due = datetime.fromtimestamp(callbacks[0], TORONTO)
+    assert (due.strftime("%A"), due.hour) == ("Friday", 14)
+    assert updates[0]["properties"]["autopair_scheduled_time"] == int(callbacks[0] * 1000)
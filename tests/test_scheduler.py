@@ -0,0 +1,47 @@
+import time
+import pytest
+from autopair_chatbot import jobs, scheduler
+from autopair_chatbot.scheduler import CallbackScheduler, CallbackStore
+
+
+@pytest.fixture
+def calls(monkeypatch, tmp_path):
+    placed = []
+    store = CallbackStore(str(tmp_path / "callbacks.db"))
+    monkeypatch.setattr(scheduler, "CALLBACK_SCHEDULER", True)
+    monkeypatch.setattr(scheduler, "_callback_store", store)
+    monkeypatch.setattr(jobs, "queue_call", lambda lead_id, phone, status_callback: placed.append(lead_id))
+    monkeypatch.setattr(jobs, "queue_contact_update", lambda lead_id, update_data: True)
+    return store, placed
+
+
+def test_call_status_frees_the_callback_slot(calls):
+    store, placed = calls
+    callbacks = CallbackScheduler(store, capacity=1, call_seconds=600)
+    due = time.time() - 1
+    for lead_id in ("1", "2"):
+        store.schedule(lead_id, "+14165550100", due)
+        callbacks.add(lead_id, "+14165550100", due)
+
+    callbacks.run_due()
+    assert placed == ["1"]
+
+    scheduler.record_call_status("1", "completed")
+    callbacks.run_due()
+
+    assert placed == ["1", "2"]
+
+
+def test_lost_call_status_frees_the_slot_after_call_seconds(calls):
+    store, placed = calls
+    callbacks = CallbackScheduler(store, capacity=1, call_seconds=0.2)
+    due = time.time() - 1
+    for lead_id in ("1", "2"):
+        store.schedule(lead_id, "+14165550100", due)
+        callbacks.add(lead_id, "+14165550100", due)
+
+    callbacks.run_due()
+    time.sleep(0.3)
+    callbacks.run_due()
+
+    assert placed == ["1", "2"]
@@ -0,0 +1,22 @@
+from concurrent.futures import Future
+from autopair_chatbot import config, sms_dispatcher, utils
+
+
+class QueuedDispatcher:
+    """A dispatcher whose message never leaves the queue within the timeout."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, to_number, body, max_retries):
+        self.sent.append(body)
+        return Future()
+
+
+def test_message_still_queued_is_not_reported_as_failed(monkeypatch):
+    dispatcher = QueuedDispatcher()
+    monkeypatch.setattr(sms_dispatcher, "sms_dispatcher", dispatcher)
+    monkeypatch.setattr(config, "SMS_SEND_TIMEOUT", 0.05)
+
+    assert utils.send_sms("4165550100", "hello") is True
+    assert dispatcher.sent == ["hello"]
@@ -0,0 +1,33 @@
+from autopair_chatbot.sms_dispatcher import SenderPool
+
+SENDERS = ["+15550001", "+15550002", "+15550003"]
+
+
+def test_recipient_keeps_one_sender():
+    pool = SenderPool(SENDERS, rate=1000, burst=1000, max_wait=60)
+
+    senders = {pool.acquire("+14165550100")[0] for _ in range(20)}
+
+    assert senders == {SENDERS[pool.home("+14165550100")]}
+
+
+def test_recipients_spread_over_senders():
+    pool = SenderPool(SENDERS, rate=1000, burst=1000, max_wait=60)
+
+    used = {pool.acquire(f"+1416555{n:04d}")[0] for n in range(50)}
+
+    assert used == set(SENDERS)
+
+
+def test_recipient_moves_only_when_home_sender_is_throttled():
+    pool = SenderPool(SENDERS, rate=0.01, burst=1, max_wait=60)
+    to = "+14165550100"
+    home = SENDERS[pool.home(to)]
+
+    first, _ = pool.acquire(to)
+    second, wait = pool.acquire(to)
+
+    assert first == home
+    assert second != home and wait == 0
+    # ...and stays on the new sender afterwards
+    assert SENDERS[pool._moved[to]] == second
@@ -0,0 +1,42 @@
+import pytest
+import main
+from autopair_chatbot import config, sms_handlers
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(sms_handlers, "queue_sms", lambda phone, message: sent.append((phone, message)) or True)
+    return sent
+
+
+def test_twiml_mode_answers_in_the_webhook_response(sent, monkeypatch):
+    monkeypatch.setattr(config, "SMS_REPLY_MODE", "twiml")
+
+    with main.app.test_request_context("/sms-webhook", method="POST"):
+        body, status, headers = sms_handlers.reply_to_lead("+14165550100", "Yes, it's covered.", {"status": "success"})
+
+    assert status == 200
+    assert headers["Content-Type"] == "text/xml"
+    assert "<Message>Yes, it's covered.</Message>" in body
+    assert sent == []
+
+
+def test_rest_mode_sends_through_the_api(sent, monkeypatch):
+    monkeypatch.setattr(config, "SMS_REPLY_MODE", "rest")
+
+    with main.app.test_request_context("/sms-webhook", method="POST"):
+        response = sms_handlers.reply_to_lead("+14165550100", "Yes, it's covered.", {"status": "success"})
+        assert response.get_json() == {"status": "success"}
+
+    assert sent == [("+14165550100", "Yes, it's covered.")]
+
+
+def test_background_turn_falls_back_to_rest(sent, monkeypatch):
+    monkeypatch.setattr(config, "SMS_REPLY_MODE", "twiml")
+
+    with main.app.app_context():
+        response = sms_handlers.reply_to_lead("+14165550100", "Yes, it's covered.", {"status": "success"})
+        assert response.get_json() == {"status": "success"}
+
+    assert sent == [("+14165550100", "Yes, it's covered.")]
@@ -0,0 +1,22 @@
+import main
+from autopair_chatbot import config, sms_dispatcher
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.statuses = []
+
+    def record_status(self, message_sid, status):
+        self.statuses.append((message_sid, status))
+
+
+def test_unsigned_sms_status_is_rejected(monkeypatch):
+    dispatcher = RecordingDispatcher()
+    monkeypatch.setattr(sms_dispatcher, "sms_dispatcher", dispatcher)
+    monkeypatch.setattr(config, "TWILIO_VALIDATE_SIGNATURE", True)
+    monkeypatch.setattr(config, "TWILIO_AUTH_TOKEN", "token")
+
+    response = main.app.test_client().post("/sms-status", data={"MessageSid": "SM1", "MessageStatus": "failed"})
+
+    assert response.status_code == 403
+    assert dispatcher.statuses == []
@@ -0,0 +1,25 @@
+import base64
+import hashlib
+import hmac
+import time
+from autopair_chatbot.hubspot import verify_hubspot_signature
+from autopair_chatbot.config import HUBSPOT_WEBHOOK_MAX_AGE_MS
+
+URI = "https://example.test/hubspot-webhook"
+BODY = '[{"eventId": 1}]'
+
+
+def sign(timestamp, secret="secret"):
+    source = f"POST{URI}{BODY}{timestamp}".encode("utf-8")
+    return base64.b64encode(hmac.new(secret.encode("utf-8"), source, hashlib.sha256).digest()).decode()
+
+
+def test_fresh_signature_is_accepted():
+    timestamp = str(int(time.time() * 1000))
+    assert verify_hubspot_signature("secret", "POST", URI, BODY, timestamp, sign(timestamp))
+
+
+def test_old_and_future_timestamps_are_rejected():
+    now_ms = int(time.time() * 1000)
+    for timestamp in (str(now_ms - HUBSPOT_WEBHOOK_MAX_AGE_MS - 60000), str(now_ms + HUBSPOT_WEBHOOK_MAX_AGE_MS + 60000)):
+        assert not verify_hubspot_signature("secret", "POST", URI, BODY, timestamp, sign(timestamp))
@@ -0,0 +1,97 @@
+import json
+import random
+import threading
+import time
+import zlib
+from autopair_chatbot.workers import BoundedExecutor, KeyedExecutor
+
+
+def test_unreadable_spill_line_is_set_aside(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    spill.write_text(
+        json.dumps({"task": "process", "args": ["1"]}) + "\n"
+        + '{"task": "process", "ar\n'
+        + json.dumps({"task": "process", "args": ["2"]}) + "\n"
+    )
+    done = []
+    finished = threading.Event()
+    executor = BoundedExecutor("test", workers=1, queue_size=10, policy="spill", spill_path=str(spill))
+    executor.register("process", lambda lead_id: done.append(lead_id) or len(done) == 2 and finished.set())
+
+    executor._ensure_started()
+
+    assert finished.wait(2)
+    assert done == ["1", "2"]
+    assert spill.read_text() == ""
+    assert (tmp_path / "spill.jsonl.bad").read_text() == '{"task": "process", "ar\n'
+
+
+def wait_until_idle(executor, submitted):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        stats = executor.stats()
+        if stats["completed"] + stats["failed"] == submitted:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{executor.name} did not finish: {executor.stats()}")
+
+
+def test_keyed_tasks_run_in_submission_order_per_key():
+    executor = KeyedExecutor("test", workers=4, queue_size=100)
+    seen = {}
+    lock = threading.Lock()
+
+    def write(lead_id, sequence):
+        time.sleep(random.uniform(0, 0.005))
+        with lock:
+            seen.setdefault(lead_id, []).append(sequence)
+
+    for sequence in range(20):
+        for lead_id in range(8):
+            assert executor.submit(f"lead:{lead_id}", write, lead_id, sequence)
+    wait_until_idle(executor, 160)
+
+    assert seen == {lead_id: list(range(20)) for lead_id in range(8)}
+
+
+def test_failed_task_does_not_stall_its_key():
+    executor = KeyedExecutor("test", workers=2, queue_size=10)
+    done = []
+
+    def fail():
+        raise RuntimeError("HubSpot is down")
+    executor.submit("lead:1", fail)
+    executor.submit("lead:1", done.append, "next")
+    wait_until_idle(executor, 2)
+
+    assert done == ["next"]
+    assert executor.stats()["failed"] == 1
+
+
+def test_slow_key_does_not_block_other_shards():
+    executor = KeyedExecutor("test", workers=2, queue_size=10)
+    # Keys that hash onto different shards
+    slow_key = "lead:1"
+    fast_key = next(f"lead:{n}" for n in range(2, 100)
+                    if zlib.crc32(f"lead:{n}".encode()) % 2 != zlib.crc32(slow_key.encode()) % 2)
+    release = threading.Event()
+    fast_done = threading.Event()
+
+    executor.submit(slow_key, release.wait, 5)
+    executor.submit(fast_key, fast_done.set)
+
+    assert fast_done.wait(2)
+    release.set()
+
+
+def test_full_shard_rejects():
+    executor = KeyedExecutor("test", workers=1, queue_size=1)
+    release = threading.Event()
+    started = threading.Event()
+    executor.submit("lead:1", lambda: started.set() or release.wait(5))
+    assert started.wait(2)
+
+    assert executor.submit("lead:1", time.sleep, 0)
+    assert not executor.submit("lead:2", time.sleep, 0)
+    assert executor.stats()["rejected"] == 1
+    release.set()
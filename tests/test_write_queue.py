@@ -0,0 +1,57 @@
+import pytest
+from autopair_chatbot import hubspot
+from autopair_chatbot.write_queue import HubSpotWriteQueue
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    sent = []
+
+    def batch_update_leads(inputs):
+        sent.append(inputs)
+        return {item["id"]: item["id"] != "failing" for item in inputs}
+    monkeypatch.setattr(hubspot, "batch_update_leads", batch_update_leads)
+    return sent
+
+
+def test_updates_to_one_contact_are_merged(batches):
+    queue = HubSpotWriteQueue(batch_size=10, flush_interval=60)
+    first = queue.submit("1", {"hs_lead_status": "OPEN", "autopair_status": "Texted"})
+    second = queue.submit("1", {"hs_lead_status": "CONNECTED"})
+    other = queue.submit(2, {"hs_lead_status": "OPEN"})
+
+    queue.flush()
+
+    assert batches == [[
+        {"id": "1", "properties": {"hs_lead_status": "CONNECTED", "autopair_status": "Texted"}},
+        {"id": "2", "properties": {"hs_lead_status": "OPEN"}}
+    ]]
+    assert first.result(timeout=1) is second.result(timeout=1) is other.result(timeout=1) is True
+
+
+def test_full_batch_is_flushed_without_waiting_for_the_interval(batches):
+    queue = HubSpotWriteQueue(batch_size=2, flush_interval=60)
+    futures = [queue.submit(lead_id, {"hs_lead_status": "OPEN"}) for lead_id in ("1", "2")]
+
+    assert [future.result(timeout=2) for future in futures] == [True, True]
+    assert len(batches) == 1
+
+
+def test_partial_batch_is_flushed_after_the_interval(batches):
+    queue = HubSpotWriteQueue(batch_size=100, flush_interval=0.2)
+
+    assert queue.submit("1", {"hs_lead_status": "OPEN"}).result(timeout=2) is True
+    assert queue.pending_count() == 0
+
+
+def test_each_future_gets_its_own_contacts_outcome(batches):
+    queue = HubSpotWriteQueue(batch_size=10, flush_interval=60)
+    ok = queue.submit("1", {"hs_lead_status": "OPEN"})
+    failed = queue.submit("failing", {"hs_lead_status": "OPEN"})
+
+    queue.shutdown()
+
+    assert ok.result(timeout=1) is True
+    assert failed.result(timeout=1) is False
+    with pytest.raises(RuntimeError):
+        queue.submit("1", {"hs_lead_status": "OPEN"})